@@ -1,14 +1,37 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template, redirect, send_file
+from flask import Flask, request, jsonify, render_template, redirect, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from models import init_db, get_session, Reperage, Gardien, Lieu, Media, Message
+from werkzeug.http import quote_etag
+from werkzeug.security import safe_join
+from sqlalchemy import or_, and_, func, select, insert, update, delete, event
+from sqlalchemy.orm import load_only, object_session
+from sqlalchemy.orm.exc import StaleDataError
+from events import create_broker, format_sse
+from i18n import TranslationBundles
+from jobs import create_worker, enqueue, register as register_job, report_progress
+from images import HEIC_SUPPORTED, PROCESS_POOL_SIZE, render_derivatives, run_in_process_pool, submit_to_process_pool
+from uploads import UploadHashes, append_chunk
+from archives import stream_zip
+from pdf_cache import PdfCache
+from pdf_render import render_reperage_pdf, render_batch_pdf, prepare_photos
+from storage import hash_file, save_stream, add_reference, store_blob, release_reference, purge_blob
+from models import init_db, init_session_registry, pool_report, reperage_loader_options, get_reperage_stats, rebuild_compteurs_statut, Reperage, Gardien, Lieu, Media, Message, Job, UploadSession, Blob
 import os
 import json
 import secrets
-from datetime import datetime
-from PIL import Image
+import shutil
+from datetime import datetime, timedelta, timezone
 import io
 import re
+import base64
+import hashlib
+import sys
+import time
+import threading
+import click
+import mimetypes
+from urllib.parse import quote as url_quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 app = Flask(__name__)
 CORS(app)
@@ -17,18 +40,149 @@ CORS(app)
 # ✅ Utiliser /data pour Railway volumes, fallback vers static/uploads en local
 UPLOAD_FOLDER = os.environ.get('UPLOAD_PATH', '/data/uploads') if os.path.exists('/data') else 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'heic', 'webp', 'pdf', 'doc', 'docx', 'mp4', 'mov', 'avi'}
+# Photos : images dérivées générées (HEIC lisible seulement avec pillow-heif, sinon gardé comme document)
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'} | ({'heic'} if HEIC_SUPPORTED else set())
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500 MB (pour les vidéos)
+# Envoi des médias (/uploads) : '' par l'application, 'x-accel' (nginx) ou 'x-sendfile' (Apache, lighttpd)
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '').lower()
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-uploads/')  # location internal de nginx
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # Fichiers nommés par leur contenu (blobs/)
+# Uploads reprenables : taille maximale d'un morceau, quota disque par repérage, abandon après inactivité
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # Taille conseillée au client
+UPLOAD_CHUNK_MAX = 16 * 1024 * 1024
+UPLOAD_QUOTA_REPERAGE = int(os.environ.get('UPLOAD_QUOTA_REPERAGE', 5 * 1024 * 1024 * 1024))
+UPLOAD_SESSION_TTL = 24 * 3600
+PAGE_SIZE_DEFAULT = 50  # Pagination de GET /api/reperages
+PAGE_SIZE_MAX = 500
+DASHBOARD_PAGE_SIZE = 50  # Lignes du tableau admin rendues par page
+
+# Champs modifiables par l'API (PUT / PATCH)
+REPERAGE_FIELDS = ['langue_interface', 'fixer_nom', 'fixer_email', 'fixer_telephone',
+                   'pays', 'region', 'statut']
+GARDIEN_FIELDS = ['ordre', 'nom', 'prenom', 'age', 'genre', 'fonction', 'savoir_transmis',
+                  'adresse', 'telephone', 'email', 'contact_intermediaire',
+                  'histoire_personnelle', 'evaluation_cinegenie', 'langues_parlees', 'photo_url']
+LIEU_FIELDS = ['numero_lieu', 'nom', 'type_environnement', 'description_visuelle', 'elements_symboliques',
+               'points_vue_remarquables', 'cinegenie', 'axes_camera', 'moments_favorables',
+               'ambiance_sonore', 'adequation_narration', 'accessibilite', 'securite',
+               'electricite', 'espace_equipe', 'protection_meteo', 'contraintes_meteo',
+               'autorisations_necessaires', 'latitude', 'longitude']
+
+SSE_HEARTBEAT = 15  # Secondes entre deux commentaires keep-alive
+SSE_MAX_DURATION = int(os.environ.get('SSE_MAX_DURATION', 300))  # Le navigateur se reconnecte ensuite
+# Chaque flux occupe un thread gthread pendant toute sa durée : au-delà, 503 et le client reste en polling
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 4))
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+EXPORT_BATCH_SIZE = 100  # Repérages lus par aller-retour lors des exports
+# Résultats des tâches de fond (PDF) : hors de UPLOAD_FOLDER, qui est servi publiquement
+JOBS_FOLDER = os.environ.get('JOBS_PATH', '/data/jobs') if os.path.exists('/data') else 'jobs_output'
+# Cache des PDF par version de repérage (LRU borné en octets)
+PDF_CACHE_FOLDER = os.path.join(JOBS_FOLDER, 'pdf_cache')
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+PDF_LAYOUT_VERSION = 2  # À incrémenter quand la mise en page ou PDF_SETTINGS change : les PDF en cache sont alors ignorés
+# Photos du PDF : résolution d'impression, qualité JPEG et nombre par gardien / lieu (bornent taille et temps de rendu)
+PDF_EXPORT_MAX = int(os.environ.get('PDF_EXPORT_MAX', 200))  # Repérages par export groupé
+PDF_SETTINGS = {
+    'dpi': int(os.environ.get('PDF_IMAGE_DPI', 150)),
+    'quality': int(os.environ.get('PDF_IMAGE_QUALITY', 70)),
+    'max_photos': int(os.environ.get('PDF_PHOTOS_MAX', 4)),
+    'max_annexes': int(os.environ.get('PDF_PHOTOS_ANNEXES_MAX', 12)),
+}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
 # Créer les dossiers nécessaires
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(os.path.join(UPLOAD_FOLDER, 'thumbnails'), exist_ok=True)
+os.makedirs(os.path.join(UPLOAD_FOLDER, 'derives'), exist_ok=True)
+os.makedirs(JOBS_FOLDER, exist_ok=True)
+pdf_cache = PdfCache(PDF_CACHE_FOLDER, PDF_CACHE_MAX_BYTES)
 
 # Initialiser la base de données
 engine = init_db()
 
+# Registre de sessions unique : une session par requête, libérée au teardown
+db_session = init_session_registry(engine)
+
+@app.teardown_appcontext
+def shutdown_session(exception=None):
+    """Libérer la session de la requête et rendre sa connexion au pool"""
+    db_session.remove()
+
+@app.after_request
+def add_reperage_etag(response):
+    """Nouvel ETag du repérage parent après l'écriture d'un gardien, lieu ou média (voir touch_reperage)"""
+    reperage = g.pop('touched_reperage', None)
+    if reperage is not None and response.status_code < 400:
+        response.headers['X-Reperage-ETag'] = quote_etag(version_etag(Reperage, reperage.id, reperage.version))
+    return response
+
+# Pub/sub des événements temps réel (chat, statuts)
+broker = create_broker(engine)
+
+# Uploads reprenables : SHA-256 en cours et verrous par session (voir uploads.py)
+upload_hashes = UploadHashes()
+
+# Tâches de fond : workers démarrés à la première requête (JOBS_WORKERS=0 : worker séparé, flask run-jobs)
+job_worker = create_worker(engine)
+
+@app.before_request
+def start_job_worker():
+    job_worker.ensure_started()
+
+def enqueue_job(session, job_type, payload, max_tentatives=3):
+    """Ajouter une tâche de fond dans la transaction de la requête (exécutée après le commit)"""
+    return enqueue(session, job_type, payload, max_tentatives=max_tentatives, worker=job_worker)
+
+def job_accepted(job):
+    """Réponse 202 : la tâche est acceptée, son état se suit sur /api/jobs/<id>"""
+    response = jsonify({
+        'job_id': job.id,
+        'statut': job.statut,
+        'statut_url': f'/api/jobs/{job.id}',
+        'download_url': f'/api/jobs/{job.id}/download'
+    })
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response
+
+def notify_reperage(reperage_id, event, data):
+    """Publier un événement sur le canal du repérage et sur le canal admin (après commit)"""
+    payload = dict(data, reperage_id=reperage_id)
+    try:
+        broker.publish(f'reperage:{reperage_id}', event, payload)
+        broker.publish('admin', event, payload)
+    except Exception as e:
+        print(f"⚠️ Erreur publication événement {event}: {e}")
+
+def sse_response(channels):
+    """Flux text/event-stream des événements des canaux donnés (sans connexion BDD ouverte)
+    
+    Le nombre de flux simultanés est plafonné à SSE_MAX_STREAMS pour ne pas épuiser
+    les threads du worker ; au-delà on répond 503 et le client garde son polling.
+    """
+    if not sse_slots.acquire(blocking=False):
+        return Response('Trop de flux temps réel ouverts', status=503,
+                        headers={'Retry-After': '60'})
+    
+    subscription = broker.subscribe(channels)
+    
+    def generate():
+        yield "retry: 5000\n\n"
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        while time.monotonic() < deadline:
+            evt = subscription.get(timeout=SSE_HEARTBEAT)
+            yield format_sse(evt) if evt else ": ping\n\n"
+    
+    def release():
+        subscription.close()
+        sse_slots.release()
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)
+    return response
+
 def generate_token():
     """Générer un token aléatoire sécurisé pour URLs"""
     return secrets.token_urlsafe(16)  # 16 bytes = ~21 caractères
@@ -46,19 +200,181 @@ def get_reperage_by_token_or_id(session, identifier):
     
     return None
 
+def parse_iso_datetime(value):
+    """Parser une date ISO 8601 (paramètres de requête), None si invalide"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return None
+
+def encode_cursor(timestamp, row_id):
+    """Curseur opaque de pagination keyset : (horodatage, id) de la dernière ligne renvoyée"""
+    payload = json.dumps([timestamp.isoformat() if timestamp else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Décoder un curseur de pagination, lève ValueError si invalide"""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(timestamp) if timestamp else None, int(row_id)
+    except Exception:
+        raise ValueError('Curseur invalide')
+
+def version_etag(model, row_id, version, medias_version=None):
+    """
+    ETag fort d'une ligne versionnée (Reperage, Gardien, Lieu, Media)
+    medias_version : somme des versions des médias, ajoutée aux ETags de lecture du repérage
+    (les images dérivées générées en tâche de fond changent le média, pas le repérage)
+    """
+    etag = f"{model.__tablename__}-{row_id}-v{version}"
+    return f"{etag}-m{medias_version}" if medias_version is not None else etag
+
+def if_match_accepts(etag):
+    """If-Match contient-il etag, éventuellement suivi du suffixe -m des ETags de lecture ?"""
+    if request.if_match.star_tag:
+        return True
+    return any(tag == etag or tag.startswith(f"{etag}-m") for tag in request.if_match.as_set())
+
+def version_conflict(obj, status):
+    """Réponse de conflit de version (409 / 412) avec la version courante"""
+    response = jsonify({
+        'error': 'Modifié entre-temps par un autre utilisateur',
+        'version': obj.version
+    })
+    response.status_code = status
+    response.set_etag(version_etag(type(obj), obj.id, obj.version))
+    return response
+
+def check_if_match(obj, data=None):
+    """
+    Écriture conditionnelle (verrouillage optimiste)
+    - en-tête If-Match différent de l'ETag courant : 412
+    - champ version du corps JSON différent de la version courante : 409
+    Renvoie la réponse d'erreur, ou None si l'écriture peut continuer
+    """
+    if request.if_match and not if_match_accepts(version_etag(type(obj), obj.id, obj.version)):
+        return version_conflict(obj, 412)
+    if data and data.get('version') is not None and data['version'] != obj.version:
+        return version_conflict(obj, 409)
+    return None
+
+def stale_conflict(session, model, row_id):
+    """Conflit détecté au commit (StaleDataError) : 409 avec la version relue en base"""
+    session.rollback()
+    obj = session.get(model, row_id, populate_existing=True)
+    if not obj:
+        return jsonify({'error': 'Élément supprimé entre-temps'}), 404
+    return version_conflict(obj, 409)
+
+def touch_reperage(session, reperage_id):
+    """Marquer un repérage modifié (updated_at, version) après un changement de ses gardiens, lieux ou médias"""
+    reperage = session.get(Reperage, reperage_id)
+    if reperage:
+        reperage.updated_at = datetime.now()
+        g.touched_reperage = reperage
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Le client a-t-il déjà cette version ? If-None-Match est prioritaire sur If-Modified-Since
+    (last_modified : datetime naïf, interprété comme dans l'en-tête Last-Modified émis)
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    return False
+
+def conditional_response(etag, last_modified=None, build=None):
+    """
+    Réponse GET revalidable : 304 vide si le client a déjà cette version,
+    sinon build() fournit le corps (requêtes et to_dict seulement dans ce cas)
+    Cache-Control: no-cache : le navigateur revalide à chaque appel et sert son cache sur 304
+    """
+    if is_not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+def reperage_validators(session, reperage_id):
+    """(version, updated_at, medias_version) du repérage en une requête ; None si le repérage n'existe pas
+    Toute écriture d'un gardien, lieu ou média met à jour le repérage (voir touch_reperage) ;
+    medias_version couvre en plus les images dérivées enregistrées par les tâches de fond"""
+    medias_version = (
+        select(func.coalesce(func.sum(Media.version), 0))
+        .where(Media.reperage_id == reperage_id)
+        .scalar_subquery()
+    )
+    return session.execute(
+        select(Reperage.version, Reperage.updated_at, medias_version.label('medias_version'))
+        .where(Reperage.id == reperage_id)
+    ).first()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
-    """Créer une miniature d'une image"""
+def derives_folder(reperage_id):
+    """Dossier des images dérivées d'un repérage (servi sous /uploads/derives/<id>/)"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'derives', str(reperage_id))
+
+@register_job('thumbnail')
+def job_creer_miniature(payload):
+    """
+    Tâche : images dérivées d'une photo (galerie, visionneuse, PDF) en WebP et JPEG
+    Calcul dans le pool de processus d'images ; seule la version du média change
+    (pas celle du repérage : l'autosave du fixer en cours ne doit pas passer en conflit)
+    """
+    session = db_session()
     try:
-        with Image.open(image_path) as img:
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, quality=85, optimize=True)
-            return True
-    except Exception as e:
-        print(f"Erreur création miniature: {e}")
-        return False
+        media = session.get(Media, payload['media_id'])
+        if media is None:
+            return None  # Média supprimé entre-temps
+        
+        if media.sha256:
+            # Contenu partagé : images rangées à côté du blob, réutilisées par les médias identiques
+            folder = Blob.folder(media.sha256)
+            output_dir, stem = os.path.join(app.config['UPLOAD_FOLDER'], folder), media.sha256
+        else:
+            folder = f"derives/{media.reperage_id}"
+            output_dir, stem = derives_folder(media.reperage_id), os.path.splitext(media.nom_fichier)[0]
+        derives = render_derivatives(media.chemin_fichier, output_dir, stem)
+        for entry in derives.values():
+            for fmt in ('webp', 'jpeg'):
+                entry[fmt] = f"{folder}/{entry[fmt]}"
+        
+        media.derives = json.dumps(derives)
+        session.commit()
+        return {'media_id': media.id, 'tailles': sorted(derives)}
+    finally:
+        db_session.remove()
+
+@register_job('release_blob')
+def job_supprimer_blobs(payload):
+    """
+    Tâche : effacer les fichiers des blobs qui n'ont plus de référence
+    Revérifié ici, sous verrou (purge_blob) : un upload du même contenu a pu recréer le blob depuis
+    """
+    session = db_session()
+    try:
+        for item in payload.get('blobs', []):
+            purge_blob(session, item['sha256'], item['fichiers'])
+    finally:
+        db_session.remove()
+
+@register_job('cleanup_files')
+def job_supprimer_fichiers(payload):
+    """Tâche : supprimer des fichiers et dossiers (repérage supprimé)"""
+    for path in payload.get('fichiers', []):
+        if os.path.exists(path):
+            os.remove(path)
+    for folder in payload.get('dossiers', []):
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+    return None
 
 def linkify_text(text):
     """Convertir les URLs en liens HTML cliquables"""
@@ -86,48 +402,187 @@ def index():
 
 # ============= API TRADUCTIONS =============
 
+# Chargées une fois ; rechargées si i18n.json change en mode debug
+translation_bundles = TranslationBundles(os.path.join('translations', 'i18n.json'))
+I18N_MAX_AGE = 365 * 24 * 3600
+
+def i18n_context(lang):
+    """Traductions de la langue du fixer à intégrer dans index.html (aucune requête au démarrage)"""
+    bundle = translation_bundles.get(lang or 'FR', check_mtime=app.debug)
+    return {
+        'I18N_LANG': bundle.lang,
+        'I18N_VERSION': translation_bundles.version,
+        'I18N_BUNDLE': bundle.inline
+    }
+
 @app.route('/api/i18n/<lang>')
 def get_translations(lang):
-    """Récupérer les traductions pour une langue"""
+    """
+    Récupérer les traductions pour une langue (Français par défaut, clés manquantes complétées par FR)
+    - ?v=<version courante> : URL versionnée, cache navigateur d'un an
+    - sinon : revalidation par ETag
+    """
     try:
-        with open('translations/i18n.json', 'r', encoding='utf-8') as f:
-            translations = json.load(f)
-        
-        if lang in translations:
-            return jsonify(translations[lang])
-        else:
-            return jsonify(translations['FR'])  # Français par défaut
+        bundle = translation_bundles.get(lang, check_mtime=app.debug)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    response = Response(bundle.body, mimetype='application/json')
+    response.set_etag(bundle.etag)
+    if request.args.get('v') == translation_bundles.version:
+        response.cache_control.public = True
+        response.cache_control.max_age = I18N_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # ============= API REPÉRAGES =============
 
 @app.route('/api/reperages', methods=['GET'])
 def get_reperages():
-    """Récupérer tous les repérages"""
-    session = get_session(engine)
-    try:
-        reperages = session.query(Reperage).all()
-        return jsonify([r.to_dict() for r in reperages])
-    finally:
-        session.close()
+    """
+    Récupérer les repérages
+    - Filtres : statut, pays, fixer_id, updated_since (ISO 8601)
+    - fields=id,statut,... : ne sérialiser (et ne charger) que ces clés
+    - limit / cursor : pagination par curseur sur (updated_at, id),
+      la réponse devient {'reperages': [...], 'next_cursor': ...}
+    Sans limit ni cursor, la liste complète est renvoyée (compatibilité)
+    """
+    session = db_session()
+    
+    # Champs demandés
+    fields = None
+    if request.args.get('fields'):
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in Reperage.API_FIELDS + Reperage.EXTRA_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Champs inconnus: {', '.join(unknown)}"}), 400
+    
+    query = session.query(Reperage)
+    if fields:
+        collections = [f for f in fields if f in Reperage.COLLECTIONS]
+        columns = {'id', 'updated_at'} | {f for f in fields if f not in Reperage.COLLECTIONS}
+        query = query.options(load_only(*[getattr(Reperage, c) for c in columns]),
+                              *reperage_loader_options(collections))
+    else:
+        query = query.options(*reperage_loader_options())
+    
+    # Filtres
+    if request.args.get('statut'):
+        query = query.filter(Reperage.statut == request.args['statut'])
+    if request.args.get('pays'):
+        query = query.filter(Reperage.pays == request.args['pays'])
+    if request.args.get('fixer_id'):
+        fixer_id = request.args.get('fixer_id', type=int)
+        if fixer_id is None:
+            return jsonify({'error': 'fixer_id invalide'}), 400
+        query = query.filter(Reperage.fixer_id == fixer_id)
+    if request.args.get('updated_since'):
+        updated_since = parse_iso_datetime(request.args['updated_since'])
+        if updated_since is None:
+            return jsonify({'error': 'updated_since invalide (format ISO 8601 attendu)'}), 400
+        query = query.filter(Reperage.updated_at >= updated_since)
+    
+    query = query.order_by(Reperage.updated_at.asc(), Reperage.id.asc())
+    
+    # Mode historique : liste complète
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return jsonify([r.to_dict(fields) for r in query.all()])
+    
+    # Pagination par curseur (keyset) : pas d'OFFSET, coût constant par page
+    limit = request.args.get('limit', PAGE_SIZE_DEFAULT, type=int)
+    if limit is None or limit < 1:
+        return jsonify({'error': 'limit invalide'}), 400
+    limit = min(limit, PAGE_SIZE_MAX)
+    
+    if request.args.get('cursor'):
+        try:
+            cursor_updated_at, cursor_id = decode_cursor(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(or_(
+            Reperage.updated_at > cursor_updated_at,
+            and_(Reperage.updated_at == cursor_updated_at, Reperage.id > cursor_id)
+        ))
+    
+    reperages = query.limit(limit + 1).all()
+    has_more = len(reperages) > limit
+    reperages = reperages[:limit]
+    
+    return jsonify({
+        'reperages': [r.to_dict(fields) for r in reperages],
+        'next_cursor': encode_cursor(reperages[-1].updated_at, reperages[-1].id) if has_more else None,
+        'limit': limit
+    })
+
+def iter_reperages_export(session, updated_since=None, fmt='ndjson'):
+    """
+    Générer l'export des repérages morceau par morceau (NDJSON ou tableau JSON)
+    Lecture par curseur serveur (yield_per) : la mémoire ne dépend pas du nombre de repérages
+    """
+    query = (session.query(Reperage)
+             .options(*reperage_loader_options())
+             .execution_options(stream_results=True)
+             .order_by(Reperage.updated_at.asc(), Reperage.id.asc()))
+    if updated_since:
+        query = query.filter(Reperage.updated_at >= updated_since)
+    
+    if fmt == 'json':
+        yield '['
+    for i, reperage in enumerate(query.yield_per(EXPORT_BATCH_SIZE)):
+        line = json.dumps(reperage.to_dict(), ensure_ascii=False)
+        if fmt == 'json':
+            yield (',' if i else '') + line
+        else:
+            yield line + '\n'
+    if fmt == 'json':
+        yield ']'
+
+@app.route('/api/reperages/export', methods=['GET'])
+def export_reperages():
+    """
+    Export complet (ou incrémental avec updated_since) des repérages en streaming
+    - format=ndjson (défaut) ou json
+    - L'en-tête X-Export-Watermark donne la valeur updated_since du prochain export
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'error': 'format invalide (ndjson ou json)'}), 400
+    
+    updated_since = None
+    if request.args.get('updated_since'):
+        updated_since = parse_iso_datetime(request.args['updated_since'])
+        if updated_since is None:
+            return jsonify({'error': 'updated_since invalide (format ISO 8601 attendu)'}), 400
+    
+    watermark = datetime.now().isoformat()
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(
+        stream_with_context(iter_reperages_export(db_session(), updated_since, fmt)),
+        mimetype=mimetype,
+        headers={'X-Export-Watermark': watermark}
+    )
 
 @app.route('/api/reperages/<int:id>', methods=['GET'])
 def get_reperage(id):
-    """Récupérer un repérage spécifique"""
-    session = get_session(engine)
-    try:
-        reperage = session.get(Reperage, id)
-        if reperage:
-            return jsonify(reperage.to_dict())
+    """Récupérer un repérage spécifique (If-None-Match / If-Modified-Since : 304 si inchangé)"""
+    session = db_session()
+    validators = reperage_validators(session, id)
+    if validators is None:
         return jsonify({'error': 'Repérage non trouvé'}), 404
-    finally:
-        session.close()
+    
+    def build():
+        reperage = session.get(Reperage, id, options=reperage_loader_options())
+        return jsonify(reperage.to_dict())
+    
+    etag = version_etag(Reperage, id, validators.version, validators.medias_version)
+    return conditional_response(etag, validators.updated_at, build)
 
 @app.route('/api/reperages', methods=['POST'])
 def create_reperage():
     """Créer un nouveau repérage"""
-    session = get_session(engine)
+    session = db_session()
     try:
         data = request.json
         
@@ -150,23 +605,24 @@ def create_reperage():
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/reperages/<int:id>', methods=['PUT'])
 def update_reperage(id):
     """Mettre à jour un repérage"""
-    session = get_session(engine)
+    session = db_session()
     try:
         reperage = session.get(Reperage, id)
         if not reperage:
             return jsonify({'error': 'Repérage non trouvé'}), 404
         
         data = request.json
+        conflict = check_if_match(reperage, data)
+        if conflict:
+            return conflict
+        ancien_statut = reperage.statut
         
         # Mise à jour des champs simples
-        for field in ['langue_interface', 'fixer_nom', 'fixer_email', 'fixer_telephone', 
-                      'pays', 'region', 'statut']:
+        for field in REPERAGE_FIELDS:
             if field in data:
                 setattr(reperage, field, data[field])
         
@@ -176,97 +632,233 @@ def update_reperage(id):
         if 'episode_data' in data:
             reperage.episode_data = json.dumps(data['episode_data'])
         
-        # ✅ NOUVEAU : Mise à jour des gardiens
-        if 'gardiens' in data:
-            # Supprimer les anciens gardiens
-            session.query(Gardien).filter_by(reperage_id=id).delete()
-            
-            # Créer les nouveaux gardiens
-            for gardien_data in data['gardiens']:
-                gardien = Gardien(
-                    reperage_id=id,
-                    **gardien_data
-                )
-                session.add(gardien)
-        
-        # ✅ NOUVEAU : Mise à jour des lieux
-        if 'lieux' in data:
-            # Supprimer les anciens lieux
-            session.query(Lieu).filter_by(reperage_id=id).delete()
-            
-            # Créer les nouveaux lieux
-            for lieu_data in data['lieux']:
-                lieu = Lieu(
-                    reperage_id=id,
-                    **lieu_data
-                )
-                session.add(lieu)
+        # Gardiens et lieux : réconciliation par ordre / numero_lieu (les id restent stables)
+        # Sans autoflush : le repérage n'est écrit qu'une fois, au commit (une seule version)
+        with session.no_autoflush:
+            if 'gardiens' in data:
+                reconcile_children(session, Gardien, 'ordre', id, data['gardiens'], GARDIEN_FIELDS)
+            if 'lieux' in data:
+                reconcile_children(session, Lieu, 'numero_lieu', id, data['lieux'], LIEU_FIELDS)
         
         reperage.updated_at = datetime.now()
         session.commit()
+        if reperage.statut != ancien_statut:
+            notify_reperage(id, 'statut', {'statut': reperage.statut})
+        
+        response = jsonify(reperage.to_dict())
+        response.set_etag(version_etag(Reperage, id, reperage.version))
+        return response
+    except StaleDataError:
+        return stale_conflict(session, Reperage, id)
+    except ValueError as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def reconcile_children(session, model, key, reperage_id, items, fields, partial=False):
+    """
+    Réconcilier les gardiens ou lieux d'un repérage avec la liste reçue
+    Les lignes sont appariées par key (ordre / numero_lieu) : seules les colonnes modifiées
+    sont mises à jour, les nouvelles lignes insérées, les absentes supprimées
+    (partial=True : modifications partielles, seuls les éléments {'<key>': n, '_delete': true} sont supprimés)
+    Au plus un INSERT, un UPDATE et un DELETE groupés par table
+    Renvoie True si quelque chose a changé
+    """
+    # Ligne retenue par clé (la plus ancienne) ; doublons d'une même clé dans duplicates
+    existing, duplicates = {}, {}
+    for row in session.execute(
+        select(model.id, model.version, *[getattr(model, field) for field in fields])
+        .where(model.reperage_id == reperage_id)
+        .order_by(model.id)
+    ):
+        row = row._mapping
+        if row[key] in existing:
+            duplicates.setdefault(row[key], []).append(row['id'])
+        else:
+            existing[row[key]] = row
+    
+    inserts, updates, deleted_ids, seen = [], [], [], set()
+    for item in items:
+        if item.get(key) is None:
+            raise ValueError(f"{key} manquant")
+        if item[key] in seen:
+            raise ValueError(f"{key} en double: {item[key]}")
+        seen.add(item[key])
+        row = existing.get(item[key])
+        # Doublons en base pour cette clé : la ligne retenue les remplace
+        deleted_ids += duplicates.pop(item[key], [])
+        
+        if item.get('_delete'):
+            if row is not None:
+                deleted_ids.append(row['id'])
+            continue
+        
+        values = {field: value for field, value in item.items() if field in fields}
+        if row is None:
+            inserts.append({**values, 'reperage_id': reperage_id})
+            continue
+        
+        changes = {field: value for field, value in values.items() if row[field] != value}
+        if changes:
+            # version : UPDATE ... WHERE id = ? AND version = ?, incrémentée par l'ORM
+            updates.append({'id': row['id'], 'version': row['version'], **changes})
+    
+    if not partial:
+        deleted_ids += [row['id'] for value, row in existing.items() if value not in seen]
+        deleted_ids += [row_id for ids in duplicates.values() for row_id in ids]
+    
+    if deleted_ids:
+        session.execute(delete(model).where(model.id.in_(deleted_ids)))
+    if updates:
+        session.execute(update(model), updates)
+    if inserts:
+        session.execute(insert(model), inserts)
+    
+    return bool(inserts or updates or deleted_ids)
+
+@app.route('/api/reperages/<int:id>', methods=['PATCH'])
+def patch_reperage(id):
+    """
+    Mise à jour partielle d'un repérage (autosave) : seuls les champs modifiés sont envoyés
+    - territoire_data / episode_data : clés modifiées seulement (null supprime la clé)
+    - gardiens / lieux : modifications par ordre / numero_lieu (voir reconcile_children)
+    Les lignes inchangées ne sont ni réécrites ni recréées
+    """
+    session = db_session()
+    try:
+        reperage = session.get(Reperage, id)
+        if not reperage:
+            return jsonify({'error': 'Repérage non trouvé'}), 404
         
-        return jsonify(reperage.to_dict())
+        data = request.get_json(silent=True) or {}
+        conflict = check_if_match(reperage, data)
+        if conflict:
+            return conflict
+        ancien_statut = reperage.statut
+        
+        for field in REPERAGE_FIELDS:
+            if field in data and getattr(reperage, field) != data[field]:
+                setattr(reperage, field, data[field])
+        
+        for field in ['territoire_data', 'episode_data']:
+            if data.get(field):
+                values = json.loads(getattr(reperage, field)) if getattr(reperage, field) else {}
+                for key, value in data[field].items():
+                    if value is None:
+                        values.pop(key, None)
+                    else:
+                        values[key] = value
+                serialized = json.dumps(values)
+                if serialized != getattr(reperage, field):
+                    setattr(reperage, field, serialized)
+        
+        changed = bool(session.dirty)
+        # Sans autoflush : le repérage n'est écrit qu'une fois, au commit (une seule version)
+        with session.no_autoflush:
+            if data.get('gardiens'):
+                changed |= reconcile_children(session, Gardien, 'ordre', id, data['gardiens'], GARDIEN_FIELDS,
+                                              partial=True)
+            if data.get('lieux'):
+                changed |= reconcile_children(session, Lieu, 'numero_lieu', id, data['lieux'], LIEU_FIELDS,
+                                              partial=True)
+        
+        if changed:
+            reperage.updated_at = datetime.now()
+            session.commit()
+            if reperage.statut != ancien_statut:
+                notify_reperage(id, 'statut', {'statut': reperage.statut})
+        
+        # Réponse minimale : le client a déjà les données
+        response = jsonify({
+            'id': reperage.id,
+            'changed': changed,
+            'version': reperage.version,
+            'updated_at': reperage.updated_at.isoformat() if reperage.updated_at else None
+        })
+        response.set_etag(version_etag(Reperage, id, reperage.version))
+        return response
+    except StaleDataError:
+        return stale_conflict(session, Reperage, id)
+    except ValueError as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/reperages/<int:id>', methods=['DELETE'])
 def delete_reperage(id):
     """Supprimer un repérage"""
-    session = get_session(engine)
+    session = db_session()
     try:
         reperage = session.get(Reperage, id)
         if not reperage:
             return jsonify({'error': 'Repérage non trouvé'}), 404
+        conflict = check_if_match(reperage)
+        if conflict:
+            return conflict
         
+        # Médias supprimés par la cascade : leurs blobs et fichiers sont libérés avant
+        release_reperage_files(session, id)
         session.delete(reperage)
         session.commit()
         
         return jsonify({'message': 'Repérage supprimé'}), 200
+    except StaleDataError:
+        return stale_conflict(session, Reperage, id)
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/reperages/<int:id>/submit', methods=['POST'])
 def submit_reperage(id):
     """Soumettre un repérage (changer statut de brouillon à soumis)"""
-    session = get_session(engine)
+    session = db_session()
     try:
         reperage = session.get(Reperage, id)
         if not reperage:
             return jsonify({'error': 'Repérage non trouvé'}), 404
+        conflict = check_if_match(reperage)
+        if conflict:
+            return conflict
         
         reperage.statut = 'soumis'
         reperage.updated_at = datetime.now()
         session.commit()
+        notify_reperage(id, 'statut', {'statut': reperage.statut})
         
-        return jsonify(reperage.to_dict())
+        response = jsonify(reperage.to_dict())
+        response.set_etag(version_etag(Reperage, id, reperage.version))
+        return response
+    except StaleDataError:
+        return stale_conflict(session, Reperage, id)
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 # ============= API GARDIENS =============
 
 @app.route('/api/reperages/<int:reperage_id>/gardiens', methods=['GET'])
 def get_gardiens(reperage_id):
-    """Récupérer les gardiens d'un repérage"""
-    session = get_session(engine)
-    try:
+    """Récupérer les gardiens d'un repérage (304 si le repérage n'a pas changé)"""
+    session = db_session()
+    
+    def build():
         gardiens = session.query(Gardien).filter_by(reperage_id=reperage_id).order_by(Gardien.ordre).all()
         return jsonify([g.to_dict() for g in gardiens])
-    finally:
-        session.close()
+    
+    validators = reperage_validators(session, reperage_id)
+    if validators is None:
+        return build()
+    etag = f"gardiens-{reperage_id}-v{validators.version}"
+    return conditional_response(etag, validators.updated_at, build)
 
 @app.route('/api/reperages/<int:reperage_id>/gardiens', methods=['POST'])
 def create_gardien(reperage_id):
     """Créer un gardien"""
-    session = get_session(engine)
+    session = db_session()
     try:
         data = request.json
         
@@ -290,75 +882,83 @@ def create_gardien(reperage_id):
         )
         
         session.add(gardien)
+        touch_reperage(session, reperage_id)
         session.commit()
         
         return jsonify(gardien.to_dict()), 201
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/gardiens/<int:id>', methods=['PUT'])
 def update_gardien(id):
     """Mettre à jour un gardien"""
-    session = get_session(engine)
+    session = db_session()
     try:
         gardien = session.get(Gardien, id)
         if not gardien:
             return jsonify({'error': 'Gardien non trouvé'}), 404
         
         data = request.json
+        conflict = check_if_match(gardien, data)
+        if conflict:
+            return conflict
         
-        for field in ['ordre', 'nom', 'prenom', 'age', 'genre', 'fonction', 'savoir_transmis',
-                      'adresse', 'telephone', 'email', 'contact_intermediaire', 
-                      'histoire_personnelle', 'evaluation_cinegenie', 'langues_parlees', 'photo_url']:
+        for field in GARDIEN_FIELDS:
             if field in data:
                 setattr(gardien, field, data[field])
         
+        if session.dirty:
+            touch_reperage(session, gardien.reperage_id)
         session.commit()
-        return jsonify(gardien.to_dict())
+        response = jsonify(gardien.to_dict())
+        response.set_etag(version_etag(Gardien, id, gardien.version))
+        return response
+    except StaleDataError:
+        return stale_conflict(session, Gardien, id)
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/gardiens/<int:id>', methods=['DELETE'])
 def delete_gardien(id):
     """Supprimer un gardien"""
-    session = get_session(engine)
+    session = db_session()
     try:
         gardien = session.get(Gardien, id)
         if not gardien:
             return jsonify({'error': 'Gardien non trouvé'}), 404
         
         session.delete(gardien)
+        touch_reperage(session, gardien.reperage_id)
         session.commit()
         
         return jsonify({'message': 'Gardien supprimé'}), 200
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 # ============= API LIEUX =============
 
 @app.route('/api/reperages/<int:reperage_id>/lieux', methods=['GET'])
 def get_lieux(reperage_id):
-    """Récupérer les lieux d'un repérage"""
-    session = get_session(engine)
-    try:
+    """Récupérer les lieux d'un repérage (304 si le repérage n'a pas changé)"""
+    session = db_session()
+    
+    def build():
         lieux = session.query(Lieu).filter_by(reperage_id=reperage_id).all()
         return jsonify([l.to_dict() for l in lieux])
-    finally:
-        session.close()
+    
+    validators = reperage_validators(session, reperage_id)
+    if validators is None:
+        return build()
+    etag = f"lieux-{reperage_id}-v{validators.version}"
+    return conditional_response(etag, validators.updated_at, build)
 
 @app.route('/api/reperages/<int:reperage_id>/lieux', methods=['POST'])
 def create_lieu(reperage_id):
     """Créer un lieu"""
-    session = get_session(engine)
+    session = db_session()
     try:
         data = request.json
         
@@ -387,67 +987,162 @@ def create_lieu(reperage_id):
         )
         
         session.add(lieu)
+        touch_reperage(session, reperage_id)
         session.commit()
         
         return jsonify(lieu.to_dict()), 201
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/lieux/<int:id>', methods=['PUT'])
 def update_lieu(id):
     """Mettre à jour un lieu"""
-    session = get_session(engine)
+    session = db_session()
     try:
         lieu = session.get(Lieu, id)
         if not lieu:
             return jsonify({'error': 'Lieu non trouvé'}), 404
         
         data = request.json
+        conflict = check_if_match(lieu, data)
+        if conflict:
+            return conflict
         
-        for field in ['nom', 'type_environnement', 'description_visuelle', 'elements_symboliques',
-                      'points_vue_remarquables', 'cinegenie', 'axes_camera', 'moments_favorables',
-                      'ambiance_sonore', 'adequation_narration', 'accessibilite', 'securite',
-                      'electricite', 'espace_equipe', 'protection_meteo', 'contraintes_meteo',
-                      'autorisations_necessaires', 'latitude', 'longitude']:
+        for field in LIEU_FIELDS[1:]:
             if field in data:
                 setattr(lieu, field, data[field])
         
+        if session.dirty:
+            touch_reperage(session, lieu.reperage_id)
         session.commit()
-        return jsonify(lieu.to_dict())
+        response = jsonify(lieu.to_dict())
+        response.set_etag(version_etag(Lieu, id, lieu.version))
+        return response
+    except StaleDataError:
+        return stale_conflict(session, Lieu, id)
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/lieux/<int:id>', methods=['DELETE'])
 def delete_lieu(id):
     """Supprimer un lieu"""
-    session = get_session(engine)
+    session = db_session()
     try:
         lieu = session.get(Lieu, id)
         if not lieu:
             return jsonify({'error': 'Lieu non trouvé'}), 404
         
         session.delete(lieu)
+        touch_reperage(session, lieu.reperage_id)
         session.commit()
         
         return jsonify({'message': 'Lieu supprimé'}), 200
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 # ============= API MÉDIAS (UPLOAD) =============
 
+def upload_destination(reperage_id, filename):
+    """Nom unique et chemin du fichier uploadé dans le dossier du repérage (créé si besoin)"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    unique_filename = f"{timestamp}_{filename}"
+    reperage_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(reperage_id))
+    os.makedirs(reperage_folder, exist_ok=True)
+    return unique_filename, os.path.join(reperage_folder, unique_filename)
+
+def add_media(session, reperage_id, filename, blob, mime_type, form):
+    """
+    Enregistrer un média qui pointe vers un blob (référence déjà comptée)
+    Photo : images dérivées reprises d'un média identique, sinon générées en tâche de fond
+    """
+    # HEIC seulement si pillow-heif est installé
+    is_image = filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+    
+    media = Media(
+        reperage_id=reperage_id,
+        type='photo' if is_image else 'document',
+        categorie=form.get('categorie') or 'autre',
+        nom_fichier=os.path.basename(blob.chemin),
+        nom_original=filename,
+        chemin_fichier=os.path.join(app.config['UPLOAD_FOLDER'], blob.chemin),
+        taille_octets=blob.taille_octets,
+        mime_type=mime_type,
+        sha256=blob.sha256,
+        legende=form.get('legende', ''),
+        ordre_affichage=form.get('ordre_affichage', 0)
+    )
+    
+    if is_image:
+        media.derives = session.execute(
+            select(Media.derives)
+            .where(Media.sha256 == blob.sha256, Media.derives.like(f'%{Blob.folder(blob.sha256)}/%'))
+            .limit(1)
+        ).scalar()
+    
+    session.add(media)
+    touch_reperage(session, reperage_id)
+    if is_image and not media.derives:
+        # Générées en tâche de fond, après le commit
+        session.flush()
+        enqueue_job(session, 'thumbnail', {'media_id': media.id}, max_tentatives=2)
+    return media
+
+def create_media(session, reperage_id, filename, source_path, sha256, mime_type, form):
+    """Enregistrer le média d'un fichier reçu, rangé sous son contenu (doublon : fichier reçu supprimé)"""
+    extension = filename.rsplit('.', 1)[1]
+    blob = store_blob(session, app.config['UPLOAD_FOLDER'], source_path, sha256, extension)
+    return add_media(session, reperage_id, filename, blob, mime_type, form)
+
+def release_media_files(session, medias):
+    """
+    Fichiers des médias supprimés, effacés en tâche de fond après le commit
+    - fichiers propres au média (anciens uploads, images dérivées par média) : supprimés
+    - blob partagé : une référence en moins ; fichier et images dérivées effacés avec la dernière
+    """
+    upload_folder = app.config['UPLOAD_FOLDER']
+    fichiers, blobs = [], []
+    for media in medias:
+        fichiers.extend(media.derive_paths(upload_folder, shared=False))
+        if media.sha256 is None:
+            if media.chemin_fichier:
+                fichiers.append(media.chemin_fichier)
+            continue
+        relpath = release_reference(session, media.sha256)
+        if relpath:
+            blobs.append({'sha256': media.sha256,
+                          'fichiers': [os.path.join(upload_folder, relpath)] + media.derive_paths(upload_folder, shared=True)})
+    if fichiers:
+        enqueue_job(session, 'cleanup_files', {'fichiers': fichiers})
+    if blobs:
+        enqueue_job(session, 'release_blob', {'blobs': blobs})
+
+def release_reperage_files(session, reperage_id):
+    """
+    Repérage supprimé : références des blobs libérées, uploads en cours abandonnés, fichiers
+    et dossiers du repérage effacés en tâche de fond après le commit
+    Renvoie ses médias (lignes supprimées par l'appelant ou par la cascade)
+    """
+    medias = session.query(Media).filter_by(reperage_id=reperage_id).all()
+    release_media_files(session, medias)
+    
+    uploads = session.query(UploadSession).filter_by(reperage_id=reperage_id).all()
+    for upload in uploads:
+        upload_hashes.forget(upload.id)
+    session.execute(delete(UploadSession).where(UploadSession.reperage_id == reperage_id))
+    
+    enqueue_job(session, 'cleanup_files', {
+        'fichiers': [upload.chemin_fichier for upload in uploads],
+        'dossiers': [os.path.join(app.config['UPLOAD_FOLDER'], str(reperage_id)), derives_folder(reperage_id)]
+    })
+    return medias
+
 @app.route('/api/reperages/<int:reperage_id>/medias', methods=['POST'])
 def upload_media(reperage_id):
     """Upload un fichier (photo, document)"""
-    session = get_session(engine)
+    session = db_session()
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'Aucun fichier'}), 400
@@ -460,41 +1155,14 @@ def upload_media(reperage_id):
         if file and allowed_file(file.filename):
             # Sécuriser le nom de fichier
             filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_filename = f"{timestamp}_{filename}"
-            
-            # Créer le dossier du repérage
-            reperage_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(reperage_id))
-            os.makedirs(reperage_folder, exist_ok=True)
-            
-            # Sauvegarder le fichier
-            filepath = os.path.join(reperage_folder, unique_filename)
-            file.save(filepath)
+            _, filepath = upload_destination(reperage_id, filename)
             
-            # Créer miniature si c'est une image
-            is_image = filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'webp'}
-            thumbnail_path = None
-            
-            if is_image:
-                thumbnail_filename = f"thumb_{unique_filename}"
-                thumbnail_path = os.path.join(app.config['UPLOAD_FOLDER'], 'thumbnails', thumbnail_filename)
-                create_thumbnail(filepath, thumbnail_path)
+            # Sauvegarder le fichier (SHA-256 calculé pendant l'écriture)
+            sha256 = save_stream(file.stream, filepath + '.part')
             
             # Enregistrer en base de données
-            media = Media(
-                reperage_id=reperage_id,
-                type='photo' if is_image else 'document',
-                categorie=request.form.get('categorie', 'autre'),
-                nom_fichier=unique_filename,
-                nom_original=filename,
-                chemin_fichier=filepath,
-                taille_octets=os.path.getsize(filepath),
-                mime_type=file.content_type,
-                legende=request.form.get('legende', ''),
-                ordre_affichage=request.form.get('ordre_affichage', 0)
-            )
-            
-            session.add(media)
+            media = create_media(session, reperage_id, filename, filepath + '.part', sha256,
+                                 file.content_type, request.form)
             session.commit()
             
             return jsonify(media.to_dict()), 201
@@ -504,60 +1172,333 @@ def upload_media(reperage_id):
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
+
+# ============= API UPLOADS REPRENABLES =============
+
+def upload_status(upload, status=200):
+    """État d'une session d'upload : offset à reprendre (JSON et en-tête Upload-Offset)"""
+    data = upload.to_dict()
+    data['upload_url'] = f"/api/uploads/{upload.id}"
+    data['chunk_size'] = UPLOAD_CHUNK_SIZE
+    response = jsonify(data)
+    response.status_code = status
+    response.headers['Upload-Offset'] = str(upload.octets_recus)
+    response.cache_control.no_store = True
+    return response
+
+def purge_upload_sessions(session):
+    """Sessions inactives depuis UPLOAD_SESSION_TTL : supprimées, fichiers partiels effacés en tâche de fond"""
+    limit = datetime.now() - timedelta(seconds=UPLOAD_SESSION_TTL)
+    expired = session.execute(
+        select(UploadSession.id, UploadSession.chemin_fichier).where(UploadSession.updated_at < limit)
+    ).all()
+    if expired:
+        enqueue_job(session, 'cleanup_files', {'fichiers': [row.chemin_fichier + '.part' for row in expired]})
+        session.execute(delete(UploadSession).where(UploadSession.id.in_([row.id for row in expired])))
+
+@app.route('/api/reperages/<int:reperage_id>/uploads', methods=['POST'])
+def create_upload(reperage_id):
+    """
+    Ouvrir un upload reprenable
+    JSON : nom, taille (octets), mime_type, categorie, legende, ordre_affichage,
+    sha256 (optionnel, calculé par le client)
+    Réponse 201 : upload_id, upload_url, offset (0) et taille de morceau conseillée ;
+    contenu déjà stocké (sha256 et taille connus) : média créé immédiatement (deduplique: true)
+    """
+    session = db_session()
+    try:
+        data = request.get_json(silent=True) or {}
+        if not session.get(Reperage, reperage_id):
+            return jsonify({'error': 'Repérage non trouvé'}), 404
+        
+        filename = secure_filename(data.get('nom') or '')
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Type de fichier non autorisé'}), 400
+        try:
+            taille = int(data.get('taille'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Taille invalide'}), 400
+        if taille <= 0 or taille > MAX_FILE_SIZE:
+            return jsonify({'error': 'Fichier trop volumineux'}), 413
+        
+        # Doublon : le fichier n'est pas renvoyé, le média pointe vers le blob existant
+        sha256 = (data.get('sha256') or '').lower()
+        blob = session.get(Blob, sha256) if sha256 else None
+        if blob is not None and blob.taille_octets == taille:
+            media = add_media(session, reperage_id, filename, add_reference(session, sha256),
+                              data.get('mime_type'), data)
+            session.commit()
+            result = media.to_dict()
+            result['deduplique'] = True
+            return jsonify(result), 201
+        
+        purge_upload_sessions(session)
+        
+        # Quota : fichiers déjà enregistrés + uploads en cours (taille annoncée)
+        used = session.execute(
+            select(func.coalesce(func.sum(Media.taille_octets), 0)).where(Media.reperage_id == reperage_id)
+        ).scalar() + session.execute(
+            select(func.coalesce(func.sum(UploadSession.taille_totale), 0))
+            .where(UploadSession.reperage_id == reperage_id)
+        ).scalar()
+        if used + taille > UPLOAD_QUOTA_REPERAGE:
+            return jsonify({'error': 'Quota de stockage du repérage atteint'}), 413
+        
+        unique_filename, filepath = upload_destination(reperage_id, filename)
+        open(filepath + '.part', 'wb').close()
+        
+        upload = UploadSession(
+            id=secrets.token_hex(16),
+            reperage_id=reperage_id,
+            nom_original=filename,
+            nom_fichier=unique_filename,
+            chemin_fichier=filepath,
+            mime_type=data.get('mime_type'),
+            categorie=data.get('categorie'),
+            legende=data.get('legende', ''),
+            ordre_affichage=data.get('ordre_affichage', 0),
+            taille_totale=taille
+        )
+        session.add(upload)
+        session.commit()
+        
+        return upload_status(upload, 201)
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Offset déjà reçu (reprise après une coupure) ; HEAD : en-tête Upload-Offset seul"""
+    upload = db_session().get(UploadSession, upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload non trouvé ou expiré'}), 404
+    return upload_status(upload)
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Recevoir un morceau : corps brut, en-tête Upload-Offset (octets déjà reçus selon le client)
+    - offset différent de celui du serveur : 409 avec l'offset à reprendre
+    - morceau trop grand ou dépassant la taille annoncée : 413
+    Un morceau interrompu par une coupure est conservé jusqu'au dernier octet reçu
+    """
+    session = db_session()
+    try:
+        upload = session.get(UploadSession, upload_id)
+        if upload is None:
+            return jsonify({'error': 'Upload non trouvé ou expiré'}), 404
+        
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return jsonify({'error': 'En-tête Upload-Offset manquant ou invalide'}), 400
+        length = request.content_length
+        if length is None:
+            return jsonify({'error': 'Content-Length requis'}), 411
+        if length > UPLOAD_CHUNK_MAX or offset + length > upload.taille_totale:
+            return jsonify({'error': 'Morceau trop volumineux'}), 413
+        
+        with upload_hashes.lock(upload_id):
+            session.refresh(upload)  # Morceau précédent écrit par un autre thread
+            if offset != upload.octets_recus:
+                return upload_status(upload, 409)
+            
+            part_path = upload.chemin_fichier + '.part'
+            # Transaction terminée avant de lire le corps : pas de connexion BDD tenue
+            # pendant le transfert du morceau
+            session.commit()
+            hasher = upload_hashes.at(upload_id, part_path, offset)
+            written, disconnected = append_chunk(part_path, offset, request.stream, hasher)
+            
+            # Offset avancé seulement s'il n'a pas bougé entre-temps (autre processus),
+            # dans une transaction courte
+            saved = session.execute(
+                update(UploadSession)
+                .where(UploadSession.id == upload_id, UploadSession.octets_recus == offset)
+                .values(octets_recus=offset + written, updated_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+            if saved:
+                upload_hashes.store(upload_id, hasher, offset + written)
+            session.refresh(upload)
+        
+        if disconnected:
+            print(f"⚠️ Upload {upload_id} interrompu à {upload.octets_recus}/{upload.taille_totale} octets")
+        return upload_status(upload, 200 if saved else 409)
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>/finaliser', methods=['POST'])
+def finalize_upload(upload_id):
+    """
+    Terminer un upload complet : fichier mis en place, média créé (201)
+    JSON optionnel : sha256 calculé par le client, vérifié avant la création du média
+    (différent : 422, l'upload reprend à zéro)
+    """
+    session = db_session()
+    try:
+        data = request.get_json(silent=True) or {}
+        upload = session.get(UploadSession, upload_id)
+        if upload is None:
+            return jsonify({'error': 'Upload non trouvé ou expiré'}), 404
+        
+        with upload_hashes.lock(upload_id):
+            session.refresh(upload)
+            if upload.octets_recus != upload.taille_totale:
+                return upload_status(upload, 409)
+            
+            part_path = upload.chemin_fichier + '.part'
+            sha256 = upload_hashes.at(upload_id, part_path, upload.octets_recus).hexdigest()
+            if data.get('sha256') and data['sha256'].lower() != sha256:
+                open(part_path, 'wb').close()
+                upload.octets_recus = 0
+                session.commit()
+                upload_hashes.store(upload_id, hashlib.sha256(), 0)
+                response = upload_status(upload, 422)
+                response.headers['X-Upload-Error'] = 'sha256'
+                return response
+            
+            media = create_media(session, upload.reperage_id, upload.nom_original, part_path, sha256,
+                                 upload.mime_type,
+                                 {'categorie': upload.categorie, 'legende': upload.legende,
+                                  'ordre_affichage': upload.ordre_affichage})
+            session.delete(upload)
+            session.commit()
+        upload_hashes.forget(upload_id)
+        
+        result = media.to_dict()
+        result['sha256'] = sha256
+        return jsonify(result), 201
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abandonner un upload : session et fichier partiel supprimés"""
+    session = db_session()
+    try:
+        upload = session.get(UploadSession, upload_id)
+        if upload is None:
+            return jsonify({'error': 'Upload non trouvé ou expiré'}), 404
+        
+        with upload_hashes.lock(upload_id):
+            part_path = upload.chemin_fichier + '.part'
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            session.delete(upload)
+            session.commit()
+        upload_hashes.forget(upload_id)
+        
+        return jsonify({'message': 'Upload annulé'}), 200
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/reperages/<int:reperage_id>/medias', methods=['GET'])
 def get_medias(reperage_id):
-    """Récupérer les médias d'un repérage"""
-    session = get_session(engine)
-    try:
+    """Récupérer les médias d'un repérage (304 si le repérage n'a pas changé)"""
+    session = db_session()
+    
+    def build():
         medias = session.query(Media).filter_by(reperage_id=reperage_id).all()
         return jsonify([m.to_dict() for m in medias])
-    finally:
-        session.close()
+    
+    validators = reperage_validators(session, reperage_id)
+    if validators is None:
+        return build()
+    etag = f"medias-{reperage_id}-v{validators.version}-m{validators.medias_version}"
+    return conditional_response(etag, validators.updated_at, build)
 
 @app.route('/api/medias/<int:id>', methods=['DELETE'])
 def delete_media(id):
     """Supprimer un média"""
-    session = get_session(engine)
+    session = db_session()
     try:
         media = session.get(Media, id)
         if not media:
             return jsonify({'error': 'Média non trouvé'}), 404
         
-        # Supprimer le fichier physique
-        if os.path.exists(media.chemin_fichier):
-            os.remove(media.chemin_fichier)
+        # Fichiers supprimés en tâche de fond (blob partagé : seulement avec sa dernière référence)
+        release_media_files(session, [media])
         
         session.delete(media)
+        touch_reperage(session, media.reperage_id)
         session.commit()
         
         return jsonify({'message': 'Média supprimé'}), 200
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 # ============= API MESSAGES (CHAT) =============
 
 @app.route('/api/reperages/<int:reperage_id>/messages', methods=['GET'])
 def get_messages(reperage_id):
-    """Récupérer tous les messages d'un repérage"""
-    session = get_session(engine)
+    """
+    Récupérer les messages d'un repérage (ordre chronologique)
+    - after_id : seulement les messages postérieurs (polling incrémental)
+    - since : seulement les messages créés après cette date (ISO 8601)
+    - before_id : historique antérieur à ce message (chargement vers le haut)
+    - limit : nombre maximum de messages (les plus récents de la plage) ;
+      l'en-tête X-Has-More vaut 1 s'il reste des messages plus anciens
+    Sans paramètre, le fil complet est renvoyé
+    ETag : nombre de messages, dernier id et nombre de lus (une requête agrégée sur l'index),
+    combinés aux paramètres ; pas de Last-Modified, un accusé de lecture ne change aucune date
+    """
+    session = db_session()
     try:
-        messages = session.query(Message).filter_by(reperage_id=reperage_id).order_by(Message.created_at.asc()).all()
-        return jsonify([msg.to_dict() for msg in messages])
+        state = session.execute(
+            select(func.count(Message.id), func.max(Message.id), func.count(Message.id).filter(Message.lu == True))
+            .where(Message.reperage_id == reperage_id)
+        ).one()
+        params = hashlib.md5(request.query_string).hexdigest()[:8]
+        etag = f"messages-{reperage_id}-{state[0]}-{state[1] or 0}-{state[2]}-{params}"
+        if is_not_modified(etag):
+            return conditional_response(etag)
+        
+        query = session.query(Message).filter(Message.reperage_id == reperage_id)
+        
+        after_id = request.args.get('after_id', type=int)
+        if after_id is not None:
+            query = query.filter(Message.id > after_id)
+        
+        before_id = request.args.get('before_id', type=int)
+        if before_id is not None:
+            query = query.filter(Message.id < before_id)
+        
+        if request.args.get('since'):
+            since = parse_iso_datetime(request.args['since'])
+            if since is None:
+                return jsonify({'error': 'since invalide (format ISO 8601 attendu)'}), 400
+            query = query.filter(Message.created_at > since)
+        
+        limit = request.args.get('limit', type=int)
+        if limit is None:
+            messages = query.order_by(Message.id.asc()).all()
+            has_more = False
+        else:
+            # Les plus récents d'abord pour appliquer la limite, puis remis dans l'ordre
+            limit = max(1, min(limit, PAGE_SIZE_MAX))
+            messages = query.order_by(Message.id.desc()).limit(limit + 1).all()
+            has_more = len(messages) > limit
+            messages = list(reversed(messages[:limit]))
+        
+        response = jsonify([msg.to_dict() for msg in messages])
+        response.headers['X-Has-More'] = '1' if has_more else '0'
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/reperages/<int:reperage_id>/messages', methods=['POST'])
 def create_message(reperage_id):
     """Créer un nouveau message"""
-    session = get_session(engine)
+    session = db_session()
     try:
         data = request.json
         
@@ -576,18 +1517,17 @@ def create_message(reperage_id):
         
         session.add(message)
         session.commit()
+        notify_reperage(reperage_id, 'nouveau_message', message.to_dict())
         
         return jsonify(message.to_dict()), 201
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/api/messages/<int:message_id>/read', methods=['PUT'])
 def mark_message_read(message_id):
     """Marquer un message comme lu"""
-    session = get_session(engine)
+    session = db_session()
     try:
         message = session.get(Message, message_id)
         if not message:
@@ -595,18 +1535,53 @@ def mark_message_read(message_id):
         
         message.lu = True
         session.commit()
+        notify_reperage(message.reperage_id, 'messages_lus', {'ids': [message.id], 'auteur_type': message.auteur_type})
         
         return jsonify(message.to_dict())
     except Exception as e:
         session.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
+
+@app.route('/api/reperages/<int:reperage_id>/messages/read', methods=['PUT'])
+def mark_messages_read(reperage_id):
+    """
+    Marquer comme lus, en une seule requête UPDATE, les messages de l'autre partie
+    jusqu'au message up_to_id inclus
+    - for : 'fixer' (marque les messages de la production) ou 'admin'/'production'
+    """
+    session = db_session()
+    try:
+        data = request.get_json(silent=True) or {}
+        lecteur = data.get('for', request.args.get('for', 'fixer'))
+        up_to_id = data.get('up_to_id', request.args.get('up_to_id'))
+        try:
+            up_to_id = int(up_to_id)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'up_to_id requis'}), 400
+        
+        # Messages de l'autre partie
+        source = 'production' if lecteur == 'fixer' else 'fixer'
+        
+        updated = session.query(Message).filter(
+            Message.reperage_id == reperage_id,
+            Message.auteur_type == source,
+            Message.lu == False,
+            Message.id <= up_to_id
+        ).update({Message.lu: True}, synchronize_session=False)
+        session.commit()
+        
+        if updated:
+            notify_reperage(reperage_id, 'messages_lus', {'up_to_id': up_to_id, 'auteur_type': source})
+        
+        return jsonify({'updated': updated})
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/reperages/<int:reperage_id>/messages/unread-count', methods=['GET'])
 def get_unread_count(reperage_id):
     """Compter les messages non lus d'un repérage"""
-    session = get_session(engine)
+    session = db_session()
     try:
         # Déterminer si c'est production ou fixer qui demande
         auteur_type = request.args.get('for', 'fixer')  # 'production' ou 'fixer'
@@ -630,87 +1605,194 @@ def get_unread_count(reperage_id):
         return jsonify({'count': count})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
+
+@app.route('/api/reperages/<int:reperage_id>/events', methods=['GET'])
+def reperage_events(reperage_id):
+    """Flux SSE d'un repérage : nouveau_message, messages_lus, statut"""
+    session = db_session()
+    if not session.get(Reperage, reperage_id):
+        return jsonify({'error': 'Repérage non trouvé'}), 404
+    return sse_response([f'reperage:{reperage_id}'])
+
+@app.route('/admin/events', methods=['GET'])
+def admin_events():
+    """Flux SSE admin : événements de tous les repérages (badges du dashboard)"""
+    return sse_response(['admin'])
+
+@app.route('/api/messages/unread-counts', methods=['GET'])
+def get_unread_counts():
+    """
+    Compter les messages non lus de plusieurs repérages en une seule requête GROUP BY
+    - for : 'fixer' ou 'admin'/'production' (même sens que unread-count)
+    - ids : liste optionnelle d'IDs séparés par des virgules (tous les repérages sinon)
+    Seuls les repérages ayant des messages non lus figurent dans 'counts'
+    """
+    session = db_session()
+    try:
+        auteur_type = request.args.get('for', 'fixer')
+        # Messages de l'autre partie
+        source = 'production' if auteur_type == 'fixer' else 'fixer'
+        
+        query = session.query(Message.reperage_id, func.count(Message.id)).filter(
+            Message.auteur_type == source,
+            Message.lu == False
+        )
+        
+        if request.args.get('ids'):
+            try:
+                ids = [int(i) for i in request.args['ids'].split(',') if i.strip()]
+            except ValueError:
+                return jsonify({'error': 'ids invalides'}), 400
+            query = query.filter(Message.reperage_id.in_(ids))
+        
+        counts = query.group_by(Message.reperage_id).all()
+        return jsonify({'counts': {str(reperage_id): count for reperage_id, count in counts}})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # ============= FICHIERS STATIQUES =============
 
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    """Servir les fichiers uploadés"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """
+    Servir les fichiers uploadés
+    - Range (lecture et reprise des vidéos), ETag fort, 304 si le fichier n'a pas changé
+    - blobs/ : le nom est le SHA-256 du contenu, mis en cache sans revalidation (immutable)
+    - MEDIA_OFFLOAD : le proxy envoie le fichier (X-Accel-Redirect / X-Sendfile), le worker ne
+      renvoie que les en-têtes
+    """
+    path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        return "Fichier non trouvé", 404
+    
+    stat = os.stat(path)
+    immutable = Blob.is_shared(filename)
+    # Nom du blob (contenu) ou taille + date exacte : ne change que si le contenu change
+    etag = os.path.basename(filename) if immutable else f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    
+    if MEDIA_OFFLOAD in ('x-accel', 'x-sendfile'):
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        response = response.make_conditional(request)
+        if response.status_code == 200:
+            # Le proxy gère lui-même Range et la longueur du fichier
+            if MEDIA_OFFLOAD == 'x-accel':
+                response.headers['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + url_quote(filename)
+            else:
+                response.headers['X-Sendfile'] = os.path.abspath(path)
+    else:
+        # Fichier entier : wsgi.file_wrapper (sendfile de gunicorn) ; Range : seulement les octets demandés
+        response = send_file(os.path.abspath(path), etag=etag, last_modified=stat.st_mtime, conditional=True)
+        response.accept_ranges = 'bytes'  # Annoncé dès la première réponse : les lecteurs vidéo peuvent chercher
+    
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = MEDIA_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True  # Revalidation par ETag à chaque usage
+    return response
 
 # ============= DASHBOARD ADMIN =============
 
+def dashboard_rows(session, args):
+    """
+    Page du tableau admin (repérage + fixer) selon les filtres statut, pays, search
+    Tri par date de création décroissante, pagination keyset sur (created_at, id)
+    Retourne (lignes, curseur suivant ou None) ; lève ValueError si le curseur est invalide
+    """
+    from models import Fixer
+    query = session.query(Reperage, Fixer).outerjoin(Fixer, Reperage.fixer_id == Fixer.id)
+    
+    statut_filter = args.get('statut')
+    if statut_filter:
+        query = query.filter(Reperage.statut == statut_filter)
+    
+    pays_filter = args.get('pays')
+    if pays_filter:
+        query = query.filter(Reperage.pays == pays_filter)
+    
+    search = args.get('search')
+    if search:
+        query = query.filter(
+            (Reperage.region.like(f'%{search}%')) |
+            (Reperage.fixer_nom.like(f'%{search}%'))
+        )
+    
+    if args.get('cursor'):
+        cursor_created_at, cursor_id = decode_cursor(args['cursor'])
+        query = query.filter(or_(
+            Reperage.created_at < cursor_created_at,
+            and_(Reperage.created_at == cursor_created_at, Reperage.id < cursor_id)
+        ))
+    
+    results = query.order_by(Reperage.created_at.desc(), Reperage.id.desc()).limit(DASHBOARD_PAGE_SIZE + 1).all()
+    has_more = len(results) > DASHBOARD_PAGE_SIZE
+    results = results[:DASHBOARD_PAGE_SIZE]
+    
+    # Créer liste avec reperage + fixer
+    reperages_with_fixer = []
+    for reperage, fixer in results:
+        rep_dict = {
+            'reperage': reperage,
+            'fixer': fixer,
+            'lien_formulaire': fixer.lien_personnel if fixer else None
+        }
+        reperages_with_fixer.append(rep_dict)
+    
+    next_cursor = None
+    if has_more:
+        last = results[-1][0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return reperages_with_fixer, next_cursor
+
 @app.route('/admin')
 def admin_dashboard():
-    """Dashboard admin - liste des repérages"""
-    session = get_session(engine)
+    """Dashboard admin - première page des repérages, la suite est chargée au défilement"""
+    session = db_session()
+    # Statistiques (compteurs maintenus, voir models.CompteurStatut)
+    stats = get_reperage_stats(session)
+    
+    # Première page uniquement : temps de rendu borné quel que soit le nombre de repérages
+    args = {k: v for k, v in request.args.items() if k != 'cursor'}
+    reperages_with_fixer, next_cursor = dashboard_rows(session, args)
+    
+    # Liste des pays pour le filtre
+    pays_list = session.query(Reperage.pays).filter(Reperage.pays.isnot(None)).distinct().all()
+    pays_list = [p[0] for p in pays_list]
+    
+    # Liste des fixers pour modal création
+    from models import Fixer
+    fixers = session.query(Fixer).order_by(Fixer.nom, Fixer.prenom).all()
+    
+    return render_template('admin_dashboard.html', 
+                         reperages=reperages_with_fixer, 
+                         next_cursor=next_cursor,
+                         stats=stats,
+                         pays_list=pays_list,
+                         fixers=fixers)
+
+@app.route('/admin/reperages/rows')
+def admin_dashboard_rows():
+    """Lignes suivantes du tableau admin (défilement), mêmes filtres que /admin"""
+    session = db_session()
     try:
-        # Statistiques
-        total = session.query(Reperage).count()
-        brouillons = session.query(Reperage).filter_by(statut='brouillon').count()
-        soumis = session.query(Reperage).filter_by(statut='soumis').count()
-        valides = session.query(Reperage).filter_by(statut='validé').count()
-        
-        stats = {
-            'total': total,
-            'brouillons': brouillons,
-            'soumis': soumis,
-            'valides': valides
-        }
-        
-        # Filtres avec jointure sur Fixer
-        from models import Fixer
-        query = session.query(Reperage, Fixer).outerjoin(Fixer, Reperage.fixer_id == Fixer.id)
-        
-        statut_filter = request.args.get('statut')
-        if statut_filter:
-            query = query.filter(Reperage.statut == statut_filter)
-        
-        pays_filter = request.args.get('pays')
-        if pays_filter:
-            query = query.filter(Reperage.pays == pays_filter)
-        
-        search = request.args.get('search')
-        if search:
-            query = query.filter(
-                (Reperage.region.like(f'%{search}%')) |
-                (Reperage.fixer_nom.like(f'%{search}%'))
-            )
-        
-        results = query.order_by(Reperage.created_at.desc()).all()
-        
-        # Créer liste avec reperage + fixer
-        reperages_with_fixer = []
-        for reperage, fixer in results:
-            rep_dict = {
-                'reperage': reperage,
-                'fixer': fixer,
-                'lien_formulaire': fixer.lien_personnel if fixer else None
-            }
-            reperages_with_fixer.append(rep_dict)
-        
-        # Liste des pays pour le filtre
-        pays_list = session.query(Reperage.pays).filter(Reperage.pays.isnot(None)).distinct().all()
-        pays_list = [p[0] for p in pays_list]
-        
-        # Liste des fixers pour modal création
-        from models import Fixer
-        fixers = session.query(Fixer).order_by(Fixer.nom, Fixer.prenom).all()
-        
-        return render_template('admin_dashboard.html', 
-                             reperages=reperages_with_fixer, 
-                             stats=stats,
-                             pays_list=pays_list,
-                             fixers=fixers)
-    finally:
-        session.close()
+        reperages_with_fixer, next_cursor = dashboard_rows(session, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'html': render_template('_admin_dashboard_rows.html', reperages=reperages_with_fixer),
+        'count': len(reperages_with_fixer),
+        'next_cursor': next_cursor
+    })
 
 @app.route('/admin/reperages/create', methods=['POST'])
 def admin_create_reperage():
     """Créer un nouveau repérage depuis le dashboard admin"""
-    session = get_session(engine)
+    session = db_session()
     try:
         data = request.get_json()
         
@@ -749,13 +1831,11 @@ def admin_create_reperage():
         session.rollback()
         print(f"Erreur création repérage: {e}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/admin/reperages/<int:reperage_id>/update', methods=['PUT'])
 def admin_update_reperage(reperage_id):
     """Modifier un repérage depuis le dashboard admin"""
-    session = get_session(engine)
+    session = db_session()
     try:
         data = request.get_json()
         
@@ -763,6 +1843,9 @@ def admin_update_reperage(reperage_id):
         reperage = session.query(Reperage).filter_by(id=reperage_id).first()
         if not reperage:
             return jsonify({'error': 'Repérage non trouvé'}), 404
+        conflict = check_if_match(reperage, data)
+        if conflict:
+            return conflict
         
         # Récupérer le fixer
         from models import Fixer
@@ -778,90 +1861,94 @@ def admin_update_reperage(reperage_id):
         reperage.fixer_prenom = fixer.prenom
         reperage.fixer_email = fixer.email
         reperage.fixer_telephone = fixer.telephone
+        ancien_statut = reperage.statut
         reperage.statut = data.get('statut', 'brouillon')
         reperage.notes_admin = data.get('notes_admin')
         reperage.image_region = data.get('image_region')
         
         session.commit()
+        if reperage.statut != ancien_statut:
+            notify_reperage(reperage_id, 'statut', {'statut': reperage.statut})
         
         return jsonify({
             'success': True,
             'message': 'Repérage modifié avec succès'
         }), 200
         
+    except StaleDataError:
+        return stale_conflict(session, Reperage, reperage_id)
     except Exception as e:
         session.rollback()
         print(f"Erreur modification repérage: {e}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        session.close()
 
 @app.route('/admin/reperage/<int:id>')
 def admin_reperage_detail(id):
     """Vue détaillée d'un repérage"""
     from models import Fixer
-    session = get_session(engine)
-    try:
-        reperage = session.query(Reperage).filter_by(id=id).first()
-        if not reperage:
-            return "Repérage non trouvé", 404
-        
-        # Parser les données JSON
-        territoire = json.loads(reperage.territoire_data) if reperage.territoire_data else {}
-        episode = json.loads(reperage.episode_data) if reperage.episode_data else {}
-        
-        gardiens = session.query(Gardien).filter_by(reperage_id=id).order_by(Gardien.ordre).all()
-        lieux = session.query(Lieu).filter_by(reperage_id=id).all()
-        medias = session.query(Media).filter_by(reperage_id=id).all()
-        
-        # Récupérer le fixer associé
-        fixer = None
-        if reperage.fixer_id:
-            fixer = session.query(Fixer).filter_by(id=reperage.fixer_id).first()
-        
-        return render_template('admin_reperage_detail.html',
-                             reperage=reperage,
-                             territoire=territoire,
-                             episode=episode,
-                             gardiens=gardiens,
-                             lieux=lieux,
-                             medias=medias,
-                             fixer=fixer)
-    finally:
-        session.close()
+    session = db_session()
+    reperage = session.query(Reperage).filter_by(id=id).first()
+    if not reperage:
+        return "Repérage non trouvé", 404
+    
+    # Parser les données JSON
+    territoire = json.loads(reperage.territoire_data) if reperage.territoire_data else {}
+    episode = json.loads(reperage.episode_data) if reperage.episode_data else {}
+    
+    gardiens = session.query(Gardien).filter_by(reperage_id=id).order_by(Gardien.ordre).all()
+    lieux = session.query(Lieu).filter_by(reperage_id=id).all()
+    medias = session.query(Media).filter_by(reperage_id=id).all()
+    
+    # Récupérer le fixer associé
+    fixer = None
+    if reperage.fixer_id:
+        fixer = session.query(Fixer).filter_by(id=reperage.fixer_id).first()
+    
+    return render_template('admin_reperage_detail.html',
+                         reperage=reperage,
+                         territoire=territoire,
+                         episode=episode,
+                         gardiens=gardiens,
+                         lieux=lieux,
+                         medias=medias,
+                         fixer=fixer)
 
 @app.route('/admin/reperage/<int:id>/valider', methods=['POST'])
 def admin_valider_reperage(id):
     """Valider un repérage"""
-    session = get_session(engine)
-    try:
-        reperage = session.query(Reperage).filter_by(id=id).first()
-        if reperage:
-            reperage.statut = 'validé'
-            reperage.updated_at = datetime.now()
+    session = db_session()
+    reperage = session.query(Reperage).filter_by(id=id).first()
+    if reperage:
+        reperage.statut = 'validé'
+        reperage.updated_at = datetime.now()
+        try:
             session.commit()
-        return redirect(f'/admin/reperage/{id}')
-    finally:
-        session.close()
+        except StaleDataError:
+            # Sauvegarde du fixer au même moment : rien n'est écrit, 409 avec la version relue
+            return stale_conflict(session, Reperage, id)
+        notify_reperage(id, 'statut', {'statut': reperage.statut})
+    return redirect(f'/admin/reperage/{id}')
 
 @app.route('/admin/reperage/<int:id>/rouvrir', methods=['POST'])
 def admin_rouvrir_reperage(id):
     """Rouvrir un repérage pour modifications (passe en brouillon)"""
-    session = get_session(engine)
-    try:
-        reperage = session.query(Reperage).filter_by(id=id).first()
-        if reperage:
-            reperage.statut = 'brouillon'
-            reperage.updated_at = datetime.now()
+    session = db_session()
+    reperage = session.query(Reperage).filter_by(id=id).first()
+    if reperage:
+        reperage.statut = 'brouillon'
+        reperage.updated_at = datetime.now()
+        try:
             session.commit()
-        return redirect(f'/admin/reperage/{id}')
-    finally:
-        session.close()
+        except StaleDataError:
+            # Sauvegarde du fixer au même moment : rien n'est écrit, 409 avec la version relue
+            return stale_conflict(session, Reperage, id)
+        notify_reperage(id, 'statut', {'statut': reperage.statut})
+    return redirect(f'/admin/reperage/{id}')
 
 @app.route('/admin/reperage/<int:id>/supprimer', methods=['POST'])
 def admin_supprimer_reperage(id):
     """Supprimer un repérage et tous ses médias"""
-    session = get_session(engine)
+    session = db_session()
     try:
         reperage = session.query(Reperage).filter_by(id=id).first()
         if not reperage:
@@ -878,16 +1965,11 @@ def admin_supprimer_reperage(id):
         except Exception as e:
             print(f"   ⚠️ Erreur suppression messages: {e}")
         
-        # 2. Supprimer tous les médias associés
+        # 2. Supprimer tous les médias associés et les uploads en cours
+        #    (fichiers physiques : tâche de fond après le commit, blobs partagés conservés)
         try:
-            medias = session.query(Media).filter_by(reperage_id=id).all()
+            medias = release_reperage_files(session, id)
             for media in medias:
-                # Supprimer le fichier physique
-                try:
-                    if os.path.exists(media.chemin_fichier):
-                        os.remove(media.chemin_fichier)
-                except:
-                    pass
                 session.delete(media)
             print(f"   ✅ {len(medias)} médias supprimés")
         except Exception as e:
@@ -911,17 +1993,7 @@ def admin_supprimer_reperage(id):
         except Exception as e:
             print(f"   ⚠️ Erreur suppression lieux: {e}")
         
-        # 5. Supprimer le dossier uploads du repérage
-        try:
-            reperage_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(id))
-            if os.path.exists(reperage_folder):
-                import shutil
-                shutil.rmtree(reperage_folder)
-                print(f"   ✅ Dossier uploads supprimé")
-        except Exception as e:
-            print(f"   ⚠️ Erreur suppression dossier: {e}")
-        
-        # 6. Supprimer le repérage
+        # 5. Supprimer le repérage
         session.delete(reperage)
         session.commit()
         print(f"✅ Repérage ID {id} supprimé avec succès!")
@@ -933,250 +2005,471 @@ def admin_supprimer_reperage(id):
         import traceback
         traceback.print_exc()
         return f"Erreur lors de la suppression: {e}", 500
+
+# ============= CACHE DES PDF =============
+
+def pdf_cache_key(validators):
+    """Version du contenu d'un repérage pour le cache PDF (repérage, enfants, médias, mise en page)"""
+    return f"v{validators.version}-m{validators.medias_version}-l{PDF_LAYOUT_VERSION}"
+
+def pdf_filename(reperage):
+    """Nom de fichier proposé au téléchargement"""
+    filename = f"RootsKeepers_{reperage.region or 'X'}_{reperage.pays or 'X'}_{datetime.now().strftime('%Y%m%d')}.pdf"
+    return secure_filename(filename)
+
+@event.listens_for(Reperage, 'after_update')
+@event.listens_for(Reperage, 'after_delete')
+def pdf_reperage_modifie(mapper, connection, target):
+    """Repérage modifié (directement ou via touch_reperage) : son PDF en cache est périmé"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('pdf_perimes', set()).add(target.id)
+
+@event.listens_for(Media, 'after_update')
+def pdf_media_modifie(mapper, connection, target):
+    """Images dérivées enregistrées par une tâche : le PDF (photos intégrées) est périmé"""
+    session = object_session(target)
+    if session is not None and target.reperage_id:
+        session.info.setdefault('pdf_perimes', set()).add(target.reperage_id)
+
+@event.listens_for(db_session, 'before_commit')
+def pdf_invalider(session):
+    """Au commit : PDF périmés supprimés du cache, nouveau PDF pré-rendu pour les repérages validés"""
+    session.flush()
+    reperage_ids = session.info.pop('pdf_perimes', None)
+    if not reperage_ids:
+        return
+    for reperage_id in reperage_ids:
+        pdf_cache.invalidate(reperage_id)
+    valides = session.execute(
+        select(Reperage.id).where(Reperage.id.in_(reperage_ids), Reperage.statut == 'validé')
+    ).scalars().all()
+    for reperage_id in valides:
+        enqueue_job(session, 'pdf', {'reperage_id': reperage_id, 'prerendu': True}, max_tentatives=2)
+
+@event.listens_for(db_session, 'after_rollback')
+def pdf_annuler(session):
+    session.info.pop('pdf_perimes', None)
+
+def media_pdf_path(media):
+    """Image à intégrer au PDF : dérivée 'pdf' (déjà réduite) si elle existe, sinon l'original"""
+    derives = json.loads(media.derives) if media.derives else {}
+    if derives.get('pdf'):
+        return os.path.join(app.config['UPLOAD_FOLDER'], derives['pdf']['jpeg'])
+    return media.chemin_fichier
+
+def reperage_pdf_data(session, reperage):
+    """
+    Données du PDF d'un repérage (dict sérialisable, rendu dans le pool de processus)
+    Photos portrait / lieu rattachées par ordre_affichage (= ordre du gardien, numéro du lieu)
+    ou par photo_url du gardien ; les autres vont en annexe
+    """
+    gardiens = session.query(Gardien).filter_by(reperage_id=reperage.id).order_by(Gardien.ordre).all()
+    lieux = session.query(Lieu).filter_by(reperage_id=reperage.id).order_by(Lieu.numero_lieu).all()
+    photos = session.query(Media).filter(
+        Media.reperage_id == reperage.id,
+        Media.type == 'photo',
+        Media.categorie.in_(('portrait', 'lieu'))
+    ).order_by(Media.ordre_affichage, Media.id).all()
+    
+    rattachees = set()
+    def photos_de(medias):
+        rattachees.update(m.id for m in medias)
+        return [media_pdf_path(m) for m in medias]
+    
+    gardiens_data = []
+    for gardien in gardiens:
+        data = gardien.to_dict()
+        data['photos'] = photos_de([
+            m for m in photos if m.categorie == 'portrait'
+            and (m.ordre_affichage == gardien.ordre
+                 or (gardien.photo_url and gardien.photo_url.endswith(m.fichier_url())))
+        ])
+        gardiens_data.append(data)
+    
+    lieux_data = []
+    for lieu in lieux:
+        data = lieu.to_dict()
+        data['photos'] = photos_de([m for m in photos if m.categorie == 'lieu' and m.ordre_affichage == lieu.numero_lieu])
+        lieux_data.append(data)
+    
+    return {
+        'reperage': {
+            'id': reperage.id,
+            'region': reperage.region,
+            'pays': reperage.pays,
+            'fixer_nom': reperage.fixer_nom,
+            'fixer_email': reperage.fixer_email,
+            'fixer_telephone': reperage.fixer_telephone,
+            'statut': reperage.statut,
+            'date': reperage.created_at.strftime('%d/%m/%Y') if reperage.created_at else None
+        },
+        'territoire': json.loads(reperage.territoire_data) if reperage.territoire_data else {},
+        'episode': json.loads(reperage.episode_data) if reperage.episode_data else {},
+        'gardiens': gardiens_data,
+        'lieux': lieux_data,
+        'photos_annexes': [media_pdf_path(m) for m in photos if m.id not in rattachees]
+    }
+
+def render_pdf_to_cache(reperage_id, key, data):
+    """Rendre le PDF (données déjà lues en base) dans le pool de processus et le mettre en cache ; renvoie son chemin"""
+    path, _ = pdf_cache.put(reperage_id, key, lambda output: run_in_process_pool(
+        render_reperage_pdf, data, output, PDF_SETTINGS))
+    return path
+
+@register_job('pdf')
+def job_generer_pdf(payload):
+    """
+    Tâche : PDF d'un repérage, rendu dans le cache (rien à faire s'il y est déjà pour cette version)
+    prerendu : repérage validé modifié, le PDF est prêt avant d'être demandé
+    """
+    session = db_session()
+    try:
+        reperage_id = payload['reperage_id']
+        validators = reperage_validators(session, reperage_id)
+        if validators is None:
+            if payload.get('prerendu'):
+                return None  # Supprimé entre-temps
+            raise ValueError(f"Repérage {reperage_id} non trouvé")
+        
+        reperage = session.get(Reperage, reperage_id)
+        key = pdf_cache_key(validators)
+        path = pdf_cache.get(reperage_id, key)
+        if path is None:
+            path = render_pdf_to_cache(reperage_id, key, reperage_pdf_data(session, reperage))
+        # cache : fichier géré par l'éviction du cache, pas par la purge des tâches
+        return {'fichier': path, 'nom': pdf_filename(reperage), 'mimetype': 'application/pdf', 'cache': True}
     finally:
-        session.close()
+        db_session.remove()
 
 @app.route('/admin/reperage/<int:id>/pdf')
 def admin_generate_pdf(id):
-    """Générer un PDF du repérage - VERSION AMÉLIORÉE"""
+    """
+    PDF du repérage : envoyé directement s'il est en cache pour la version courante,
+    sinon généré en tâche de fond (202 + URL de suivi de la tâche)
+    """
+    session = db_session()
+    validators = reperage_validators(session, id)
+    if validators is None:
+        return "Repérage non trouvé", 404
+    
+    path = pdf_cache.get(id, pdf_cache_key(validators))
+    if path:
+        reperage = session.get(Reperage, id, options=[load_only(Reperage.region, Reperage.pays)])
+        return send_file(os.path.abspath(path), mimetype='application/pdf', as_attachment=True,
+                         download_name=pdf_filename(reperage))
+    
+    job = enqueue_job(session, 'pdf', {'reperage_id': id}, max_tentatives=2)
+    session.commit()
+    return job_accepted(job)
+
+# ============= EXPORTS GROUPÉS =============
+
+EXPORT_FORMATS = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+
+def export_reperage_ids(session, args):
+    """
+    Repérages d'un export groupé : liste ids=1,2,3 et / ou filtres pays, statut, search, fixer_id,
+    date_debut / date_fin (date de création, ISO 8601, bornes incluses)
+    Lève ValueError si un paramètre est invalide
+    """
+    query = session.query(Reperage.id)
+    if args.get('ids'):
+        try:
+            ids = [int(i) for i in args['ids'].split(',') if i.strip()]
+        except ValueError:
+            raise ValueError('ids invalides')
+        query = query.filter(Reperage.id.in_(ids))
+    
+    if args.get('pays'):
+        query = query.filter(Reperage.pays == args['pays'])
+    if args.get('statut'):
+        query = query.filter(Reperage.statut == args['statut'])
+    if args.get('search'):
+        query = query.filter(
+            (Reperage.region.like(f"%{args['search']}%")) |
+            (Reperage.fixer_nom.like(f"%{args['search']}%"))
+        )
+    if args.get('fixer_id'):
+        try:
+            query = query.filter(Reperage.fixer_id == int(args['fixer_id']))
+        except ValueError:
+            raise ValueError('fixer_id invalide')
+    for param in ('date_debut', 'date_fin'):
+        if args.get(param):
+            value = parse_iso_datetime(args[param])
+            if value is None:
+                raise ValueError(f'{param} invalide (format ISO 8601 attendu)')
+            if param == 'date_debut':
+                query = query.filter(Reperage.created_at >= value)
+            elif len(args[param]) == 10:
+                query = query.filter(Reperage.created_at < value + timedelta(days=1))  # Jour entier
+            else:
+                query = query.filter(Reperage.created_at <= value)
+    
+    return [row.id for row in query.order_by(Reperage.pays, Reperage.region, Reperage.id).limit(PDF_EXPORT_MAX + 1)]
+
+@app.route('/admin/reperages/export')
+def admin_export_reperages():
+    """
+    Export groupé en tâche de fond (202 + URL de suivi, avancement dans 'progression')
+    format=pdf : un PDF avec table des matières ; format=zip : un PDF par repérage
+    Mêmes filtres que le tableau admin (voir export_reperage_ids)
+    """
+    session = db_session()
+    fmt = request.args.get('format', 'pdf')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format invalide ({', '.join(EXPORT_FORMATS)})"}), 400
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-        from reportlab.lib.units import cm
-        from reportlab.lib.enums import TA_CENTER
-        from io import BytesIO
-    except ImportError as e:
-        print(f"❌ ERREUR: ReportLab non installé - {e}")
-        return f"Erreur: ReportLab n'est pas installé. Exécutez: pip install reportlab --break-system-packages", 500
-    
-    session = get_session(engine)
+        reperage_ids = export_reperage_ids(session, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not reperage_ids:
+        return jsonify({'error': 'Aucun repérage ne correspond aux filtres'}), 404
+    if len(reperage_ids) > PDF_EXPORT_MAX:
+        return jsonify({'error': f'Plus de {PDF_EXPORT_MAX} repérages : affinez les filtres'}), 400
+    
+    job = enqueue_job(session, 'pdf_batch', {'reperage_ids': reperage_ids, 'format': fmt}, max_tentatives=2)
+    session.commit()
+    return job_accepted(job)
+
+def export_pdfs_zip(session, reperages, output):
+    """
+    ZIP d'un PDF par repérage : PDF du cache s'il est à jour, sinon rendus en parallèle
+    (un thread par processus du pool, chacun passe par le cache comme admin_generate_pdf)
+    """
+    a_rendre = []
+    entries = {}
+    for reperage in reperages:
+        key = pdf_cache_key(reperage_validators(session, reperage.id))
+        entries[reperage.id] = (f"{reperage.id}_{pdf_filename(reperage)}", pdf_cache.get(reperage.id, key))
+        if entries[reperage.id][1] is None:
+            a_rendre.append((reperage.id, key, reperage_pdf_data(session, reperage)))
+    
+    total = len(reperages)
+    faits = total - len(a_rendre)
+    report_progress(engine, faits, total)
+    
+    def render(reperage_id, key, data):
+        return reperage_id, render_pdf_to_cache(reperage_id, key, data)
+    
+    with ThreadPoolExecutor(max_workers=PROCESS_POOL_SIZE) as executor:
+        for future in as_completed([executor.submit(render, *item) for item in a_rendre]):
+            reperage_id, path = future.result()
+            entries[reperage_id] = (entries[reperage_id][0], path)
+            faits += 1
+            report_progress(engine, faits, total)
+    
+    with open(output, 'wb') as f:
+        for chunk in stream_zip(entries[reperage.id] for reperage in reperages):
+            f.write(chunk)
+
+def export_pdf_combine(session, reperages, output):
+    """
+    PDF unique avec table des matières : photos réduites en parallèle (un repérage par processus),
+    puis mise en page de l'ensemble en un seul rendu
+    """
+    total = len(reperages) + 1  # + la mise en page
+    futures = [submit_to_process_pool(prepare_photos, reperage_pdf_data(session, reperage), PDF_SETTINGS)
+               for reperage in reperages]
+    for faits, _ in enumerate(as_completed(futures), start=1):
+        report_progress(engine, faits, total)
+    
+    datas = [future.result() for future in futures]
+    subtitle = f"Dossier de {len(reperages)} repérage(s) - {datetime.now().strftime('%d/%m/%Y')}"
+    run_in_process_pool(render_batch_pdf, datas, output, PDF_SETTINGS, subtitle)
+    report_progress(engine, total, total)
+
+@register_job('pdf_batch')
+def job_export_reperages(payload):
+    """Tâche : export groupé de repérages (PDF avec table des matières ou ZIP de PDF)"""
+    session = db_session()
     try:
-        reperage = session.query(Reperage).filter_by(id=id).first()
-        if not reperage:
-            return "Repérage non trouvé", 404
-        
-        # Créer le PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm, leftMargin=2*cm, rightMargin=2*cm)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Styles personnalisés
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=28,
-            textColor=colors.HexColor('#FF6B35'),
-            spaceAfter=10,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Normal'],
-            fontSize=14,
-            textColor=colors.HexColor('#666666'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#FF6B35'),
-            spaceAfter=12,
-            spaceBefore=20,
-            fontName='Helvetica-Bold'
-        )
-        
-        subheading_style = ParagraphStyle(
-            'CustomSubheading',
-            parent=styles['Heading3'],
-            fontSize=12,
-            textColor=colors.HexColor('#FF8C5A'),
-            spaceAfter=8,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
+        reperages = session.query(Reperage).filter(Reperage.id.in_(payload['reperage_ids'])) \
+            .order_by(Reperage.pays, Reperage.region, Reperage.id).all()
+        if not reperages:
+            raise ValueError("Aucun des repérages demandés n'existe encore")
+        
+        fmt = payload.get('format', 'pdf')
+        output = os.path.join(JOBS_FOLDER, f"export_{secrets.token_hex(8)}.{fmt}")
+        if fmt == 'zip':
+            export_pdfs_zip(session, reperages, output)
+        else:
+            export_pdf_combine(session, reperages, output)
         
-        # TITRE PRINCIPAL
-        story.append(Paragraph("ROOTSKEEPERS", title_style))
-        story.append(Paragraph("Les Gardiens de la Tradition", subtitle_style))
-        story.append(Spacer(1, 0.5*cm))
-        
-        # ORDRE CORRECT: RÉGION → PAYS → FIXER
-        story.append(Paragraph("INFORMATIONS PRINCIPALES", heading_style))
-        data = [
-            ['Région:', reperage.region or '-'],
-            ['Pays:', reperage.pays or '-'],
-            ['Fixer:', reperage.fixer_nom or '-'],
-            ['Email:', reperage.fixer_email or '-'],
-            ['Téléphone:', reperage.fixer_telephone or '-'],
-            ['Statut:', reperage.statut],
-            ['Date:', reperage.created_at.strftime('%d/%m/%Y') if reperage.created_at else '-'],
-        ]
-        t = Table(data, colWidths=[4*cm, 12*cm])
-        t.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('LINEABOVE', (0, 0), (-1, 0), 1, colors.HexColor('#FF6B35')),
-            ('LINEBELOW', (0, -1), (-1, -1), 1, colors.HexColor('#FF6B35')),
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 0.8*cm))
-        
-        # TERRITOIRE
-        territoire = json.loads(reperage.territoire_data) if reperage.territoire_data else {}
-        if territoire:
-            story.append(Paragraph("TERRITOIRE", heading_style))
-            for key, value in territoire.items():
-                if value and key != 'id':
-                    label = key.replace('_', ' ').title()
-                    story.append(Paragraph(f"<b>{label}:</b> {value}", styles['Normal']))
-                    story.append(Spacer(1, 0.2*cm))
-            story.append(Spacer(1, 0.5*cm))
-        
-        # ÉPISODE
-        episode = json.loads(reperage.episode_data) if reperage.episode_data else {}
-        if episode:
-            story.append(Paragraph("ÉPISODE", heading_style))
-            for key, value in episode.items():
-                if value and key != 'id':
-                    label = key.replace('_', ' ').title()
-                    story.append(Paragraph(f"<b>{label}:</b> {value}", styles['Normal']))
-                    story.append(Spacer(1, 0.2*cm))
-            story.append(Spacer(1, 0.5*cm))
-        
-        # GARDIENS
-        gardiens = session.query(Gardien).filter_by(reperage_id=id).order_by(Gardien.ordre).all()
-        if gardiens:
-            story.append(Paragraph(f"LES 3 GARDIENS", heading_style))
-            for g in gardiens:
-                story.append(Paragraph(f"Gardien {g.ordre}", subheading_style))
-                if g.prenom or g.nom:
-                    story.append(Paragraph(f"<b>Nom:</b> {g.prenom or ''} {g.nom or ''}", styles['Normal']))
-                if g.age:
-                    story.append(Paragraph(f"<b>Âge:</b> {g.age} ans", styles['Normal']))
-                if g.genre:
-                    story.append(Paragraph(f"<b>Genre:</b> {g.genre}", styles['Normal']))
-                if g.fonction:
-                    story.append(Paragraph(f"<b>Fonction:</b> {g.fonction}", styles['Normal']))
-                if g.savoir_transmis:
-                    story.append(Paragraph(f"<b>Savoir transmis:</b> {g.savoir_transmis}", styles['Normal']))
-                if g.telephone or g.email:
-                    story.append(Paragraph(f"<b>Contact:</b> {g.telephone or ''} {g.email or ''}", styles['Normal']))
-                story.append(Spacer(1, 0.5*cm))
-        
-        # LES 3 LIEUX
-        lieux = session.query(Lieu).filter_by(reperage_id=id).order_by(Lieu.numero_lieu).all()
-        if lieux:
-            story.append(PageBreak())
-            story.append(Paragraph(f"LIEUX DE TOURNAGE ({len(lieux)})", heading_style))
-            
-            for lieu in lieux:
-                story.append(Paragraph(f"Lieu {lieu.numero_lieu}: {lieu.nom or 'Sans nom'}", subheading_style))
-                
-                if lieu.type_environnement:
-                    story.append(Paragraph(f"<b>Type:</b> {lieu.type_environnement}", styles['Normal']))
-                
-                if lieu.description_visuelle:
-                    story.append(Paragraph(f"<b>Description:</b> {lieu.description_visuelle}", styles['Normal']))
-                
-                if lieu.elements_symboliques:
-                    story.append(Paragraph(f"<b>Éléments symboliques:</b> {lieu.elements_symboliques}", styles['Normal']))
-                
-                if lieu.cinegenie:
-                    story.append(Paragraph(f"<b>Cinégénie:</b> {lieu.cinegenie}", styles['Normal']))
-                
-                if lieu.axes_camera:
-                    story.append(Paragraph(f"<b>Axes caméra:</b> {lieu.axes_camera}", styles['Normal']))
-                
-                if lieu.accessibilite:
-                    story.append(Paragraph(f"<b>Accessibilité:</b> {lieu.accessibilite}", styles['Normal']))
-                
-                if lieu.securite:
-                    story.append(Paragraph(f"<b>Sécurité:</b> {lieu.securite}", styles['Normal']))
-                
-                if lieu.autorisations_necessaires:
-                    story.append(Paragraph(f"<b>Autorisations:</b> {lieu.autorisations_necessaires}", styles['Normal']))
-                
-                story.append(Spacer(1, 0.7*cm))
-        
-        # Construire le PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        # Nom du fichier
-        filename = f"RootsKeepers_{reperage.region or 'X'}_{reperage.pays or 'X'}_{datetime.now().strftime('%Y%m%d')}.pdf"
-        filename = secure_filename(filename)
-        
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
-    except Exception as e:
-        print(f"❌ ERREUR GÉNÉRATION PDF: {e}")
-        import traceback
-        traceback.print_exc()
-        return f"Erreur lors de la génération du PDF: {str(e)}", 500
+        nom = f"RootsKeepers_export_{len(reperages)}_reperages_{datetime.now().strftime('%Y%m%d')}.{fmt}"
+        return {'fichier': output, 'nom': nom, 'mimetype': EXPORT_FORMATS[fmt], 'nb_reperages': len(reperages)}
     finally:
-        session.close()
+        db_session.remove()
+
+# Catégories de l'archive des médias (les vidéos sont enregistrées comme documents)
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi'}
+ARCHIVE_CATEGORIES = ('photos', 'videos', 'documents')
+
+def media_archive_category(media):
+    if media.type == 'photo':
+        return 'photos'
+    extension = media.nom_original.rsplit('.', 1)[-1].lower() if media.nom_original else ''
+    return 'videos' if extension in VIDEO_EXTENSIONS else 'documents'
 
 @app.route('/admin/reperage/<int:id>/photos')
 def admin_download_photos(id):
-    """Télécharger toutes les photos d'un repérage en ZIP"""
-    import zipfile
-    from io import BytesIO
+    """
+    Télécharger les photos d'un repérage en ZIP, envoyé pendant sa construction (mémoire constante)
+    ?inclure=videos,documents : ajoute ces catégories (un dossier par catégorie dans l'archive)
+    """
+    session = db_session()
+    if not session.query(Reperage.id).filter_by(id=id).first():
+        return "Repérage non trouvé", 404
     
-    session = get_session(engine)
-    try:
-        reperage = session.query(Reperage).filter_by(id=id).first()
-        if not reperage:
-            return "Repérage non trouvé", 404
-        
-        medias = session.query(Media).filter_by(reperage_id=id, type='photo').all()
-        
-        if not medias:
-            return "Aucune photo trouvée", 404
-        
-        # Créer le ZIP
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for media in medias:
-                # Le chemin_fichier contient déjà le chemin complet
-                file_path = media.chemin_fichier
-                
-                print(f"🔍 Tentative d'ajout: {file_path}")
-                print(f"   Existe? {os.path.exists(file_path)}")
-                
-                if os.path.exists(file_path):
-                    zip_file.write(file_path, media.nom_original)
-                    print(f"   ✅ Ajouté au ZIP: {media.nom_original}")
-                else:
-                    print(f"   ❌ Fichier introuvable: {file_path}")
-        
-        zip_buffer.seek(0)
-        
-        # Nom du fichier ZIP
-        filename = f"PHOTOS_REPERAGE_{id}_{datetime.now().strftime('%Y%m%d')}.zip"
-        
-        return send_file(
-            zip_buffer,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename
-        )
-    finally:
-        session.close()
+    categories = {'photos'} | {c for c in request.args.get('inclure', '').split(',') if c in ARCHIVE_CATEGORIES}
+    medias = session.execute(
+        select(Media.type, Media.nom_original, Media.chemin_fichier)
+        .where(Media.reperage_id == id)
+        .order_by(Media.ordre_affichage, Media.id)
+    ).all()
+    
+    # Liste des fichiers lue avant l'envoi : la session est libérée pendant le transfert
+    entries = []
+    for media in medias:
+        category = media_archive_category(media)
+        if category in categories:
+            arcname = media.nom_original or os.path.basename(media.chemin_fichier)
+            entries.append((f"{category}/{arcname}" if len(categories) > 1 else arcname, media.chemin_fichier))
+    if not entries:
+        return "Aucune photo trouvée", 404
+    
+    prefix = 'PHOTOS' if categories == {'photos'} else 'MEDIAS'
+    filename = f"{prefix}_REPERAGE_{id}_{datetime.now().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_zip(entries),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/admin/reperage/<int:id>/pack')
+def admin_download_pack(id):
+    """
+    Pack production d'un repérage en un seul ZIP, envoyé pendant sa construction (mémoire constante) :
+    PDF, fiche complète (reperage.json), fil de discussion (messages.json) et tous les médias
+    rangés par catégorie (medias/<categorie>/...)
+    """
+    session = db_session()
+    validators = reperage_validators(session, id)
+    if validators is None:
+        return "Repérage non trouvé", 404
+    
+    # Tout est lu avant l'envoi : la session est libérée pendant le transfert
+    reperage = session.get(Reperage, id, options=reperage_loader_options())
+    fiche = json.dumps(reperage.to_dict(), ensure_ascii=False, indent=2).encode('utf-8')
+    messages = session.query(Message).filter_by(reperage_id=id).order_by(Message.id).all()
+    fil = json.dumps([m.to_dict() for m in messages], ensure_ascii=False, indent=2).encode('utf-8')
+    
+    medias = []
+    for media in sorted(reperage.medias, key=lambda m: (m.ordre_affichage or 0, m.id)):
+        category = secure_filename(media.categorie or '') or media_archive_category(media)
+        arcname = media.nom_original or os.path.basename(media.chemin_fichier)
+        medias.append((f"medias/{category}/{arcname}", media.chemin_fichier))
+    
+    pdf_key = pdf_cache_key(validators)
+    pdf_name = pdf_filename(reperage)
+    # Données du PDF lues seulement s'il n'est pas en cache pour cette version
+    pdf_data = None if pdf_cache.get(id, pdf_key) else reperage_pdf_data(session, reperage)
+    
+    def entries():
+        yield 'reperage.json', fiche
+        yield 'messages.json', fil
+        # PDF du cache, sinon rendu ici : le début de l'archive est déjà parti pendant le rendu
+        try:
+            path = pdf_cache.get(id, pdf_key)
+            if path is None:
+                if pdf_data is None:
+                    raise RuntimeError("PDF retiré du cache pendant l'envoi")
+                path = render_pdf_to_cache(id, pdf_key, pdf_data)
+            yield pdf_name, path
+        except Exception as e:
+            print(f"❌ PDF du pack repérage {id}: {e}")
+            yield 'PDF_INDISPONIBLE.txt', f"Le PDF n'a pas pu être généré : {e}".encode('utf-8')
+        yield from medias
+    
+    filename = f"PACK_REPERAGE_{id}_{datetime.now().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_zip(entries()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+# ============= TÂCHES DE FOND =============
+
+@app.route('/api/jobs/<int:job_id>')
+def get_job(job_id):
+    """État d'une tâche de fond"""
+    session = db_session()
+    job = session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Tâche non trouvée'}), 404
+    
+    data = job.to_dict()
+    # Chemin serveur du résultat : jamais exposé
+    if data['resultat']:
+        data['resultat'].pop('fichier', None)
+    if job.statut == 'termine' and job.resultat and 'fichier' in json.loads(job.resultat):
+        data['download_url'] = f'/api/jobs/{job.id}/download'
+    return jsonify(data)
+
+@app.route('/api/jobs/<int:job_id>/download')
+def download_job_result(job_id):
+    """Télécharger le fichier produit par une tâche terminée"""
+    session = db_session()
+    job = session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Tâche non trouvée'}), 404
+    if job.statut != 'termine':
+        return jsonify({'error': 'Tâche non terminée', 'statut': job.statut}), 409
+    
+    resultat = json.loads(job.resultat) if job.resultat else {}
+    if not resultat.get('fichier') or not os.path.exists(resultat['fichier']):
+        return jsonify({'error': 'Fichier expiré'}), 410
+    
+    return send_file(
+        os.path.abspath(resultat['fichier']),
+        mimetype=resultat.get('mimetype'),
+        as_attachment=True,
+        download_name=resultat.get('nom')
+    )
+
+@app.route('/admin/jobs')
+def admin_jobs():
+    """Dernières tâches de fond (filtres : statut, type)"""
+    session = db_session()
+    query = session.query(Job)
+    if request.args.get('statut'):
+        query = query.filter(Job.statut == request.args['statut'])
+    if request.args.get('type'):
+        query = query.filter(Job.type == request.args['type'])
+    
+    limit = max(1, min(request.args.get('limit', PAGE_SIZE_DEFAULT, type=int), PAGE_SIZE_MAX))
+    jobs = query.order_by(Job.id.desc()).limit(limit).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+@app.route('/admin/jobs/<int:job_id>/relancer', methods=['POST'])
+def admin_relancer_job(job_id):
+    """Remettre en attente une tâche en échec"""
+    session = db_session()
+    job = session.get(Job, job_id)
+    if not job:
+        return jsonify({'error': 'Tâche non trouvée'}), 404
+    if job.statut != 'echec':
+        return jsonify({'error': 'Seule une tâche en échec peut être relancée'}), 409
+    
+    job.statut = 'en_attente'
+    job.tentatives = 0
+    job.run_after = datetime.now()
+    job.finished_at = None
+    session.commit()
+    job_worker.notify()
+    return jsonify(job.to_dict())
 
 # ============= GESTION FIXERS =============
 
@@ -1184,47 +2477,44 @@ def admin_download_photos(id):
 def admin_fixers():
     """Gestion des fixers avec filtres enrichis"""
     from models import Fixer
-    session = get_session(engine)
-    try:
-        # Requête de base
-        query = session.query(Fixer)
-        
-        # Filtre par recherche (nom, prénom, société)
-        search = request.args.get('search')
-        if search:
-            query = query.filter(
-                (Fixer.nom.like(f'%{search}%')) |
-                (Fixer.prenom.like(f'%{search}%')) |
-                (Fixer.societe.like(f'%{search}%'))
-            )
-        
-        # Filtre par pays
-        pays_filter = request.args.get('pays')
-        if pays_filter:
-            query = query.filter(Fixer.pays == pays_filter)
-        
-        # Filtre par langue
-        langue_filter = request.args.get('langue')
-        if langue_filter:
-            query = query.filter(Fixer.langues_parlees.like(f'%{langue_filter}%'))
-        
-        # Filtre par statut
-        statut_filter = request.args.get('statut')
-        if statut_filter == 'actif':
-            query = query.filter(Fixer.actif == True)
-        elif statut_filter == 'inactif':
-            query = query.filter(Fixer.actif == False)
-        
-        # Récupérer les fixers
-        fixers = query.order_by(Fixer.created_at.desc()).all()
-        
-        # Liste des pays pour le filtre
-        pays_list = session.query(Fixer.pays).filter(Fixer.pays.isnot(None)).distinct().all()
-        pays_list = sorted([p[0] for p in pays_list if p[0]])
-        
-        return render_template('admin_fixers.html', fixers=fixers, pays_list=pays_list)
-    finally:
-        session.close()
+    session = db_session()
+    # Requête de base
+    query = session.query(Fixer)
+    
+    # Filtre par recherche (nom, prénom, société)
+    search = request.args.get('search')
+    if search:
+        query = query.filter(
+            (Fixer.nom.like(f'%{search}%')) |
+            (Fixer.prenom.like(f'%{search}%')) |
+            (Fixer.societe.like(f'%{search}%'))
+        )
+    
+    # Filtre par pays
+    pays_filter = request.args.get('pays')
+    if pays_filter:
+        query = query.filter(Fixer.pays == pays_filter)
+    
+    # Filtre par langue
+    langue_filter = request.args.get('langue')
+    if langue_filter:
+        query = query.filter(Fixer.langues_parlees.like(f'%{langue_filter}%'))
+    
+    # Filtre par statut
+    statut_filter = request.args.get('statut')
+    if statut_filter == 'actif':
+        query = query.filter(Fixer.actif == True)
+    elif statut_filter == 'inactif':
+        query = query.filter(Fixer.actif == False)
+    
+    # Récupérer les fixers
+    fixers = query.order_by(Fixer.created_at.desc()).all()
+    
+    # Liste des pays pour le filtre
+    pays_list = session.query(Fixer.pays).filter(Fixer.pays.isnot(None)).distinct().all()
+    pays_list = sorted([p[0] for p in pays_list if p[0]])
+    
+    return render_template('admin_fixers.html', fixers=fixers, pays_list=pays_list)
 
 @app.route('/admin/fixer/new', methods=['GET', 'POST'])
 def admin_create_fixer():
@@ -1238,7 +2528,7 @@ def admin_create_fixer():
         return render_template('admin_fixer_edit.html', fixer=None)
     
     # POST : Créer le fixer
-    session = get_session(engine)
+    session = db_session()
     try:
         # Récupérer les données de base
         prenom = request.form.get('prenom')
@@ -1306,128 +2596,119 @@ def admin_create_fixer():
         session.rollback()
         print(f"Erreur création fixer: {e}")
         return f"Erreur: {e}", 500
-    finally:
-        session.close()
 
 @app.route('/admin/fixer/<int:id>')
 def admin_fixer_detail(id):
     """Page détail d'un fixer"""
     from models import Fixer
     
-    session = get_session(engine)
-    try:
-        fixer = session.query(Fixer).filter_by(id=id).first()
-        if not fixer:
-            return "Fixer non trouvé", 404
-        
-        # Récupérer les repérages associés
-        reperages = session.query(Reperage).filter_by(fixer_id=id).order_by(Reperage.created_at.desc()).all()
-        
-        return render_template('admin_fixer_detail.html', fixer=fixer, reperages=reperages)
-    finally:
-        session.close()
+    session = db_session()
+    fixer = session.query(Fixer).filter_by(id=id).first()
+    if not fixer:
+        return "Fixer non trouvé", 404
+    
+    # Récupérer les repérages associés
+    reperages = session.query(Reperage).filter_by(fixer_id=id).order_by(Reperage.created_at.desc()).all()
+    
+    return render_template('admin_fixer_detail.html', fixer=fixer, reperages=reperages)
 
 @app.route('/admin/fixer/<int:id>/edit', methods=['GET', 'POST'])
 def admin_edit_fixer(id):
     """Modifier un fixer existant"""
     from models import Fixer
     
-    session = get_session(engine)
-    try:
-        fixer = session.query(Fixer).filter_by(id=id).first()
-        if not fixer:
-            return "Fixer non trouvé", 404
+    session = db_session()
+    fixer = session.query(Fixer).filter_by(id=id).first()
+    if not fixer:
+        return "Fixer non trouvé", 404
+    
+    if request.method == 'POST':
+        # Récupérer les langues parlées (checkboxes multiples)
+        langues_parlees_list = request.form.getlist('langues_parlees')
+        langues_parlees = ','.join(langues_parlees_list) if langues_parlees_list else None
         
-        if request.method == 'POST':
-            # Récupérer les langues parlées (checkboxes multiples)
-            langues_parlees_list = request.form.getlist('langues_parlees')
-            langues_parlees = ','.join(langues_parlees_list) if langues_parlees_list else None
-            
-            # Fonction helper pour convertir chaîne vide en None
-            def empty_to_none(value):
-                return value if value and value.strip() else None
-            
-            # Mettre à jour TOUS les champs
-            # Identité
-            fixer.prenom = request.form.get('prenom')
-            fixer.nom = request.form.get('nom')
-            fixer.email = request.form.get('email')
-            fixer.telephone = request.form.get('telephone')
-            fixer.telephone_2 = empty_to_none(request.form.get('telephone_2'))
-            
-            # Professionnel
-            fixer.societe = empty_to_none(request.form.get('societe'))
-            fixer.fonction = empty_to_none(request.form.get('fonction'))
-            fixer.site_web = empty_to_none(request.form.get('site_web'))
-            fixer.numero_siret = empty_to_none(request.form.get('numero_siret'))
-            
-            # Adresse
-            fixer.adresse_1 = empty_to_none(request.form.get('adresse_1'))
-            fixer.adresse_2 = empty_to_none(request.form.get('adresse_2'))
-            fixer.code_postal = empty_to_none(request.form.get('code_postal'))
-            fixer.ville = request.form.get('ville')
-            fixer.pays = request.form.get('pays')
-            fixer.region = empty_to_none(request.form.get('region'))
-            
-            # Profil
-            fixer.photo_profil_url = empty_to_none(request.form.get('photo_profil_url'))
-            fixer.bio = empty_to_none(request.form.get('bio'))
-            fixer.specialites = empty_to_none(request.form.get('specialites'))
-            
-            # Langues
-            fixer.langues_parlees = langues_parlees
-            fixer.langue_preferee = request.form.get('langue_preferee', 'FR')
-            
-            # Système
-            fixer.actif = bool(request.form.get('actif'))
-            fixer.notes_internes = empty_to_none(request.form.get('notes_internes'))
-            
-            try:
-                session.commit()
-                return redirect('/admin/fixers')
-            except Exception as e:
-                session.rollback()
-                print(f"❌ ERREUR SAUVEGARDE FIXER: {e}")
-                return f"Erreur lors de la sauvegarde: {e}", 500
-        
-        # GET: afficher le formulaire
-        return render_template('admin_fixer_edit.html', fixer=fixer)
-    finally:
-        session.close()
+        # Fonction helper pour convertir chaîne vide en None
+        def empty_to_none(value):
+            return value if value and value.strip() else None
+        
+        # Mettre à jour TOUS les champs
+        # Identité
+        fixer.prenom = request.form.get('prenom')
+        fixer.nom = request.form.get('nom')
+        fixer.email = request.form.get('email')
+        fixer.telephone = request.form.get('telephone')
+        fixer.telephone_2 = empty_to_none(request.form.get('telephone_2'))
+        
+        # Professionnel
+        fixer.societe = empty_to_none(request.form.get('societe'))
+        fixer.fonction = empty_to_none(request.form.get('fonction'))
+        fixer.site_web = empty_to_none(request.form.get('site_web'))
+        fixer.numero_siret = empty_to_none(request.form.get('numero_siret'))
+        
+        # Adresse
+        fixer.adresse_1 = empty_to_none(request.form.get('adresse_1'))
+        fixer.adresse_2 = empty_to_none(request.form.get('adresse_2'))
+        fixer.code_postal = empty_to_none(request.form.get('code_postal'))
+        fixer.ville = request.form.get('ville')
+        fixer.pays = request.form.get('pays')
+        fixer.region = empty_to_none(request.form.get('region'))
+        
+        # Profil
+        fixer.photo_profil_url = empty_to_none(request.form.get('photo_profil_url'))
+        fixer.bio = empty_to_none(request.form.get('bio'))
+        fixer.specialites = empty_to_none(request.form.get('specialites'))
+        
+        # Langues
+        fixer.langues_parlees = langues_parlees
+        fixer.langue_preferee = request.form.get('langue_preferee', 'FR')
+        
+        # Système
+        fixer.actif = bool(request.form.get('actif'))
+        fixer.notes_internes = empty_to_none(request.form.get('notes_internes'))
+        
+        try:
+            session.commit()
+            return redirect('/admin/fixers')
+        except Exception as e:
+            session.rollback()
+            print(f"❌ ERREUR SAUVEGARDE FIXER: {e}")
+            return f"Erreur lors de la sauvegarde: {e}", 500
+    
+    # GET: afficher le formulaire
+    return render_template('admin_fixer_edit.html', fixer=fixer)
 
 @app.route('/formulaire/<token>')
 def formulaire_reperage(token):
     """Formulaire pour un repérage spécifique (sécurisé par token)"""
     from models import Fixer
     
-    session = get_session(engine)
-    try:
-        # Récupérer le repérage par token
-        reperage = get_reperage_by_token_or_id(session, token)
-        if not reperage:
-            return "Repérage non trouvé", 404
-        
-        # Récupérer le fixer associé
-        fixer = session.query(Fixer).filter_by(id=reperage.fixer_id).first() if reperage.fixer_id else None
-        
-        if not fixer:
-            return "Aucun correspondant affecté à ce repérage", 404
-        
-        # Préparer données FIXER_DATA (avec infos du REPÉRAGE, pas du fixer)
-        FIXER_DATA = {
-            'prenom': fixer.prenom,
-            'nom': fixer.nom,
-            'email': fixer.email,
-            'telephone': fixer.telephone,
-            'pays': reperage.pays,  # ← REPÉRAGE, pas fixer
-            'region': reperage.region,  # ← REPÉRAGE, pas fixer
-            'langue_preferee': fixer.langue_preferee or 'FR',
-            'image_region': reperage.image_region if reperage.image_region else 'https://destinationsetcuisines.com/doc/multilingue/bannerreperage.jpg'
-        }
-        
-        return render_template('index.html', FIXER_DATA=FIXER_DATA, REPERAGE_ID=reperage.id)
-    finally:
-        session.close()
+    session = db_session()
+    # Récupérer le repérage par token
+    reperage = get_reperage_by_token_or_id(session, token)
+    if not reperage:
+        return "Repérage non trouvé", 404
+    
+    # Récupérer le fixer associé
+    fixer = session.query(Fixer).filter_by(id=reperage.fixer_id).first() if reperage.fixer_id else None
+    
+    if not fixer:
+        return "Aucun correspondant affecté à ce repérage", 404
+    
+    # Préparer données FIXER_DATA (avec infos du REPÉRAGE, pas du fixer)
+    FIXER_DATA = {
+        'prenom': fixer.prenom,
+        'nom': fixer.nom,
+        'email': fixer.email,
+        'telephone': fixer.telephone,
+        'pays': reperage.pays,  # ← REPÉRAGE, pas fixer
+        'region': reperage.region,  # ← REPÉRAGE, pas fixer
+        'langue_preferee': fixer.langue_preferee or 'FR',
+        'image_region': reperage.image_region if reperage.image_region else 'https://destinationsetcuisines.com/doc/multilingue/bannerreperage.jpg'
+    }
+    
+    return render_template('index.html', FIXER_DATA=FIXER_DATA, REPERAGE_ID=reperage.id,
+                         langue_default=FIXER_DATA['langue_preferee'],
+                         **i18n_context(FIXER_DATA['langue_preferee']))
 
 @app.route('/fixer/<path:fixer_slug>')
 def fixer_form(fixer_slug):
@@ -1440,42 +2721,45 @@ def fixer_form(fixer_slug):
     
     token = fixer_slug[-8:]  # Les 8 derniers caractères
     
-    session = get_session(engine)
-    try:
-        fixer = session.query(Fixer).filter_by(token_unique=token, actif=True).first()
-        if not fixer:
-            return "Fixer non trouvé ou inactif", 404
-        
-        # NOUVEAU : Chercher un repérage en brouillon existant pour ce fixer
-        fixer_email = fixer.email
-        reperage_existant = session.query(Reperage).filter_by(
-            fixer_email=fixer_email,
-            statut='brouillon'
-        ).order_by(Reperage.updated_at.desc()).first()
-        
-        # Si un brouillon existe, passer son ID au template
-        reperage_id = reperage_existant.id if reperage_existant else None
-        
-        # Préparer données FIXER_DATA avec image du repérage si disponible
-        fixer_data = {
-            'fixer_nom': fixer.nom,
-            'fixer_prenom': fixer.prenom,
-            'region': reperage_existant.region if reperage_existant else fixer.region,
-            'pays': reperage_existant.pays if reperage_existant else fixer.pays,
-            'image_region': reperage_existant.image_region if reperage_existant else None
-        }
-        
-        # Renvoyer le formulaire avec données pré-remplies
-        return render_template('index.html', 
-                             fixer_id=fixer.id,
-                             fixer_nom=f"{fixer.prenom} {fixer.nom}",
-                             fixer_email=fixer.email,
-                             fixer_telephone=fixer.telephone or '',
-                             langue_default=fixer.langue_preferee,
-                             reperage_id=reperage_id,
-                             FIXER_DATA=fixer_data)
-    finally:
-        session.close()
+    session = db_session()
+    fixer = session.query(Fixer).filter_by(token_unique=token, actif=True).first()
+    if not fixer:
+        return "Fixer non trouvé ou inactif", 404
+    
+    # NOUVEAU : Chercher un repérage en brouillon existant pour ce fixer
+    fixer_email = fixer.email
+    reperage_existant = session.query(Reperage).filter_by(
+        fixer_email=fixer_email,
+        statut='brouillon'
+    ).order_by(Reperage.updated_at.desc()).first()
+    
+    # Si un brouillon existe, passer son ID au template
+    reperage_id = reperage_existant.id if reperage_existant else None
+    
+    # Préparer données FIXER_DATA avec image du repérage si disponible
+    fixer_data = {
+        'fixer_nom': fixer.nom,
+        'fixer_prenom': fixer.prenom,
+        'region': reperage_existant.region if reperage_existant else fixer.region,
+        'pays': reperage_existant.pays if reperage_existant else fixer.pays,
+        'image_region': reperage_existant.image_region if reperage_existant else None
+    }
+    
+    # Renvoyer le formulaire avec données pré-remplies
+    return render_template('index.html', 
+                         fixer_id=fixer.id,
+                         fixer_nom=f"{fixer.prenom} {fixer.nom}",
+                         fixer_email=fixer.email,
+                         fixer_telephone=fixer.telephone or '',
+                         langue_default=fixer.langue_preferee,
+                         reperage_id=reperage_id,
+                         FIXER_DATA=fixer_data,
+                         **i18n_context(fixer.langue_preferee))
+
+@app.route('/admin/pool-stats')
+def admin_pool_stats():
+    """État du pool de connexions et temps d'attente au checkout"""
+    return jsonify(pool_report(engine))
 
 @app.route('/admin/logout')
 def admin_logout():
@@ -1502,6 +2786,108 @@ def download_database_temp():
 # ============= FIN ROUTE TEMPORAIRE =============
 
 
+# ============= COMMANDES CLI =============
+
+@app.cli.command('export-reperages')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None,
+              help="Fichier de sortie (stdout par défaut)")
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'json']), default='ndjson')
+@click.option('--updated-since', default=None, help="Exporter seulement les repérages modifiés depuis (ISO 8601)")
+def export_reperages_command(output, fmt, updated_since):
+    """Exporter les repérages en streaming (flask --app app export-reperages)"""
+    since = None
+    if updated_since:
+        since = parse_iso_datetime(updated_since)
+        if since is None:
+            raise click.BadParameter('format ISO 8601 attendu', param_hint='--updated-since')
+    
+    watermark = datetime.now().isoformat()
+    out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+    try:
+        for chunk in iter_reperages_export(db_session(), since, fmt):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+        db_session.remove()
+    click.echo(f"✅ Export terminé (prochain --updated-since: {watermark})", err=True)
+
+@app.cli.command('run-jobs')
+@click.option('--threads', default=2, show_default=True, help="Tâches exécutées en parallèle")
+@click.option('--executor', type=click.Choice(['thread', 'process']), default='thread', show_default=True,
+              help="process : pool de processus pour les tâches gourmandes en CPU")
+def run_jobs_command(threads, executor):
+    """Worker de tâches de fond autonome (flask --app app run-jobs), web lancé avec JOBS_WORKERS=0"""
+    job_worker.threads = threads
+    job_worker.executor = executor
+    click.echo(f"⚙️ Worker de tâches: {threads} {executor}(s), Ctrl+C pour arrêter")
+    job_worker.run_forever()
+
+@app.cli.command('rebuild-derives')
+def rebuild_derives_command():
+    """Planifier les images dérivées des photos qui n'en ont pas (flask --app app rebuild-derives)"""
+    session = db_session()
+    try:
+        media_ids = session.execute(
+            select(Media.id).where(Media.type == 'photo', Media.derives.is_(None))
+        ).scalars().all()
+        for media_id in media_ids:
+            enqueue(session, 'thumbnail', {'media_id': media_id}, max_tentatives=2)
+        session.commit()
+    finally:
+        db_session.remove()
+    click.echo(f"✅ {len(media_ids)} photo(s) planifiée(s), exécutées par le worker (flask --app app run-jobs)")
+
+@app.cli.command('dedup-medias')
+def dedup_medias_command():
+    """Ranger les fichiers enregistrés avant le stockage par contenu sous leur SHA-256 (doublons supprimés)"""
+    session = db_session()
+    converted = freed = 0
+    try:
+        media_ids = session.execute(select(Media.id).where(Media.sha256.is_(None))).scalars().all()
+        for media_id in media_ids:
+            media = session.get(Media, media_id)
+            if not media.chemin_fichier or not os.path.exists(media.chemin_fichier):
+                continue
+            sha256 = hash_file(media.chemin_fichier)
+            size = os.path.getsize(media.chemin_fichier)
+            extension = media.nom_fichier.rsplit('.', 1)[-1]
+            blob = store_blob(session, app.config['UPLOAD_FOLDER'], media.chemin_fichier, sha256, extension)
+            if blob.nb_references > 1:
+                freed += size
+            media.sha256 = blob.sha256
+            media.nom_fichier = os.path.basename(blob.chemin)
+            media.chemin_fichier = os.path.join(app.config['UPLOAD_FOLDER'], blob.chemin)
+            session.commit()
+            converted += 1
+    finally:
+        db_session.remove()
+    click.echo(f"✅ {converted} fichier(s) rangé(s) par contenu, {freed / 1024 / 1024:.1f} MB de doublons libérés")
+
+@app.cli.command('prerender-pdf')
+def prerender_pdf_command():
+    """Planifier le rendu des PDF des repérages validés absents du cache (flask --app app prerender-pdf)"""
+    session = db_session()
+    planned = 0
+    try:
+        for reperage_id in session.execute(select(Reperage.id).where(Reperage.statut == 'validé')).scalars().all():
+            if not pdf_cache.get(reperage_id, pdf_cache_key(reperage_validators(session, reperage_id))):
+                enqueue(session, 'pdf', {'reperage_id': reperage_id, 'prerendu': True}, max_tentatives=2)
+                planned += 1
+        session.commit()
+    finally:
+        db_session.remove()
+    click.echo(f"✅ {planned} PDF planifié(s) ; cache : {pdf_cache.stats()}")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recalculer les compteurs de statut du dashboard (flask --app app rebuild-stats)"""
+    with engine.begin() as connection:
+        rebuild_compteurs_statut(connection)
+    click.echo(f"✅ Compteurs recalculés: {get_reperage_stats(db_session())}")
+    db_session.remove()
+
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🎬 SERVEUR DE REPÉRAGE - LES GARDIENS DE LA TRADITION")
@@ -0,0 +1,88 @@
+"""
+Archives ZIP envoyées au fil de leur construction (mémoire constante, quelle que soit la taille)
+- zipfile écrit dans un tampon non positionnable : en-têtes locaux avec descripteur de données,
+  aucun retour en arrière, chaque bloc produit est envoyé immédiatement au client
+- les formats déjà compressés (JPEG, WebP, PNG, HEIC, vidéos, PDF) sont stockés tels quels,
+  les autres sont compressés (deflate)
+"""
+
+import io
+import os
+import zipfile
+from datetime import datetime
+
+READ_SIZE = 256 * 1024
+
+# Recompresser ces formats coûte du CPU pour un gain nul
+STORED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp', 'heic', 'mp4', 'mov', 'avi', 'zip', 'gz', 'pdf'}
+
+class _StreamBuffer(io.RawIOBase):
+    """Destination de zipfile : garde les octets écrits jusqu'au prochain pop()"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def compress_type(arcname):
+    extension = arcname.rsplit('.', 1)[-1].lower() if '.' in arcname else ''
+    return zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def unique_arcname(arcname, used):
+    """Nom d'entrée unique dans l'archive : photo.jpg, photo (2).jpg..."""
+    candidate, n = arcname, 1
+    stem, dot, extension = arcname.rpartition('.')
+    if not dot:
+        stem, extension = arcname, ''
+    while candidate in used:
+        n += 1
+        candidate = f"{stem} ({n}).{extension}" if dot else f"{stem} ({n})"
+    used.add(candidate)
+    return candidate
+
+def _flush(buffer):
+    data = buffer.pop()
+    if data:
+        yield data
+
+def stream_zip(entries):
+    """
+    Générateur des octets d'une archive ZIP
+    entries : itérable de (nom dans l'archive, source) ; source = chemin de fichier ou contenu (bytes)
+    Les fichiers absents sont ignorés ; les entrées peuvent être produites au fur et à mesure
+    """
+    buffer = _StreamBuffer()
+    used = set()
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+        for arcname, source in entries:
+            arcname = unique_arcname(arcname, used)
+
+            if isinstance(source, bytes):
+                info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+                info.compress_type = compress_type(arcname)
+                archive.writestr(info, source)
+                yield from _flush(buffer)
+                continue
+
+            if not os.path.exists(source):
+                print(f"   ❌ Fichier introuvable: {source}")
+                continue
+
+            info = zipfile.ZipInfo.from_file(source, arcname)
+            info.compress_type = compress_type(arcname)
+            with open(source, 'rb') as src, archive.open(info, 'w') as dest:
+                for block in iter(lambda: src.read(READ_SIZE), b''):
+                    dest.write(block)
+                    yield from _flush(buffer)
+            yield from _flush(buffer)
+    yield from _flush(buffer)  # Répertoire central
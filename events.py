@@ -0,0 +1,166 @@
+"""
+Canal d'événements temps réel (Server-Sent Events) : chat, accusés de lecture, statuts
+- MemoryBroker : pub/sub en mémoire, suffisant avec un seul worker gunicorn (threads)
+- DatabaseBroker : diffusion entre plusieurs workers via la table evenements
+Le backend est choisi par la variable d'environnement EVENTS_BACKEND (memory ou database)
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func, or_
+from models import Evenement
+
+class Subscription:
+    """Abonnement d'un client SSE à un ou plusieurs canaux"""
+
+    def __init__(self, broker, channels, maxsize=100):
+        self.broker = broker
+        self.channels = set(channels)
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        """Prochain événement, ou None après timeout secondes"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class MemoryBroker:
+    """Pub/sub en mémoire du processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, channel, event, data):
+        self.dispatch({'id': next(self._ids), 'channel': channel, 'event': event, 'data': data})
+
+    def dispatch(self, evt):
+        """Remettre un événement aux abonnés locaux du canal"""
+        with self._lock:
+            subscribers = [s for s in self._subscribers if evt['channel'] in s.channels]
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(evt)
+            except queue.Full:
+                # Client trop lent : l'événement est perdu, le client se resynchronise au prochain rechargement
+                pass
+
+class DatabaseBroker(MemoryBroker):
+    """
+    Pub/sub partagé entre workers : publish écrit dans la table evenements,
+    chaque processus relit les nouvelles lignes et les remet à ses abonnés
+    - l'ordre des id n'est pas l'ordre des commits (PostgreSQL) : chaque lecture reprend aussi
+      les lignes des late_window dernières secondes, les id déjà remis sont ignorés
+    """
+
+    def __init__(self, engine, poll_interval=1.0, retention=timedelta(minutes=10),
+                 late_window=timedelta(seconds=30)):
+        super().__init__()
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.late_window = late_window
+        self._last_id = None
+        self._delivered = {}  # id -> created_at des événements remis dans la fenêtre
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self._ensure_poller()
+        return super().subscribe(channels)
+
+    def publish(self, channel, event, data):
+        with self.engine.begin() as connection:
+            connection.execute(insert(Evenement.__table__).values(
+                channel=channel,
+                event=event,
+                data=json.dumps(data),
+                created_at=datetime.now()
+            ))
+        # La remise locale passe aussi par le poller : même ordre pour tous les workers
+
+    def _ensure_poller(self):
+        with self._thread_lock:
+            if self._thread is None:
+                with self.engine.connect() as connection:
+                    self._last_id = connection.execute(select(func.max(Evenement.id))).scalar() or 0
+                    # Événements antérieurs à l'abonnement : jamais remis
+                    self._delivered = dict(connection.execute(
+                        select(Evenement.id, Evenement.created_at)
+                        .where(Evenement.created_at >= datetime.now() - self.late_window)
+                    ).all())
+                self._thread = threading.Thread(target=self._poll_loop, name='events-poller', daemon=True)
+                self._thread.start()
+
+    def _poll_loop(self):
+        last_purge = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                window_start = datetime.now() - self.late_window
+                with self.engine.connect() as connection:
+                    rows = connection.execute(
+                        select(Evenement.id, Evenement.channel, Evenement.event, Evenement.data,
+                               Evenement.created_at)
+                        .where(or_(Evenement.id > self._last_id, Evenement.created_at >= window_start))
+                        .order_by(Evenement.id)
+                    ).all()
+                for row in rows:
+                    if row.id in self._delivered:
+                        continue
+                    self.dispatch({
+                        'id': row.id,
+                        'channel': row.channel,
+                        'event': row.event,
+                        'data': json.loads(row.data) if row.data else {}
+                    })
+                    self._delivered[row.id] = row.created_at
+                    self._last_id = max(self._last_id, row.id)
+
+                # Les id sortis de la fenêtre ne seront plus relus
+                self._delivered = {
+                    event_id: created_at for event_id, created_at in self._delivered.items()
+                    if created_at is None or created_at >= window_start
+                }
+
+                # Purge périodique des événements déjà diffusés
+                if time.monotonic() - last_purge > 60:
+                    with self.engine.begin() as connection:
+                        connection.execute(delete(Evenement.__table__).where(
+                            Evenement.created_at < datetime.now() - self.retention
+                        ))
+                    last_purge = time.monotonic()
+            except Exception as e:
+                print(f"⚠️ Erreur lecture des événements: {e}")
+
+def create_broker(engine):
+    """Créer le broker selon EVENTS_BACKEND (memory par défaut)"""
+    backend = os.environ.get('EVENTS_BACKEND', 'memory')
+    if backend == 'database':
+        return DatabaseBroker(engine, poll_interval=float(os.environ.get('EVENTS_POLL_INTERVAL', 1.0)),
+                              late_window=timedelta(seconds=float(os.environ.get('EVENTS_LATE_WINDOW', 30))))
+    return MemoryBroker()
+
+def format_sse(evt):
+    """Formater un événement au format text/event-stream"""
+    return f"id: {evt['id']}\nevent: {evt['event']}\ndata: {json.dumps(evt['data'], ensure_ascii=False)}\n\n"
@@ -0,0 +1,71 @@
+"""
+Traductions de l'interface (translations/i18n.json)
+- chargées une seule fois, rechargées si le fichier change (mtime) quand check_mtime est actif (dev)
+- une langue incomplète est complétée par les clés FR
+- chaque langue est pré-sérialisée avec son ETag fort, et en version inline pour les templates
+"""
+
+import hashlib
+import json
+import os
+import threading
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+
+DEFAULT_LANG = 'FR'
+
+def merge_missing(bundle, fallback):
+    """Copie de bundle complétée récursivement par les clés absentes de fallback"""
+    merged = dict(bundle)
+    for key, value in fallback.items():
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(value, dict) and isinstance(merged[key], dict):
+            merged[key] = merge_missing(merged[key], value)
+    return merged
+
+class Bundle:
+    """Traductions d'une langue, prêtes à servir"""
+
+    def __init__(self, lang, data):
+        self.lang = lang
+        self.data = data
+        self.body = json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:16]
+        # Pour <script> : échappement de <, >, & et '
+        self.inline = Markup(htmlsafe_json_dumps(data))
+
+class TranslationBundles:
+    """Cache des traductions par langue"""
+
+    def __init__(self, path, default_lang=DEFAULT_LANG):
+        self.path = path
+        self.default_lang = default_lang
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._bundles = {}
+        self.version = None
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, 'r', encoding='utf-8') as f:
+            translations = json.load(f)
+
+        fallback = translations[self.default_lang]
+        bundles = {lang: Bundle(lang, merge_missing(data, fallback)) for lang, data in translations.items()}
+
+        # Version globale : change dès qu'une langue change (paramètre v des URLs)
+        digest = hashlib.sha256()
+        for lang in sorted(bundles):
+            digest.update(bundles[lang].etag.encode('ascii'))
+
+        self._bundles = bundles
+        self.version = digest.hexdigest()[:12]
+        self._mtime = mtime
+
+    def get(self, lang, check_mtime=False):
+        """Bundle de la langue (langue par défaut si inconnue)"""
+        with self._lock:
+            if self._mtime is None or (check_mtime and os.stat(self.path).st_mtime != self._mtime):
+                self._load()
+            return self._bundles.get(lang) or self._bundles[self.default_lang]
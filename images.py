@@ -0,0 +1,96 @@
+"""
+Images dérivées des photos uploadées : galerie (grid), visionneuse (lightbox), PDF
+- orientation EXIF appliquée, chaque taille enregistrée en WebP et en JPEG
+- HEIC lu si pillow-heif est installé
+- calcul dans un pool de processus (CPU), partagé avec le rendu des PDF ; l'enregistrement en base
+  reste dans le worker de tâches
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIC_SUPPORTED = True
+except ImportError:
+    HEIC_SUPPORTED = False
+
+# Plus grand côté en pixels
+DERIVATIVE_SIZES = {'lightbox': 1600, 'pdf': 1200, 'grid': 400}
+
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def to_rgb(img):
+    """Convertir en RGB (transparence aplatie sur fond blanc pour le JPEG)"""
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, 'white')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+def generate_derivatives(source, output_dir, stem, sizes=DERIVATIVE_SIZES):
+    """
+    Produire toutes les tailles d'une image dans output_dir
+    Renvoie {taille: {'width', 'height', 'webp': nom de fichier, 'jpeg': nom de fichier}}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    derives = {}
+
+    with Image.open(source) as original:
+        img = to_rgb(ImageOps.exif_transpose(original))
+
+        # De la plus grande à la plus petite : chaque taille part de la précédente
+        for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            img = img.copy()
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+            entry = {'width': img.width, 'height': img.height}
+            for fmt, (extension, options) in FORMATS.items():
+                filename = f"{stem}_{name}.{extension}"
+                img.save(os.path.join(output_dir, filename), **options)
+                entry[fmt] = filename
+            derives[name] = entry
+
+    return derives
+
+# Pool de processus partagé (IMAGE_PROCESSES, par défaut la moitié des CPU)
+PROCESS_POOL_SIZE = int(os.environ.get('IMAGE_PROCESSES', max(1, (os.cpu_count() or 2) // 2)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_SIZE)
+        return _pool
+
+def submit_to_process_pool(func, *args):
+    """Future d'un calcul CPU (images, rendu PDF) ; calculé tout de suite si on est déjà dans un processus de pool"""
+    if multiprocessing.parent_process() is None:
+        return process_pool().submit(func, *args)
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def run_in_process_pool(func, *args):
+    """Exécuter un calcul CPU dans le pool et attendre son résultat"""
+    return submit_to_process_pool(func, *args).result()
+
+def render_derivatives(source, output_dir, stem):
+    """generate_derivatives dans le pool de processus"""
+    return run_in_process_pool(generate_derivatives, source, output_dir, stem)
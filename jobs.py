@@ -0,0 +1,250 @@
+"""
+Tâches de fond : images dérivées, PDF (unitaires et exports groupés), nettoyage de fichiers
+- la table jobs sert de file d'attente (SQLite ou PostgreSQL), enqueue() ajoute une tâche
+  dans la transaction de la requête
+- JobWorker réserve les tâches par un UPDATE conditionnel (une tâche n'est prise que par
+  un seul worker, même entre processus) et les exécute dans des threads ou un pool de processus
+- échec : nouvel essai après un délai croissant, jusqu'à max_tentatives
+- une tâche longue publie son avancement avec report_progress (colonne progression)
+- le worker tourne dans le processus web (JOBS_WORKERS threads) ou seul : flask --app app run-jobs
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, select, update, delete, event
+from models import Job
+
+# Fonctions exécutées par type de tâche : handler(payload) -> résultat (dict JSON) ou None
+HANDLERS = {}
+
+def register(job_type):
+    """Décorateur : enregistrer la fonction qui exécute un type de tâche"""
+    def decorator(func):
+        HANDLERS[job_type] = func
+        return func
+    return decorator
+
+# Tâche exécutée par le thread courant (pour report_progress)
+_current = threading.local()
+
+def run_job(job_type, payload, job_id=None):
+    """Exécuter une tâche (dans le thread du worker ou dans un processus du pool)"""
+    handler = HANDLERS.get(job_type)
+    if handler is None:
+        raise ValueError(f"Type de tâche inconnu: {job_type}")
+    _current.job_id = job_id
+    try:
+        return handler(payload)
+    finally:
+        _current.job_id = None
+
+def report_progress(engine, faits, total):
+    """Avancement de la tâche en cours (lu par /api/jobs/<id>), enregistré dans sa propre transaction"""
+    job_id = getattr(_current, 'job_id', None)
+    if job_id is None:
+        return
+    with engine.begin() as connection:
+        connection.execute(
+            update(Job.__table__)
+            .where(Job.id == job_id)
+            .values(progression=json.dumps({'faits': faits, 'total': total}))
+        )
+
+def enqueue(session, job_type, payload=None, max_tentatives=3, worker=None):
+    """
+    Ajouter une tâche dans la transaction de session (visible des workers au commit)
+    worker : JobWorker local à réveiller après le commit
+    """
+    job = Job(type=job_type, payload=json.dumps(payload or {}), max_tentatives=max_tentatives)
+    session.add(job)
+    if worker is not None:
+        event.listen(session, 'after_commit', lambda s: worker.notify(), once=True)
+    return job
+
+# Engine du processus parent, libéré dans les processus du pool (connexions non partageables)
+_parent_engine = None
+
+def _init_process():
+    if _parent_engine is not None:
+        _parent_engine.dispose(close=False)
+
+class JobWorker:
+    """Pool de workers : threads qui réservent et exécutent les tâches"""
+
+    def __init__(self, engine, threads=2, executor='thread', poll_interval=1.0, retry_delay=10,
+                 stale_after=timedelta(hours=2), retention=timedelta(days=1)):
+        self.engine = engine
+        self.threads = threads
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        self.retention = retention
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool = None
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Démarrer les threads au premier appel (jamais à l'import : scripts, CLI)"""
+        if self._workers or self.threads <= 0:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            if self.executor == 'process':
+                global _parent_engine
+                _parent_engine = self.engine
+                self._pool = ProcessPoolExecutor(max_workers=self.threads, initializer=_init_process)
+            for i in range(self.threads):
+                thread = threading.Thread(target=self._run, args=(i == 0,), name=f'jobs-worker-{i}', daemon=True)
+                thread.start()
+                self._workers.append(thread)
+
+    def run_forever(self):
+        """Mode autonome : exécuter les tâches jusqu'à interruption (Ctrl+C)"""
+        self.ensure_started()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def notify(self):
+        """Réveiller les workers (nouvelle tâche dans ce processus)"""
+        self._wake.set()
+
+    def _run(self, maintenance):
+        last_maintenance = 0
+        while not self._stop.is_set():
+            if maintenance and time.monotonic() - last_maintenance > 60:
+                try:
+                    self.recover_and_purge()
+                except Exception as e:
+                    print(f"⚠️ Erreur maintenance des tâches: {e}")
+                last_maintenance = time.monotonic()
+
+            try:
+                job = self.claim()
+            except Exception as e:
+                print(f"⚠️ Erreur lecture des tâches: {e}")
+                job = None
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.execute(job)
+
+    def claim(self):
+        """Réserver la prochaine tâche due (None s'il n'y en a pas)"""
+        now = datetime.now()
+        with self.engine.begin() as connection:
+            candidates = connection.execute(
+                select(Job.id)
+                .where(Job.statut == 'en_attente', Job.run_after <= now)
+                .order_by(Job.run_after, Job.id)
+                .limit(5)
+            ).scalars().all()
+
+            for job_id in candidates:
+                # Réservée seulement si toujours en attente : un autre worker a pu la prendre
+                claimed = connection.execute(
+                    update(Job.__table__)
+                    .where(Job.id == job_id, Job.statut == 'en_attente')
+                    .values(statut='en_cours', started_at=now, worker=self.name,
+                            tentatives=Job.tentatives + 1)
+                ).rowcount
+                if claimed:
+                    return connection.execute(
+                        select(Job.id, Job.type, Job.payload, Job.tentatives, Job.max_tentatives)
+                        .where(Job.id == job_id)
+                    ).first()
+        return None
+
+    def execute(self, job):
+        """Exécuter une tâche réservée et enregistrer son résultat (ou programmer un nouvel essai)"""
+        started = time.monotonic()
+        try:
+            payload = json.loads(job.payload) if job.payload else {}
+            if self._pool is not None:
+                result = self._pool.submit(run_job, job.type, payload, job.id).result()
+            else:
+                result = run_job(job.type, payload, job.id)
+            self._finish(job.id, statut='termine', erreur=None, finished_at=datetime.now(),
+                         resultat=json.dumps(result) if result is not None else None)
+            print(f"✅ Tâche {job.id} ({job.type}) terminée en {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            if job.tentatives < job.max_tentatives:
+                delay = self.retry_delay * 2 ** (job.tentatives - 1)
+                self._finish(job.id, statut='en_attente', erreur=str(e),
+                             run_after=datetime.now() + timedelta(seconds=delay))
+                print(f"⚠️ Tâche {job.id} ({job.type}) en échec, nouvel essai dans {delay}s: {e}")
+            else:
+                self._finish(job.id, statut='echec', erreur=str(e), finished_at=datetime.now())
+                print(f"❌ Tâche {job.id} ({job.type}) abandonnée après {job.tentatives} essai(s): {e}")
+
+    def _finish(self, job_id, **values):
+        with self.engine.begin() as connection:
+            connection.execute(update(Job.__table__).where(Job.id == job_id).values(**values))
+
+    def recover_and_purge(self):
+        """
+        - tâches en_cours depuis plus de stale_after (worker arrêté) : remises en attente s'il
+          reste des essais, sinon en échec (stale_after doit dépasser la durée de la plus longue tâche)
+        - tâches terminées depuis plus de retention : supprimées avec leur fichier résultat
+        """
+        now = datetime.now()
+        stale = and_(Job.statut == 'en_cours', Job.started_at < now - self.stale_after)
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(Job.__table__)
+                .where(stale, Job.tentatives < Job.max_tentatives)
+                .values(statut='en_attente', run_after=now, erreur='Worker interrompu')
+            )
+            abandoned = connection.execute(
+                update(Job.__table__)
+                .where(stale, Job.tentatives >= Job.max_tentatives)
+                .values(statut='echec', finished_at=now,
+                        erreur='Worker interrompu, nombre maximal d\'essais atteint')
+            ).rowcount
+            if abandoned:
+                print(f"❌ {abandoned} tâche(s) interrompue(s) abandonnée(s) après le dernier essai")
+
+            expired = connection.execute(
+                select(Job.id, Job.resultat)
+                .where(Job.statut.in_(['termine', 'echec']), Job.finished_at < now - self.retention)
+            ).all()
+            for row in expired:
+                resultat = json.loads(row.resultat) if row.resultat else {}
+                # cache : fichier partagé (cache PDF), supprimé par son éviction
+                if resultat.get('fichier') and not resultat.get('cache') and os.path.exists(resultat['fichier']):
+                    os.remove(resultat['fichier'])
+            if expired:
+                connection.execute(delete(Job.__table__).where(Job.id.in_([row.id for row in expired])))
+
+def create_worker(engine):
+    """
+    Créer le pool selon JOBS_WORKERS (0 : pas de worker dans ce processus), JOBS_EXECUTOR
+    et JOBS_STALE_AFTER (secondes avant de considérer une tâche en_cours comme interrompue)
+    """
+    return JobWorker(
+        engine,
+        threads=int(os.environ.get('JOBS_WORKERS', 2)),
+        executor=os.environ.get('JOBS_EXECUTOR', 'thread'),
+        poll_interval=float(os.environ.get('JOBS_POLL_INTERVAL', 1.0)),
+        stale_after=timedelta(seconds=int(os.environ.get('JOBS_STALE_AFTER', 7200)))
+    )
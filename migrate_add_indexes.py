@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Migration: Création des index déclarés dans models.py
+(clés étrangères reperage_id, filtres du dashboard, fixer_form, compteur de non-lus)
+et suppression des index remplacés (OBSOLETE_INDEXES)
+Fonctionne sur SQLite (reperage.db) et PostgreSQL (DATABASE_URL)
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+from models import Base
+
+# Index remplacés par une nouvelle définition (nouveau nom) : table -> noms à supprimer
+OBSOLETE_INDEXES = {
+    # -> idx_messages_reperage_thread (reperage_id, id)
+    'messages': ['idx_messages_reperage', 'idx_messages_reperage_created', 'idx_messages_reperage_id'],
+}
+
+def migrate():
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+
+    if db_url.startswith('sqlite:///') and not os.path.exists(db_url[len('sqlite:///'):]):
+        print("❌ Base de données non trouvée.")
+        print("   Exécutez d'abord 'python app.py' pour créer la BDD.")
+        return
+
+    engine = create_engine(db_url)
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    created = dropped = 0
+    try:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for name in OBSOLETE_INDEXES.get(table.name, []):
+                if name in existing:
+                    print(f"🔄 Suppression de {name} (remplacé)...")
+                    with engine.begin() as conn:
+                        conn.execute(text(f"DROP INDEX {name}"))
+                    dropped += 1
+
+            for index in table.indexes:
+                if index.name in existing:
+                    print(f"   ✅ {index.name} existe déjà")
+                    continue
+
+                print(f"🔄 Création de {index.name} sur {table.name}({', '.join(c.name for c in index.columns)})...")
+                index.create(engine)
+                created += 1
+
+        print(f"✅ Migration réussie ! {created} index créé(s), {dropped} supprimé(s)")
+        print("\n💡 Vérifiez les plans d'exécution avec 'python verifier_index.py'")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("MIGRATION: Ajout des index de performance")
+    print("=" * 60)
+    migrate()
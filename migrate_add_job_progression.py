@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Migration: Ajout de la colonne progression (avancement des exports groupés) sur la table jobs
+Fonctionne sur SQLite (reperage.db) et PostgreSQL (DATABASE_URL)
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+def migrate():
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+
+    if db_url.startswith('sqlite:///') and not os.path.exists(db_url[len('sqlite:///'):]):
+        print("❌ Base de données non trouvée.")
+        print("   Exécutez d'abord 'python app.py' pour créer la BDD.")
+        return
+
+    engine = create_engine(db_url)
+    inspector = inspect(engine)
+
+    try:
+        if 'jobs' not in inspector.get_table_names():
+            print("   ✅ Table jobs absente, elle sera créée avec la colonne au démarrage")
+            return
+
+        columns = [col['name'] for col in inspector.get_columns('jobs')]
+        if 'progression' in columns:
+            print("   ✅ jobs.progression existe déjà")
+            return
+
+        with engine.begin() as conn:
+            print("🔄 Ajout de la colonne progression à jobs...")
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN progression TEXT"))
+
+        print("✅ Migration réussie !")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("MIGRATION: Ajout de la colonne jobs.progression")
+    print("=" * 60)
+    migrate()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Migration: Ajout de la colonne derives (images dérivées WebP/JPEG) sur la table medias
+Fonctionne sur SQLite (reperage.db) et PostgreSQL (DATABASE_URL)
+Les photos existantes sont traitées ensuite par : flask --app app rebuild-derives
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+def migrate():
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+
+    if db_url.startswith('sqlite:///') and not os.path.exists(db_url[len('sqlite:///'):]):
+        print("❌ Base de données non trouvée.")
+        print("   Exécutez d'abord 'python app.py' pour créer la BDD.")
+        return
+
+    engine = create_engine(db_url)
+    inspector = inspect(engine)
+
+    try:
+        if 'medias' not in inspector.get_table_names():
+            print("   ✅ Table medias absente, rien à migrer")
+            return
+
+        columns = [col['name'] for col in inspector.get_columns('medias')]
+        if 'derives' in columns:
+            print("   ✅ medias.derives existe déjà")
+            return
+
+        with engine.begin() as conn:
+            print("🔄 Ajout de la colonne derives à medias...")
+            conn.execute(text("ALTER TABLE medias ADD COLUMN derives TEXT"))
+
+        print("✅ Migration réussie !")
+        print("   - Générez les images des photos existantes : flask --app app rebuild-derives")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("MIGRATION: Ajout de la colonne medias.derives")
+    print("=" * 60)
+    migrate()
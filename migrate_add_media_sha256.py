@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Migration: Stockage des médias par contenu
+- colonne sha256 (+ index) sur la table medias ; la table blobs est créée au démarrage de l'application
+Fonctionne sur SQLite (reperage.db) et PostgreSQL (DATABASE_URL)
+Les fichiers existants sont rangés ensuite par : flask --app app dedup-medias
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+def migrate():
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+
+    if db_url.startswith('sqlite:///') and not os.path.exists(db_url[len('sqlite:///'):]):
+        print("❌ Base de données non trouvée.")
+        print("   Exécutez d'abord 'python app.py' pour créer la BDD.")
+        return
+
+    engine = create_engine(db_url)
+    inspector = inspect(engine)
+
+    try:
+        if 'medias' not in inspector.get_table_names():
+            print("   ✅ Table medias absente, rien à migrer")
+            return
+
+        columns = [col['name'] for col in inspector.get_columns('medias')]
+        with engine.begin() as conn:
+            if 'sha256' in columns:
+                print("   ✅ medias.sha256 existe déjà")
+            else:
+                print("🔄 Ajout de la colonne sha256 à medias...")
+                conn.execute(text("ALTER TABLE medias ADD COLUMN sha256 VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_medias_sha256 ON medias (sha256)"))
+
+        print("✅ Migration réussie !")
+        print("   - Rangez les fichiers existants par contenu : flask --app app dedup-medias")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("MIGRATION: Stockage des médias par contenu (medias.sha256)")
+    print("=" * 60)
+    migrate()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Migration: Ajout de la colonne version (verrouillage optimiste, ETag)
+sur les tables reperages, gardiens, lieux et medias
+Fonctionne sur SQLite (reperage.db) et PostgreSQL (DATABASE_URL)
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+TABLES = ['reperages', 'gardiens', 'lieux', 'medias']
+
+def migrate():
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+
+    if db_url.startswith('sqlite:///') and not os.path.exists(db_url[len('sqlite:///'):]):
+        print("❌ Base de données non trouvée.")
+        print("   Exécutez d'abord 'python app.py' pour créer la BDD.")
+        return
+
+    engine = create_engine(db_url)
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    try:
+        with engine.begin() as conn:
+            for table in TABLES:
+                if table not in existing_tables:
+                    continue
+
+                columns = [col['name'] for col in inspector.get_columns(table)]
+                if 'version' in columns:
+                    print(f"   ✅ {table}.version existe déjà")
+                    continue
+
+                print(f"🔄 Ajout de la colonne version à {table}...")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+        print("✅ Migration réussie !")
+        print("   - Les lignes existantes démarrent à version = 1")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("MIGRATION: Ajout de la colonne version")
+    print("=" * 60)
+    migrate()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Migration: table evenements en AUTOINCREMENT (SQLite uniquement)
+Sans AUTOINCREMENT, SQLite réutilise les id après la purge des événements : les workers,
+dont le curseur est plus haut, ne les diffusent jamais
+La table ne contient que les événements des 10 dernières minutes : elle est recréée vide
+PostgreSQL : rien à faire (séquence jamais réutilisée)
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+from models import Evenement
+
+def migrate():
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+
+    if not db_url.startswith('sqlite'):
+        print("   ✅ PostgreSQL : rien à migrer")
+        return
+    if db_url.startswith('sqlite:///') and not os.path.exists(db_url[len('sqlite:///'):]):
+        print("❌ Base de données non trouvée.")
+        print("   Exécutez d'abord 'python app.py' pour créer la BDD.")
+        return
+
+    engine = create_engine(db_url)
+    inspector = inspect(engine)
+
+    try:
+        if 'evenements' not in inspector.get_table_names():
+            print("   ✅ Table evenements absente, elle sera créée avec AUTOINCREMENT au démarrage")
+            return
+
+        with engine.begin() as conn:
+            sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'evenements'")).scalar()
+            if 'AUTOINCREMENT' in (sql or '').upper():
+                print("   ✅ evenements est déjà en AUTOINCREMENT")
+                return
+
+            print("🔄 Recréation de la table evenements en AUTOINCREMENT...")
+            conn.execute(text("DROP TABLE evenements"))
+            Evenement.__table__.create(conn)
+
+        print("✅ Migration réussie !")
+        print("   - Redémarrez les workers (curseur des événements)")
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("MIGRATION: evenements en AUTOINCREMENT")
+    print("=" * 60)
+    migrate()
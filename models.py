@@ -1,19 +1,34 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, Index
+from sqlalchemy import event, func, inspect, select, insert, update, delete
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, scoped_session, selectinload
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
 import json
 import os
+import threading
+import time
 
 Base = declarative_base()
 
 class Reperage(Base):
     __tablename__ = 'reperages'
+    __table_args__ = (
+        Index('idx_reperages_fixer_email_statut', 'fixer_email', 'statut', 'updated_at'),  # fixer_form
+        Index('idx_reperages_statut_created', 'statut', 'created_at'),  # dashboard filtré par statut
+        Index('idx_reperages_pays_created', 'pays', 'created_at'),  # dashboard filtré par pays
+        Index('idx_reperages_created', 'created_at'),  # dashboard trié par date
+        Index('idx_reperages_updated', 'updated_at', 'id'),  # pagination / export
+        Index('idx_reperages_fixer_created', 'fixer_id', 'created_at'),  # fiche fixer
+    )
     
     id = Column(Integer, primary_key=True)
     token = Column(String(32), unique=True, nullable=True)  # Token sécurisé pour URLs
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Verrouillage optimiste (ETag)
     langue_interface = Column(String(4), default='FR')  # FR, GB, ITAL, ESP
     statut = Column(String(20), default='brouillon')  # brouillon, soumis, validé
     
@@ -41,32 +56,42 @@ class Reperage(Base):
     lieux = relationship("Lieu", back_populates="reperage", cascade="all, delete-orphan")
     medias = relationship("Media", back_populates="reperage", cascade="all, delete-orphan")
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'token': self.token,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'langue_interface': self.langue_interface,
-            'statut': self.statut,
-            'fixer_nom': self.fixer_nom,
-            'fixer_email': self.fixer_email,
-            'fixer_telephone': self.fixer_telephone,
-            'pays': self.pays,
-            'region': self.region,
-            'territoire_data': json.loads(self.territoire_data) if self.territoire_data else {},
-            'episode_data': json.loads(self.episode_data) if self.episode_data else {},
-            'gardiens': [g.to_dict() for g in self.gardiens],
-            'lieux': [l.to_dict() for l in self.lieux],
-            'medias': [m.to_dict() for m in self.medias]
-        }
+    # Clés exposées par l'API (ordre de sérialisation)
+    API_FIELDS = ('id', 'token', 'created_at', 'updated_at', 'version', 'langue_interface', 'statut',
+                  'fixer_nom', 'fixer_email', 'fixer_telephone', 'pays', 'region',
+                  'territoire_data', 'episode_data', 'gardiens', 'lieux', 'medias')
+    # Clés disponibles uniquement sur demande (paramètre fields=)
+    EXTRA_FIELDS = ('fixer_id', 'fixer_prenom')
+    COLLECTIONS = ('gardiens', 'lieux', 'medias')
+    
+    # Chaque UPDATE incrémente version (WHERE id = ? AND version = ?) : StaleDataError si modifié entre-temps
+    __mapper_args__ = {'version_id_col': version}
+    
+    def to_dict(self, fields=None):
+        """Sérialiser le repérage (fields : sous-ensemble de clés, par défaut API_FIELDS)"""
+        data = {}
+        for key in fields or self.API_FIELDS:
+            value = getattr(self, key)
+            if key in self.COLLECTIONS:
+                data[key] = [item.to_dict() for item in value]
+            elif key in ('created_at', 'updated_at'):
+                data[key] = value.isoformat() if value else None
+            elif key in ('territoire_data', 'episode_data'):
+                data[key] = json.loads(value) if value else {}
+            else:
+                data[key] = value
+        return data
 
 class Gardien(Base):
     __tablename__ = 'gardiens'
+    __table_args__ = (
+        Index('idx_gardiens_reperage', 'reperage_id', 'ordre'),
+    )
     
     id = Column(Integer, primary_key=True)
     reperage_id = Column(Integer, ForeignKey('reperages.id'))
     ordre = Column(Integer)  # 1, 2, ou 3
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     
     # Identité
     nom = Column(String(255))
@@ -93,10 +118,13 @@ class Gardien(Base):
     # Relation
     reperage = relationship("Reperage", back_populates="gardiens")
     
+    __mapper_args__ = {'version_id_col': version}
+    
     def to_dict(self):
         return {
             'id': self.id,
             'ordre': self.ordre,
+            'version': self.version,
             'nom': self.nom,
             'prenom': self.prenom,
             'age': self.age,
@@ -115,10 +143,14 @@ class Gardien(Base):
 
 class Lieu(Base):
     __tablename__ = 'lieux'
+    __table_args__ = (
+        Index('idx_lieux_reperage', 'reperage_id', 'numero_lieu'),
+    )
     
     id = Column(Integer, primary_key=True)
     reperage_id = Column(Integer, ForeignKey('reperages.id'))
     numero_lieu = Column(Integer, default=1)  # 1, 2, ou 3 pour les 3 lieux
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     nom = Column(String(255))
     type_environnement = Column(String(255))
     
@@ -150,10 +182,13 @@ class Lieu(Base):
     # Relation
     reperage = relationship("Reperage", back_populates="lieux")
     
+    __mapper_args__ = {'version_id_col': version}
+    
     def to_dict(self):
         return {
             'id': self.id,
             'numero_lieu': self.numero_lieu,
+            'version': self.version,
             'nom': self.nom,
             'type_environnement': self.type_environnement,
             'description_visuelle': self.description_visuelle,
@@ -175,11 +210,38 @@ class Lieu(Base):
             'longitude': self.longitude
         }
 
+class Blob(Base):
+    """Fichier stocké par contenu (voir storage.py), partagé par tous les médias de même SHA-256"""
+    __tablename__ = 'blobs'
+    
+    BLOBS_DIR = 'blobs'
+    
+    sha256 = Column(String(64), primary_key=True)
+    chemin = Column(String(500), nullable=False)  # Relatif au dossier uploads : blobs/ab/<sha256>.<ext>
+    taille_octets = Column(Integer)
+    nb_references = Column(Integer, nullable=False, default=0)  # Médias qui pointent vers ce fichier
+    created_at = Column(DateTime, default=datetime.now)
+    
+    @classmethod
+    def folder(cls, sha256):
+        """Dossier relatif du blob (et de ses images dérivées)"""
+        return f"{cls.BLOBS_DIR}/{sha256[:2]}"
+    
+    @classmethod
+    def is_shared(cls, relpath):
+        """Fichier partagé entre médias (supprimé avec le blob, jamais avec un média)"""
+        return relpath.startswith(cls.BLOBS_DIR + '/')
+
 class Media(Base):
     __tablename__ = 'medias'
+    __table_args__ = (
+        Index('idx_medias_reperage', 'reperage_id', 'type'),
+        Index('idx_medias_sha256', 'sha256'),  # médias d'un même blob (images dérivées, références)
+    )
     
     id = Column(Integer, primary_key=True)
     reperage_id = Column(Integer, ForeignKey('reperages.id'))
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     
     type = Column(String(50))  # photo, document, video, audio
     categorie = Column(String(100))  # portrait, lieu, contexte, autorisation
@@ -189,18 +251,50 @@ class Media(Base):
     chemin_fichier = Column(String(500))
     taille_octets = Column(Integer)
     mime_type = Column(String(100))
+    # Contenu (Blob) ; NULL pour les fichiers enregistrés avant le stockage par contenu
+    sha256 = Column(String(64), ForeignKey('blobs.sha256'), nullable=True)
     
     legende = Column(Text)
     ordre_affichage = Column(Integer)
     
+    # Images dérivées (JSON) : {taille: {width, height, webp, jpeg}}, chemins relatifs au dossier uploads
+    derives = Column(Text)
+    
     uploaded_at = Column(DateTime, default=datetime.now)
     
     # Relation
     reperage = relationship("Reperage", back_populates="medias")
     
+    __mapper_args__ = {'version_id_col': version}
+    
+    MEDIA_URL_PREFIX = '/uploads/'
+    
+    def derive_urls(self):
+        """URLs des images dérivées ({} tant qu'elles ne sont pas générées)"""
+        derives = json.loads(self.derives) if self.derives else {}
+        return {
+            size: {key: self.MEDIA_URL_PREFIX + value if key in ('webp', 'jpeg') else value
+                   for key, value in entry.items()}
+            for size, entry in derives.items()
+        }
+    
+    def derive_paths(self, upload_folder, shared=None):
+        """Chemins disque des images dérivées (shared : seulement celles partagées via le blob, ou seulement les autres)"""
+        derives = json.loads(self.derives) if self.derives else {}
+        return [os.path.join(upload_folder, entry[fmt])
+                for entry in derives.values() for fmt in ('webp', 'jpeg')
+                if entry.get(fmt) and (shared is None or Blob.is_shared(entry[fmt]) == shared)]
+    
+    def fichier_url(self):
+        """URL du fichier : nom immuable sous blobs/ pour un contenu, dossier du repérage sinon"""
+        if self.sha256:
+            return f"{self.MEDIA_URL_PREFIX}{Blob.folder(self.sha256)}/{self.nom_fichier}"
+        return f"{self.MEDIA_URL_PREFIX}{self.reperage_id}/{self.nom_fichier}"
+    
     def to_dict(self):
         return {
             'id': self.id,
+            'version': self.version,
             'type': self.type,
             'categorie': self.categorie,
             'nom_fichier': self.nom_fichier,
@@ -208,8 +302,11 @@ class Media(Base):
             'chemin_fichier': self.chemin_fichier,
             'taille_octets': self.taille_octets,
             'mime_type': self.mime_type,
+            'sha256': self.sha256,
+            'url': self.fichier_url(),
             'legende': self.legende,
             'ordre_affichage': self.ordre_affichage,
+            'derives': self.derive_urls(),
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
         }
 
@@ -306,6 +403,10 @@ class Admin(Base):
 class Message(Base):
     """Messages entre production et fixer"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        Index('idx_messages_reperage_thread', 'reperage_id', 'id'),  # fil de discussion et polling after_id
+        Index('idx_messages_lu', 'reperage_id', 'auteur_type', 'lu'),  # compteur de non-lus
+    )
     
     id = Column(Integer, primary_key=True)
     reperage_id = Column(Integer, ForeignKey('reperages.id'), nullable=False)
@@ -329,12 +430,290 @@ class Message(Base):
             'lu': self.lu
         }
 
+class CompteurStatut(Base):
+    """Compteurs de repérages par statut, maintenus à chaque création/suppression/changement de statut"""
+    __tablename__ = 'compteurs_statut'
+    
+    statut = Column(String(20), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+class Evenement(Base):
+    """Journal court des événements temps réel (diffusion SSE entre workers, voir events.py)"""
+    __tablename__ = 'evenements'
+    __table_args__ = (
+        Index('idx_evenements_created', 'created_at'),  # purge et relecture des derniers événements
+        # SQLite : id jamais réutilisé après la purge (sinon inférieur au curseur des workers)
+        {'sqlite_autoincrement': True},
+    )
+    
+    id = Column(Integer, primary_key=True)
+    channel = Column(String(50), nullable=False)  # 'reperage:<id>' ou 'admin'
+    event = Column(String(50), nullable=False)
+    data = Column(Text)  # JSON
+    created_at = Column(DateTime, default=datetime.now)
+
+class Job(Base):
+    """Tâche de fond (images dérivées, PDF, exports groupés, nettoyage de fichiers), exécutée par jobs.JobWorker"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('idx_jobs_statut_run', 'statut', 'run_after', 'id'),  # prochaine tâche à exécuter
+        Index('idx_jobs_finished', 'finished_at'),  # purge des tâches terminées
+    )
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String(50), nullable=False)  # thumbnail, pdf, pdf_batch, cleanup_files, release_blob
+    payload = Column(Text)  # JSON
+    statut = Column(String(20), nullable=False, default='en_attente')  # en_attente, en_cours, termine, echec
+    tentatives = Column(Integer, nullable=False, default=0)
+    max_tentatives = Column(Integer, nullable=False, default=3)
+    resultat = Column(Text)  # JSON
+    erreur = Column(Text)
+    progression = Column(Text)  # JSON {'faits', 'total'} des tâches longues (exports groupés)
+    worker = Column(String(100))
+    run_after = Column(DateTime, nullable=False, default=datetime.now)  # report après un échec
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'statut': self.statut,
+            'tentatives': self.tentatives,
+            'max_tentatives': self.max_tentatives,
+            'resultat': json.loads(self.resultat) if self.resultat else None,
+            'erreur': self.erreur,
+            'progression': json.loads(self.progression) if self.progression else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class UploadSession(Base):
+    """Upload reprenable en cours (voir uploads.py) : le média est créé à la finalisation"""
+    __tablename__ = 'upload_sessions'
+    __table_args__ = (
+        Index('idx_upload_sessions_reperage', 'reperage_id'),  # quota par repérage
+        Index('idx_upload_sessions_updated', 'updated_at'),  # purge des sessions abandonnées
+    )
+
+    id = Column(String(32), primary_key=True)  # Jeton aléatoire, sert d'URL d'upload
+    reperage_id = Column(Integer, ForeignKey('reperages.id'), nullable=False)
+
+    nom_original = Column(String(255))
+    nom_fichier = Column(String(255))
+    chemin_fichier = Column(String(500))  # Fichier final ; les morceaux sont écrits dans chemin_fichier + '.part'
+    mime_type = Column(String(100))
+    categorie = Column(String(100))
+    legende = Column(Text)
+    ordre_affichage = Column(Integer)
+
+    taille_totale = Column(Integer, nullable=False)
+    octets_recus = Column(Integer, nullable=False, default=0)  # Offset du prochain morceau
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'reperage_id': self.reperage_id,
+            'nom_original': self.nom_original,
+            'taille_totale': self.taille_totale,
+            'offset': self.octets_recus,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# ============= COMPTEURS DE STATUT =============
+
+# INSERT ... ON CONFLICT DO UPDATE par dialecte
+UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def _increment_compteur(connection, statut, delta):
+    """
+    Ajouter delta au compteur d'un statut (création de la ligne si nécessaire)
+    Upsert en une requête : deux premières créations simultanées d'un statut ne se heurtent pas
+    """
+    statut = statut or 'brouillon'
+    upsert_insert = UPSERT_INSERTS.get(connection.dialect.name)
+    if upsert_insert is not None:
+        statement = upsert_insert(CompteurStatut.__table__).values(statut=statut, total=max(delta, 0))
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[CompteurStatut.statut],
+            set_={'total': CompteurStatut.total + delta}
+        ))
+        return
+    
+    result = connection.execute(
+        update(CompteurStatut.__table__)
+        .where(CompteurStatut.statut == statut)
+        .values(total=CompteurStatut.total + delta)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(CompteurStatut.__table__).values(statut=statut, total=max(delta, 0)))
+
+@event.listens_for(Reperage, 'after_insert')
+def _compteur_after_insert(mapper, connection, target):
+    _increment_compteur(connection, target.statut, 1)
+
+@event.listens_for(Reperage, 'after_delete')
+def _compteur_after_delete(mapper, connection, target):
+    _increment_compteur(connection, target.statut, -1)
+
+@event.listens_for(Reperage, 'after_update')
+def _compteur_after_update(mapper, connection, target):
+    history = inspect(target).attrs.statut.history
+    if not history.has_changes():
+        return
+    for ancien in history.deleted:
+        _increment_compteur(connection, ancien, -1)
+    for nouveau in history.added:
+        _increment_compteur(connection, nouveau, 1)
+
+def rebuild_compteurs_statut(connection):
+    """Recalculer les compteurs en une seule passe GROUP BY"""
+    rows = connection.execute(
+        select(func.coalesce(Reperage.statut, 'brouillon'), func.count(Reperage.id))
+        .group_by(func.coalesce(Reperage.statut, 'brouillon'))
+    ).all()
+    connection.execute(delete(CompteurStatut.__table__))
+    if rows:
+        connection.execute(insert(CompteurStatut.__table__),
+                           [{'statut': statut, 'total': total} for statut, total in rows])
+
+def get_reperage_stats(session):
+    """Statistiques du dashboard lues dans les compteurs (coût indépendant du nombre de repérages)"""
+    compteurs = dict(session.query(CompteurStatut.statut, CompteurStatut.total).all())
+    return {
+        'total': sum(compteurs.values()),
+        'brouillons': compteurs.get('brouillon', 0),
+        'soumis': compteurs.get('soumis', 0),
+        'valides': compteurs.get('validé', 0)
+    }
+
+# ============= STRATÉGIES DE CHARGEMENT =============
+
+def reperage_loader_options(collections=Reperage.COLLECTIONS):
+    """
+    Chargement anticipé des collections sérialisées par Reperage.to_dict :
+    une requête SELECT ... IN par collection au lieu d'une requête par repérage (N+1)
+    """
+    return tuple(selectinload(getattr(Reperage, name)) for name in collections)
+
+# ============= POOL DE CONNEXIONS =============
+
+class PoolWaitStats:
+    """Statistiques des temps d'attente au checkout du pool (dimensionnement des workers)"""
+    
+    BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.buckets = [0] * (len(self.BUCKETS_MS) + 1)
+    
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            ms = seconds * 1000
+            for i, limit in enumerate(self.BUCKETS_MS):
+                if ms <= limit:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+    
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<= {limit} ms" for limit in self.BUCKETS_MS] + [f"> {self.BUCKETS_MS[-1]} ms"]
+            # Liste (et non dict) pour garder l'ordre des tranches dans le JSON
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'attente_moyenne_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'attente_max_ms': round(self.max_wait * 1000, 3),
+                'histogramme': [{'tranche': label, 'checkouts': n} for label, n in zip(labels, self.buckets)]
+            }
+
+pool_wait_stats = PoolWaitStats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool qui mesure le temps d'attente de chaque checkout"""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            pool_wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_wait_stats.record(time.perf_counter() - start)
+        return conn
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'oui', 'on')
+
+def pool_options(db_path):
+    """
+    Options du pool de connexions, configurables par variables d'environnement :
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_POOL_RECYCLE
+    - PostgreSQL : pre-ping et recyclage actifs par défaut (connexions coupées par le proxy Railway)
+    - SQLite fichier : pool plus petit, ni pre-ping ni recyclage
+    - SQLite mémoire : pool par défaut de SQLAlchemy (une seule connexion)
+    """
+    is_sqlite = db_path.startswith('sqlite')
+    if is_sqlite and (':memory:' in db_path or db_path in ('sqlite://', 'sqlite:///')):
+        return {}
+    
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5 if is_sqlite else 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', not is_sqlite),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', -1 if is_sqlite else 1800))
+    }
+
+def pool_report(engine):
+    """Rapport sur l'état du pool et les temps d'attente au checkout"""
+    pool = engine.pool
+    report = {
+        'pool': pool.__class__.__name__,
+        'status': pool.status(),
+        'attente_checkout': pool_wait_stats.snapshot()
+    }
+    if isinstance(pool, QueuePool):
+        report.update({
+            'taille': pool.size(),
+            'connexions_ouvertes': pool.checkedin() + pool.checkedout(),
+            'connexions_utilisees': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+    return report
+
 # Initialisation de la base de données
-def init_db(db_path=None):
+def init_db(db_path=None, **engine_options):
     """
     Initialise la base de données
     - Utilise DATABASE_URL (PostgreSQL) si disponible (Railway)
     - Sinon utilise SQLite en local
+    - engine_options surcharge les options du pool (pool_size, max_overflow, ...)
     """
     if db_path is None:
         # Priorité à DATABASE_URL (Railway/Heroku/etc)
@@ -349,10 +728,26 @@ def init_db(db_path=None):
             db_path = 'sqlite:///reperage.db'
             print(f"📊 Base de données: SQLite (reperage.db)")
     
-    engine = create_engine(db_path, echo=False)
+    options = pool_options(db_path)
+    options.update(engine_options)
+    
+    engine = create_engine(db_path, echo=False, **options)
     Base.metadata.create_all(engine)
+    
+    # Premier démarrage avec les compteurs : les initialiser depuis les repérages existants
+    with engine.begin() as connection:
+        if connection.execute(select(func.count()).select_from(CompteurStatut.__table__)).scalar() == 0:
+            rebuild_compteurs_statut(connection)
     return engine
 
+def init_session_registry(engine):
+    """
+    Registre de sessions créé une seule fois au démarrage :
+    une session par thread/requête, libérée par app.teardown_appcontext
+    """
+    return scoped_session(sessionmaker(bind=engine))
+
 def get_session(engine):
+    """Session autonome (scripts de maintenance, hors requête Flask)"""
     Session = sessionmaker(bind=engine)
     return Session()
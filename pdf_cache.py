@@ -0,0 +1,88 @@
+"""
+Cache disque des PDF de repérage
+- un fichier par (repérage, version du contenu) : reperage_<id>_<clé>.pdf ; une nouvelle version
+  n'est jamais servie depuis un ancien fichier, les anciens sont supprimés dès qu'elle est écrite
+- éviction LRU bornée en octets : la date de modification est rafraîchie à chaque lecture
+- partagé entre processus (écriture dans un fichier temporaire puis rename atomique)
+"""
+
+import glob
+import os
+import secrets
+import threading
+
+class PdfCache:
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, reperage_id, key):
+        return os.path.join(self.folder, f"reperage_{reperage_id}_{key}.pdf")
+
+    def get(self, reperage_id, key):
+        """Chemin du PDF en cache pour cette version, None sinon"""
+        path = self.path(reperage_id, key)
+        try:
+            os.utime(path)  # Utilisé récemment (LRU)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, reperage_id, key, render):
+        """
+        Produire le PDF de cette version avec render(chemin temporaire) et le mettre en cache
+        Renvoie (chemin, résultat de render)
+        """
+        path = self.path(reperage_id, key)
+        tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+        try:
+            result = render(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.invalidate(reperage_id, keep=path)
+        self.evict(keep=path)
+        return path, result
+
+    def invalidate(self, reperage_id, keep=None):
+        """Supprimer les PDF en cache d'un repérage (sauf keep)"""
+        for path in glob.glob(os.path.join(self.folder, f"reperage_{reperage_id}_*.pdf")):
+            if path != keep:
+                self._remove(path)
+
+    def evict(self, keep=None):
+        """Supprimer les PDF les moins récemment utilisés au-delà de max_bytes"""
+        with self._lock:
+            entries = []
+            for path in glob.glob(os.path.join(self.folder, 'reperage_*.pdf')):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._remove(path)
+                total -= size
+
+    def stats(self):
+        """Nombre de fichiers et octets occupés"""
+        sizes = [os.path.getsize(path) for path in glob.glob(os.path.join(self.folder, 'reperage_*.pdf'))]
+        return {'fichiers': len(sizes), 'octets': sum(sizes), 'max_octets': self.max_bytes}
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
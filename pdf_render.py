@@ -0,0 +1,332 @@
+"""
+Rendu ReportLab des dossiers PDF de repérage
+- fonctions pures : elles reçoivent les données déjà lues en base (dict, voir app.reperage_pdf_data)
+  et peuvent donc s'exécuter dans un processus du pool (images.run_in_process_pool)
+- une fonction par section (add_*_section), partagées par le PDF d'un repérage et les exports groupés
+  (render_batch_pdf : un document avec table des matières)
+- photos réduites à la résolution d'impression (settings : dpi, qualité JPEG, nombre maximal)
+"""
+
+import functools
+import io
+from PIL import Image as PILImage, ImageOps
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
+from reportlab.platypus.tableofcontents import TableOfContents
+from images import to_rgb
+
+# Résolution par défaut (surchargée par PDF_IMAGE_DPI, PDF_IMAGE_QUALITY, PDF_PHOTOS_MAX)
+DEFAULT_SETTINGS = {'dpi': 150, 'quality': 70, 'max_photos': 4, 'max_annexes': 12}
+
+# Cadres des photos (largeur, hauteur maximales en cm)
+PORTRAIT_BOX = (5, 6.5)
+LIEU_BOX = (7.5, 5.5)
+ANNEXE_BOX = (5, 4)
+
+@functools.lru_cache(maxsize=1)
+def pdf_styles():
+    """Styles du PDF, créés une fois par processus"""
+    styles = getSampleStyleSheet()
+
+    # Styles personnalisés
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=28,
+        textColor=colors.HexColor('#FF6B35'),
+        spaceAfter=10,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=14,
+        textColor=colors.HexColor('#666666'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#FF6B35'),
+        spaceAfter=12,
+        spaceBefore=20,
+        fontName='Helvetica-Bold'
+    )
+
+    subheading_style = ParagraphStyle(
+        'CustomSubheading',
+        parent=styles['Heading3'],
+        fontSize=12,
+        textColor=colors.HexColor('#FF8C5A'),
+        spaceAfter=8,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    )
+
+    # Titre d'un repérage dans un export groupé (entrée de la table des matières)
+    reperage_style = ParagraphStyle(
+        'ReperageTitle',
+        parent=styles['Heading1'],
+        fontSize=22,
+        textColor=colors.HexColor('#FF6B35'),
+        spaceAfter=16,
+        fontName='Helvetica-Bold'
+    )
+
+    toc_style = ParagraphStyle(
+        'TocEntry',
+        parent=styles['Normal'],
+        fontSize=12,
+        leftIndent=0.5*cm,
+        firstLineIndent=-0.5*cm,
+        spaceBefore=4,
+    )
+
+    return {'Normal': styles['Normal'], 'title': title_style, 'subtitle': subtitle_style,
+            'heading': heading_style, 'subheading': subheading_style,
+            'reperage': reperage_style, 'toc': toc_style}
+
+# ============= PHOTOS =============
+
+def downsample_photo(path, box, settings):
+    """
+    Photo réduite au cadre box (cm) à settings['dpi'], recompressée en JPEG : (octets, largeur, hauteur)
+    None si le fichier est absent ou illisible (le PDF est produit sans elle)
+    """
+    max_px = (int(box[0] / 2.54 * settings['dpi']), int(box[1] / 2.54 * settings['dpi']))
+    try:
+        with PILImage.open(path) as original:
+            img = to_rgb(ImageOps.exif_transpose(original))
+            img.thumbnail(max_px, PILImage.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, 'JPEG', quality=settings['quality'], optimize=True)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Photo ignorée dans le PDF ({path}): {e}")
+        return None
+    return buffer.getvalue(), img.width, img.height
+
+def pdf_image(photo, box, settings):
+    """Flowable d'une photo : chemin du fichier, ou photo déjà réduite par prepare_photos"""
+    if isinstance(photo, str):
+        photo = downsample_photo(photo, box, settings)
+    if photo is None:
+        return None
+    data, width, height = photo
+    return Image(io.BytesIO(data), width=width / settings['dpi'] * 2.54 * cm, height=height / settings['dpi'] * 2.54 * cm)
+
+def prepare_photos(data, settings=None):
+    """
+    Copie de data dont les photos sont déjà réduites (mêmes cadres et limites que les sections)
+    Exécutée en parallèle dans le pool pour les exports groupés : il ne reste que la mise en page
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    def reduce(paths, box, limit):
+        return [photo for photo in (downsample_photo(path, box, settings) for path in paths[:limit]) if photo]
+    return {
+        **data,
+        'gardiens': [{**g, 'photos': reduce(g['photos'], PORTRAIT_BOX, settings['max_photos'])} for g in data['gardiens']],
+        'lieux': [{**lieu, 'photos': reduce(lieu['photos'], LIEU_BOX, settings['max_photos'])} for lieu in data['lieux']],
+        'photos_annexes': reduce(data['photos_annexes'], ANNEXE_BOX, settings['max_annexes'])
+    }
+
+def add_photo_row(story, photos, box, settings, per_row):
+    """Photos côte à côte, per_row par ligne"""
+    images = [image for image in (pdf_image(photo, box, settings) for photo in photos) if image is not None]
+    if not images:
+        return
+    rows = [images[i:i + per_row] for i in range(0, len(images), per_row)]
+    rows[-1] += [''] * (per_row - len(rows[-1]))
+    table = Table(rows, colWidths=[(box[0] + 0.5) * cm] * per_row, hAlign='LEFT')
+    table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(table)
+    story.append(Spacer(1, 0.3*cm))
+
+# ============= SECTIONS =============
+
+def add_title(story):
+    styles = pdf_styles()
+    story.append(Paragraph("ROOTSKEEPERS", styles['title']))
+    story.append(Paragraph("Les Gardiens de la Tradition", styles['subtitle']))
+    story.append(Spacer(1, 0.5*cm))
+
+def add_infos_section(story, data):
+    """Informations principales (ordre : région, pays, fixer)"""
+    styles = pdf_styles()
+    reperage = data['reperage']
+    story.append(Paragraph("INFORMATIONS PRINCIPALES", styles['heading']))
+    rows = [
+        ['Région:', reperage['region'] or '-'],
+        ['Pays:', reperage['pays'] or '-'],
+        ['Fixer:', reperage['fixer_nom'] or '-'],
+        ['Email:', reperage['fixer_email'] or '-'],
+        ['Téléphone:', reperage['fixer_telephone'] or '-'],
+        ['Statut:', reperage['statut']],
+        ['Date:', reperage['date'] or '-'],
+    ]
+    t = Table(rows, colWidths=[4*cm, 12*cm])
+    t.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('LINEABOVE', (0, 0), (-1, 0), 1, colors.HexColor('#FF6B35')),
+        ('LINEBELOW', (0, -1), (-1, -1), 1, colors.HexColor('#FF6B35')),
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 0.8*cm))
+
+def add_fields_section(story, title, fields):
+    """Section libre (territoire, épisode) : une ligne par champ renseigné"""
+    if not fields:
+        return
+    styles = pdf_styles()
+    story.append(Paragraph(title, styles['heading']))
+    for key, value in fields.items():
+        if value and key != 'id':
+            label = key.replace('_', ' ').title()
+            story.append(Paragraph(f"<b>{label}:</b> {value}", styles['Normal']))
+            story.append(Spacer(1, 0.2*cm))
+    story.append(Spacer(1, 0.5*cm))
+
+def add_gardiens_section(story, data, settings):
+    """Les gardiens, chacun suivi de son portrait"""
+    if not data['gardiens']:
+        return
+    styles = pdf_styles()
+    story.append(Paragraph("LES 3 GARDIENS", styles['heading']))
+    for g in data['gardiens']:
+        story.append(Paragraph(f"Gardien {g['ordre']}", styles['subheading']))
+        if g['prenom'] or g['nom']:
+            story.append(Paragraph(f"<b>Nom:</b> {g['prenom'] or ''} {g['nom'] or ''}", styles['Normal']))
+        if g['age']:
+            story.append(Paragraph(f"<b>Âge:</b> {g['age']} ans", styles['Normal']))
+        if g['genre']:
+            story.append(Paragraph(f"<b>Genre:</b> {g['genre']}", styles['Normal']))
+        if g['fonction']:
+            story.append(Paragraph(f"<b>Fonction:</b> {g['fonction']}", styles['Normal']))
+        if g['savoir_transmis']:
+            story.append(Paragraph(f"<b>Savoir transmis:</b> {g['savoir_transmis']}", styles['Normal']))
+        if g['telephone'] or g['email']:
+            story.append(Paragraph(f"<b>Contact:</b> {g['telephone'] or ''} {g['email'] or ''}", styles['Normal']))
+        if g['photos']:
+            story.append(Spacer(1, 0.2*cm))
+            add_photo_row(story, g['photos'][:settings['max_photos']], PORTRAIT_BOX, settings, per_row=3)
+        story.append(Spacer(1, 0.5*cm))
+
+LIEU_FIELDS = [
+    ('type_environnement', 'Type'),
+    ('description_visuelle', 'Description'),
+    ('elements_symboliques', 'Éléments symboliques'),
+    ('cinegenie', 'Cinégénie'),
+    ('axes_camera', 'Axes caméra'),
+    ('accessibilite', 'Accessibilité'),
+    ('securite', 'Sécurité'),
+    ('autorisations_necessaires', 'Autorisations'),
+]
+
+def add_lieux_section(story, data, settings):
+    """Les lieux de tournage (nouvelle page), chacun suivi de ses photos"""
+    lieux = data['lieux']
+    if not lieux:
+        return
+    styles = pdf_styles()
+    story.append(PageBreak())
+    story.append(Paragraph(f"LIEUX DE TOURNAGE ({len(lieux)})", styles['heading']))
+
+    for lieu in lieux:
+        story.append(Paragraph(f"Lieu {lieu['numero_lieu']}: {lieu['nom'] or 'Sans nom'}", styles['subheading']))
+        for key, label in LIEU_FIELDS:
+            if lieu[key]:
+                story.append(Paragraph(f"<b>{label}:</b> {lieu[key]}", styles['Normal']))
+        if lieu['photos']:
+            story.append(Spacer(1, 0.2*cm))
+            add_photo_row(story, lieu['photos'][:settings['max_photos']], LIEU_BOX, settings, per_row=2)
+        story.append(Spacer(1, 0.7*cm))
+
+def add_annexes_section(story, data, settings):
+    """Photos portrait / lieu qui ne correspondent à aucun gardien ni lieu"""
+    if not data['photos_annexes']:
+        return
+    styles = pdf_styles()
+    story.append(Paragraph("PHOTOS", styles['heading']))
+    add_photo_row(story, data['photos_annexes'][:settings['max_annexes']], ANNEXE_BOX, settings, per_row=3)
+
+def add_reperage_story(story, data, settings):
+    """Toutes les sections d'un repérage, dans l'ordre du dossier"""
+    add_infos_section(story, data)
+    add_fields_section(story, "TERRITOIRE", data['territoire'])
+    add_fields_section(story, "ÉPISODE", data['episode'])
+    add_gardiens_section(story, data, settings)
+    add_lieux_section(story, data, settings)
+    add_annexes_section(story, data, settings)
+
+# ============= DOCUMENT =============
+
+DOCUMENT_MARGINS = {'topMargin': 2*cm, 'bottomMargin': 2*cm, 'leftMargin': 2*cm, 'rightMargin': 2*cm}
+
+def new_document(output):
+    return SimpleDocTemplate(output, pagesize=A4, **DOCUMENT_MARGINS)
+
+class BatchDocument(SimpleDocTemplate):
+    """Export groupé : chaque titre de repérage alimente la table des matières et les signets du PDF"""
+
+    def afterFlowable(self, flowable):
+        entry = getattr(flowable, 'toc_entry', None)
+        if entry:
+            text, key = entry
+            self.canv.bookmarkPage(key)
+            self.canv.addOutlineEntry(text, key, level=0)
+            self.notify('TOCEntry', (0, text, self.page, key))
+
+def reperage_title(data):
+    reperage = data['reperage']
+    return f"{reperage['region'] or 'Sans région'} ({reperage['pays'] or '-'}) - n° {reperage['id']}"
+
+def render_reperage_pdf(data, output, settings=None):
+    """Écrire le PDF d'un repérage dans output (chemin ou fichier binaire)"""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    story = []
+    add_title(story)
+    add_reperage_story(story, data, settings)
+    new_document(output).build(story)
+
+def render_batch_pdf(datas, output, settings=None, subtitle=None):
+    """
+    PDF groupé de plusieurs repérages : page de titre, table des matières (numéros de page et liens),
+    puis chaque repérage avec les mêmes sections que son PDF seul
+    datas : données de reperage_pdf_data, de préférence passées par prepare_photos
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    styles = pdf_styles()
+    toc = TableOfContents()
+    toc.levelStyles = [styles['toc']]
+
+    story = []
+    add_title(story)
+    if subtitle:
+        story.append(Paragraph(subtitle, styles['subtitle']))
+    story.append(Paragraph("SOMMAIRE", styles['heading']))
+    story.append(toc)
+
+    for data in datas:
+        story.append(PageBreak())
+        title = Paragraph(reperage_title(data), styles['reperage'])
+        title.toc_entry = (reperage_title(data), f"reperage-{data['reperage']['id']}")
+        story.append(title)
+        add_reperage_story(story, data, settings)
+
+    BatchDocument(output, pagesize=A4, **DOCUMENT_MARGINS).multiBuild(story)
@@ -83,8 +83,15 @@ document.addEventListener('DOMContentLoaded', async function() {
 // ============= TRADUCTIONS =============
 async function loadTranslations(lang) {
     try {
-        const response = await fetch(`${API_URL}/i18n/${lang}`);
-        translations = await response.json();
+        if (window.I18N && window.I18N.bundle && window.I18N.lang === lang) {
+            // Traductions intégrées à la page : pas de requête
+            translations = window.I18N.bundle;
+        } else {
+            // URL versionnée : servie depuis le cache du navigateur tant que i18n.json ne change pas
+            const version = window.I18N && window.I18N.version ? `?v=${window.I18N.version}` : '';
+            const response = await fetch(`${API_URL}/i18n/${lang}${version}`);
+            translations = await response.json();
+        }
         applyTranslations();
         currentLanguage = lang;
         localStorage.setItem('selectedLanguage', lang);
@@ -270,10 +277,15 @@ async function loadReperage(id) {
             throw new Error(`Repérage ${id} non trouvé`);
         }
         const reperage = await response.json();
+        currentETag = response.headers.get('ETag');
         
         // Remplir les formulaires avec les données
         fillFormData(reperage);
         
+        // Référence pour l'autosave différentiel
+        lastSavedData = collectFormData();
+        lastSavedInputs = snapshotInputs();
+        
         console.log('✅ Repérage chargé:', id);
     } catch (error) {
         console.error('Erreur chargement repérage:', error);
@@ -330,25 +342,103 @@ function fillGardienData(gardien, ordre) {
 }
 
 // ============= SAUVEGARDE AUTOMATIQUE =============
+let lastSavedData = null; // Dernier état enregistré côté serveur (null : inconnu, sauvegarde complète)
+let lastSavedInputs = {}; // Valeurs des champs du formulaire correspondant à lastSavedData
+let currentETag = null; // Version du repérage connue du client (If-Match des écritures)
+
+// Valeurs de tous les champs nommés du formulaire
+function snapshotInputs() {
+    const values = {};
+    document.querySelectorAll('input[name], textarea[name], select[name]').forEach(input => {
+        values[input.name] = input.value;
+    });
+    return values;
+}
+
+// Mettre à jour la version connue après une écriture (repérage ou gardien / lieu / média)
+function trackReperageETag(response) {
+    const etag = response.headers.get('X-Reperage-ETag') || response.headers.get('ETag');
+    if (etag) currentETag = etag;
+}
+
+// Écriture refusée (409 / 412) : le repérage a été modifié ailleurs, recharger la version courante
+// Les saisies non enregistrées sont réappliquées par-dessus : la prochaine sauvegarde
+// enverra leur différence avec l'état du serveur
+async function handleVersionConflict(response) {
+    if (response.status !== 409 && response.status !== 412) return false;
+    
+    const current = snapshotInputs();
+    const pending = {};
+    Object.keys(current).forEach(name => {
+        const saved = lastSavedInputs[name] ?? '';
+        if (current[name] !== saved) {
+            pending[name] = current[name];
+            // Revenir à la valeur enregistrée : le rechargement ne remplit que les champs non vides
+            document.querySelector(`[name="${name}"]`).value = saved;
+        }
+    });
+    
+    await loadReperage(currentReperageId);
+    
+    Object.keys(pending).forEach(name => {
+        const input = document.querySelector(`[name="${name}"]`);
+        if (input) input.value = pending[name];
+    });
+    
+    if (Object.keys(pending).length > 0) {
+        showNotification('Ce repérage a été modifié par ailleurs : vos modifications non enregistrées ont été conservées', 'error');
+    } else {
+        showNotification('Ce repérage a été modifié par ailleurs : rechargement', 'error');
+    }
+    return true;
+}
+
 function startAutoSave() {
     autoSaveTimer = setInterval(async () => {
         await saveReperage(false);
     }, 30000); // 30 secondes
 }
 
-async function saveReperage(showMessage = true) {
+async function saveReperage(showMessage = true, keepalive = false) {
     if (!currentReperageId) return;
     
     try {
         const formData = collectFormData();
+        const inputs = snapshotInputs();
+        
+        // Envoyer seulement les champs modifiés depuis la dernière sauvegarde
+        let method = 'PUT';
+        let body = formData;
+        if (lastSavedData) {
+            body = computePatch(lastSavedData, formData);
+            method = 'PATCH';
+            if (Object.keys(body).length === 0) {
+                if (showMessage) {
+                    showNotification('Sauvegarde réussie', 'success');
+                }
+                return;
+            }
+        }
+        
+        const headers = { 'Content-Type': 'application/json' };
+        if (currentETag) headers['If-Match'] = currentETag;
         
         const response = await fetch(`${API_URL}/reperages/${currentReperageId}`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(formData)
+            method: method,
+            headers: headers,
+            body: JSON.stringify(body),
+            keepalive: keepalive
         });
         
+        if (await handleVersionConflict(response)) return;
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        
         const result = await response.json();
+        lastSavedData = formData;
+        lastSavedInputs = inputs;
+        trackReperageETag(response);
         
         if (showMessage) {
             showNotification('Sauvegarde réussie', 'success');
@@ -363,6 +453,56 @@ async function saveReperage(showMessage = true) {
     }
 }
 
+// Différence entre deux états de collectFormData() au format attendu par PATCH /api/reperages/<id>
+function computePatch(previous, current) {
+    const patch = {};
+    
+    Object.keys(current).forEach(key => {
+        if (typeof current[key] !== 'object' && current[key] !== previous[key]) {
+            patch[key] = current[key];
+        }
+    });
+    
+    // Données JSON : clés modifiées, null pour une clé vidée
+    ['territoire_data', 'episode_data'].forEach(field => {
+        const changes = {};
+        Object.keys(current[field]).forEach(key => {
+            if (current[field][key] !== previous[field][key]) changes[key] = current[field][key];
+        });
+        Object.keys(previous[field]).forEach(key => {
+            if (!(key in current[field])) changes[key] = null;
+        });
+        if (Object.keys(changes).length > 0) patch[field] = changes;
+    });
+    
+    // Gardiens / lieux : champs modifiés par ordre / numero_lieu, _delete si l'élément a été vidé
+    [['gardiens', 'ordre'], ['lieux', 'numero_lieu']].forEach(([collection, key]) => {
+        const changes = [];
+        const before = {};
+        previous[collection].forEach(item => { before[item[key]] = item; });
+        
+        current[collection].forEach(item => {
+            const old = before[item[key]] || {};
+            const change = {};
+            Object.keys(item).forEach(field => {
+                if (item[field] !== old[field]) change[field] = item[field];
+            });
+            if (Object.keys(change).length > 0) {
+                change[key] = item[key];
+                changes.push(change);
+            }
+            delete before[item[key]];
+        });
+        Object.keys(before).forEach(id => {
+            changes.push({ [key]: before[id][key], _delete: true });
+        });
+        
+        if (changes.length > 0) patch[collection] = changes;
+    });
+    
+    return patch;
+}
+
 function collectFormData() {
     const formData = {
         langue_interface: currentLanguage,
@@ -484,6 +624,7 @@ async function saveGardien(ordre) {
         });
         
         const result = await response.json();
+        trackReperageETag(response);
         console.log('✅ Gardien sauvegardé:', result);
     } catch (error) {
         console.error('Erreur sauvegarde gardien:', error);
@@ -498,6 +639,9 @@ function initFileUpload() {
     
     if (!dropArea || !fileInput) return;
     
+    // Catégorie des médias envoyés depuis cette zone (portrait, lieu, general...)
+    const categorie = dropArea.dataset.categorie || 'general';
+    
     // Clic sur zone pour ouvrir sélecteur
     dropArea.addEventListener('click', () => fileInput.click());
     
@@ -515,63 +659,185 @@ function initFileUpload() {
         e.preventDefault();
         dropArea.classList.remove('drag-over');
         const files = e.dataTransfer.files;
-        handleFiles(files);
+        handleFiles(files, categorie);
     });
     
     // Sélection de fichiers
     fileInput.addEventListener('change', (e) => {
-        handleFiles(e.target.files);
+        handleFiles(e.target.files, categorie);
     });
 }
 
-async function handleFiles(files) {
+async function handleFiles(files, categorie = 'general') {
     const fileArray = Array.from(files);
     
     for (let file of fileArray) {
-        await uploadFile(file);
+        await uploadFile(file, categorie);
     }
 }
 
-async function uploadFile(file) {
-    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('categorie', 'general');
+// Upload reprenable : session, morceaux envoyés à l'offset reçu par le serveur, finalisation
+// Après une coupure, l'upload reprend seul (retour du réseau ou nouvel essai) là où il s'est arrêté
+const UPLOAD_RETRY_DELAYS = [1000, 2000, 5000, 10000, 30000];
+
+function uploadStorageKey(file, categorie) {
+    return `upload:${currentReperageId}:${categorie}:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+function waitBeforeRetry(attempt) {
+    const delay = UPLOAD_RETRY_DELAYS[Math.min(attempt, UPLOAD_RETRY_DELAYS.length - 1)];
+    return new Promise(resolve => {
+        const done = () => {
+            clearTimeout(timer);
+            window.removeEventListener('online', done);
+            resolve();
+        };
+        const timer = setTimeout(done, delay);
+        window.addEventListener('online', done);
+    });
+}
+
+// SHA-256 du fichier (hexadécimal) : le serveur évite le transfert s'il a déjà ce contenu
+// Calculé en mémoire, donc seulement jusqu'à UPLOAD_HASH_MAX_SIZE et en contexte sécurisé (HTTPS)
+const UPLOAD_HASH_MAX_SIZE = 64 * 1024 * 1024;
+
+async function fileSHA256(file) {
+    if (file.size > UPLOAD_HASH_MAX_SIZE || !window.crypto || !crypto.subtle) return null;
+    try {
+        const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    } catch (error) {
+        return null;
+    }
+}
+
+async function openUploadSession(file, sha256, categorie) {
+    // Session d'un essai précédent (page rechargée, coupure) : reprendre à son offset
+    const previousId = localStorage.getItem(uploadStorageKey(file, categorie));
+    if (previousId) {
+        const response = await fetch(`${API_URL}/uploads/${previousId}`);
+        if (response.ok) return response.json();
+        localStorage.removeItem(uploadStorageKey(file, categorie));
+    }
     
+    const response = await fetch(`${API_URL}/reperages/${currentReperageId}/uploads`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            nom: file.name,
+            taille: file.size,
+            mime_type: file.type,
+            categorie: categorie,
+            sha256: sha256
+        })
+    });
+    const upload = await response.json();
+    if (!response.ok) throw new Error(upload.error || `HTTP ${response.status}`);
+    if (upload.deduplique) {
+        trackReperageETag(response); // Média créé directement (pas de session)
+    } else {
+        localStorage.setItem(uploadStorageKey(file, categorie), upload.upload_id);
+    }
+    return upload;
+}
+
+async function uploadFile(file, categorie = 'general') {
     const progressBar = document.getElementById('upload-progress');
-    const progressBarFill = document.querySelector('.progress-bar');
-    const progressText = document.querySelector('.progress-text');
+    const progressBarFill = progressBar ? progressBar.querySelector('.progress-bar') : null;
+    const progressText = progressBar ? progressBar.querySelector('.progress-text') : null;
+    
+    const showProgress = (offset, message) => {
+        if (!progressBar) return;
+        const percent = file.size ? Math.round(offset * 100 / file.size) : 100;
+        progressBarFill.style.width = `${percent}%`;
+        progressText.textContent = message || `Upload de ${file.name}... ${percent}%`;
+    };
     
     if (progressBar) {
         progressBar.classList.add('active');
-        progressText.textContent = `Upload de ${file.name}...`;
     }
     
     try {
-        const response = await fetch(`${API_URL}/reperages/${currentReperageId}/medias`, {
+        const sha256 = await fileSHA256(file);
+        const upload = await openUploadSession(file, sha256, categorie);
+        if (upload.deduplique) {
+            // Contenu déjà sur le serveur : média créé sans transfert
+            addFileToPreview(upload);
+            showNotification('Fichier uploadé avec succès', 'success');
+            return;
+        }
+        let offset = upload.offset;
+        let attempt = 0;
+        showProgress(offset);
+        
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + upload.chunk_size);
+            try {
+                const response = await fetch(upload.upload_url, {
+                    method: 'PUT',
+                    headers: { 'Upload-Offset': String(offset), 'Content-Type': 'application/octet-stream' },
+                    body: chunk
+                });
+                const status = await response.json();
+                if (response.status === 409) {
+                    offset = status.offset; // Le serveur a reçu plus (ou moins) que prévu
+                    continue;
+                }
+                if (!response.ok) throw new Error(status.error || `HTTP ${response.status}`);
+                offset = status.offset;
+                attempt = 0;
+                showProgress(offset);
+            } catch (error) {
+                if (error instanceof TypeError) {
+                    // Réseau coupé : attendre puis redemander l'offset reçu par le serveur
+                    showProgress(offset, `Connexion perdue, reprise de ${file.name}...`);
+                    await waitBeforeRetry(attempt++);
+                    try {
+                        const response = await fetch(upload.upload_url);
+                        if (response.ok) offset = (await response.json()).offset;
+                    } catch (e) { /* toujours hors ligne : nouvel essai au tour suivant */ }
+                    continue;
+                }
+                throw error;
+            }
+        }
+        
+        const response = await fetch(`${upload.upload_url}/finaliser`, {
             method: 'POST',
-            body: formData
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ sha256: sha256 })
         });
-        
         const result = await response.json();
+        if (!response.ok) throw new Error(result.error || `HTTP ${response.status}`);
+        localStorage.removeItem(uploadStorageKey(file, categorie));
+        trackReperageETag(response);
         
         // Ajouter à la liste des fichiers
         addFileToPreview(result);
         
         showNotification('Fichier uploadé avec succès', 'success');
-        
-        if (progressBar) {
-            progressBar.classList.remove('active');
-        }
     } catch (error) {
         console.error('Erreur upload:', error);
         showNotification('Erreur lors de l\'upload', 'error');
-        
+    } finally {
         if (progressBar) {
             progressBar.classList.remove('active');
         }
     }
 }
 
+// Vignette WebP (repli JPEG) ; original tant que les images dérivées ne sont pas générées
+function photoPreviewHTML(media) {
+    const grid = media.derives && media.derives.grid;
+    if (!grid) {
+        return `<img src="${media.url}" loading="lazy" alt="${media.nom_original}">`;
+    }
+    return `<picture>
+            <source srcset="${grid.webp}" type="image/webp">
+            <img src="${grid.jpeg}" width="${grid.width}" height="${grid.height}" loading="lazy" alt="${media.nom_original}">
+        </picture>`;
+}
+
 function addFileToPreview(media) {
     const filesList = document.getElementById('files-list');
     if (!filesList) return;
@@ -579,7 +845,7 @@ function addFileToPreview(media) {
     const fileItem = document.createElement('div');
     fileItem.className = 'file-item';
     fileItem.innerHTML = `
-        ${media.type === 'photo' ? `<img src="/uploads/thumbnails/thumb_${media.nom_fichier}" alt="${media.nom_original}">` : ''}
+        ${media.type === 'photo' ? photoPreviewHTML(media) : ''}
         <span>${media.nom_original}</span>
         <button class="delete-btn" onclick="deleteFile(${media.id})">×</button>
     `;
@@ -591,9 +857,10 @@ async function deleteFile(mediaId) {
     if (!confirm('Supprimer ce fichier ?')) return;
     
     try {
-        await fetch(`${API_URL}/medias/${mediaId}`, {
+        const response = await fetch(`${API_URL}/medias/${mediaId}`, {
             method: 'DELETE'
         });
+        trackReperageETag(response);
         
         // Recharger la liste
         await loadMedias();
@@ -665,10 +932,13 @@ async function submitReperage() {
         
         // Puis soumettre
         const response = await fetch(`${API_URL}/reperages/${currentReperageId}/submit`, {
-            method: 'POST'
+            method: 'POST',
+            headers: currentETag ? { 'If-Match': currentETag } : {}
         });
         
+        if (await handleVersionConflict(response)) return;
         const result = await response.json();
+        trackReperageETag(response);
         
         showNotification('Repérage soumis avec succès !', 'success');
         
@@ -785,14 +1055,19 @@ function initProgressTracking() {
 // ============= UTILITAIRES =============
 // Nettoyer avant de quitter
 window.addEventListener('beforeunload', (e) => {
-    saveReperage(false);
+    // keepalive : la requête survit à la fermeture de la page
+    saveReperage(false, true);
 });
 
 // ============= SYSTÈME DE CHAT =============
 let chatOpen = false;
 let chatPollingInterval = null;
 let lastMessageCount = 0;
-let lastMessagesJsonFixer = ''; // Pour détecter les changements
+let fixerMessages = []; // Fil affiché
+let lastMessageIdFixer = null; // Curseur du polling incrémental (null : pas encore chargé)
+let hasOlderMessagesFixer = false; // Historique plus ancien disponible
+let chatEventSource = null;
+let chatEventsConnected = false; // true : le polling n'est plus nécessaire
 
 function initChat() {
     const chatToggleBtn = document.getElementById('chat-toggle-btn');
@@ -809,12 +1084,14 @@ function initChat() {
         chatPanel.classList.toggle('active', chatOpen);
         
         if (chatOpen) {
-            lastMessagesJsonFixer = ''; // Reset
+            resetChatMessages();
             loadMessages();
             startChatPolling();
+            connectChatEvents();
             chatInput.focus();
         } else {
             stopChatPolling();
+            disconnectChatEvents();
         }
     });
     
@@ -822,11 +1099,17 @@ function initChat() {
         chatOpen = false;
         chatPanel.classList.remove('active');
         stopChatPolling();
+        disconnectChatEvents();
     });
     
     // Envoyer message
     chatSendBtn.addEventListener('click', sendMessage);
     
+    // Historique : charger les messages plus anciens en remontant en haut du fil
+    document.getElementById('chat-messages').addEventListener('scroll', (e) => {
+        if (e.target.scrollTop === 0) loadOlderMessages();
+    });
+    
     // Entrée pour envoyer (Shift+Entrée = saut de ligne)
     chatInput.addEventListener('keydown', (e) => {
         if (e.key === 'Enter' && !e.shiftKey) {
@@ -846,36 +1129,88 @@ function initChat() {
     // Charger le compteur de messages non lus
     updateUnreadCount();
     
-    // Polling périodique pour nouveaux messages (si chat fermé)
+    // Polling périodique pour nouveaux messages (si chat fermé et flux SSE indisponible)
     setInterval(() => {
-        if (!chatOpen) {
+        if (!chatOpen && !chatEventsConnected) {
             updateUnreadCount();
         }
     }, 10000); // Toutes les 10 secondes
 }
 
+// Flux d'événements du repérage : nouveaux messages, accusés de lecture, statut
+// Ouvert seulement pendant que le chat est affiché : chaque flux occupe un thread du serveur
+function connectChatEvents() {
+    if (!window.EventSource || !currentReperageId || chatEventSource) return;
+    
+    chatEventSource = new EventSource(`${API_URL}/reperages/${currentReperageId}/events`);
+    
+    chatEventSource.onopen = () => {
+        chatEventsConnected = true;
+        stopChatPolling();
+    };
+    
+    // Coupure ou serveur saturé (503) : retour au polling
+    chatEventSource.onerror = () => {
+        chatEventsConnected = false;
+        if (chatOpen) startChatPolling();
+    };
+    
+    chatEventSource.addEventListener('nouveau_message', () => {
+        if (chatOpen) {
+            loadMessages();
+        } else {
+            updateUnreadCount();
+        }
+    });
+    
+    chatEventSource.addEventListener('messages_lus', () => {
+        if (chatOpen) loadMessages();
+    });
+    
+    chatEventSource.addEventListener('statut', (e) => {
+        const data = JSON.parse(e.data);
+        showNotification(`Statut du repérage : ${data.statut}`, 'info');
+    });
+}
+
+function disconnectChatEvents() {
+    if (!chatEventSource) return;
+    chatEventSource.close();
+    chatEventSource = null;
+    chatEventsConnected = false;
+}
+
+function resetChatMessages() {
+    fixerMessages = [];
+    lastMessageIdFixer = null;
+    hasOlderMessagesFixer = false;
+}
+
 async function loadMessages() {
     if (!currentReperageId) return;
     
     try {
-        const response = await fetch(`${API_URL}/reperages/${currentReperageId}/messages`);
+        // Premier chargement : les 50 derniers messages, ensuite seulement les nouveaux
+        const params = lastMessageIdFixer === null ? 'limit=50' : `after_id=${lastMessageIdFixer}`;
+        const response = await fetch(`${API_URL}/reperages/${currentReperageId}/messages?${params}`);
         if (!response.ok) throw new Error('Erreur chargement messages');
         
-        const messages = await response.json();
+        const newMessages = await response.json();
         
-        // Vérifier si les messages ont changé
-        const newMessagesJson = JSON.stringify(messages);
-        if (newMessagesJson === lastMessagesJsonFixer) {
-            // Pas de changement, ne rien faire
+        if (lastMessageIdFixer === null) {
+            hasOlderMessagesFixer = response.headers.get('X-Has-More') === '1';
+        } else if (newMessages.length === 0) {
+            // Pas de nouveau message, ne rien faire
             return;
         }
         
-        // Messages ont changé, mettre à jour
-        lastMessagesJsonFixer = newMessagesJson;
-        displayMessages(messages);
+        // Nouveaux messages, mettre à jour
+        fixerMessages = fixerMessages.concat(newMessages);
+        lastMessageIdFixer = fixerMessages.length ? fixerMessages[fixerMessages.length - 1].id : 0;
+        displayMessages(fixerMessages);
         
         // Marquer les messages de la production comme lus
-        markProductionMessagesAsRead(messages);
+        markProductionMessagesAsRead(newMessages);
         
         // Scroll vers le bas
         scrollToBottom();
@@ -885,6 +1220,30 @@ async function loadMessages() {
     }
 }
 
+async function loadOlderMessages() {
+    if (!hasOlderMessagesFixer || fixerMessages.length === 0) return;
+    hasOlderMessagesFixer = false; // Évite les appels concurrents
+    
+    try {
+        const response = await fetch(`${API_URL}/reperages/${currentReperageId}/messages?before_id=${fixerMessages[0].id}&limit=50`);
+        if (!response.ok) throw new Error('Erreur chargement historique');
+        
+        const olderMessages = await response.json();
+        hasOlderMessagesFixer = response.headers.get('X-Has-More') === '1';
+        
+        // Garder la position de lecture après l'ajout en haut
+        const chatMessages = document.getElementById('chat-messages');
+        const previousHeight = chatMessages.scrollHeight;
+        fixerMessages = olderMessages.concat(fixerMessages);
+        displayMessages(fixerMessages);
+        chatMessages.scrollTop = chatMessages.scrollHeight - previousHeight;
+        
+    } catch (error) {
+        console.error('Erreur chargement historique:', error);
+        hasOlderMessagesFixer = true;
+    }
+}
+
 function displayMessages(messages) {
     const chatMessages = document.getElementById('chat-messages');
     
@@ -982,15 +1341,20 @@ async function markProductionMessagesAsRead(messages) {
     const unreadProductionMessages = messages.filter(msg => 
         msg.auteur_type === 'production' && !msg.lu
     );
+    if (unreadProductionMessages.length === 0) return;
     
-    for (const msg of unreadProductionMessages) {
-        try {
-            await fetch(`${API_URL}/messages/${msg.id}/read`, {
-                method: 'PUT'
-            });
-        } catch (error) {
-            console.error('Erreur marquage lu:', error);
-        }
+    try {
+        // Un seul appel : tout ce que la production a envoyé jusqu'au dernier message non lu
+        await fetch(`${API_URL}/reperages/${currentReperageId}/messages/read`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                for: 'fixer',
+                up_to_id: unreadProductionMessages[unreadProductionMessages.length - 1].id
+            })
+        });
+    } catch (error) {
+        console.error('Erreur marquage lu:', error);
     }
     
     // Mettre à jour le badge
@@ -1022,7 +1386,8 @@ async function updateUnreadCount() {
 }
 
 function startChatPolling() {
-    // Recharger les messages toutes les 5 secondes quand le chat est ouvert
+    // Recharger les messages toutes les 5 secondes quand le chat est ouvert (repli sans SSE)
+    if (chatEventsConnected || chatPollingInterval) return;
     chatPollingInterval = setInterval(loadMessages, 5000);
 }
 
@@ -1045,40 +1410,3 @@ function escapeHtml(text) {
     div.textContent = text;
     return div.innerHTML.replace(/\n/g, '<br>');
 }
-// AJOUTE CE CODE À LA FIN DE TON app.js POUR VOIR CE QUI SE PASSE
-
-console.log("=== DEBUG I18N ===");
-
-// Vérifier si les traductions se chargent
-document.addEventListener('DOMContentLoaded', async () => {
-    console.log("🔍 Test chargement traductions...");
-    
-    try {
-        const response = await fetch('/api/i18n/FR');
-        const data = await response.json();
-        console.log("✅ Traductions FR chargées:", data);
-        console.log("📝 Structure:", Object.keys(data));
-        
-        // Vérifier si les éléments existent
-        const elementsWithI18n = document.querySelectorAll('[data-i18n]');
-        console.log(`📌 ${elementsWithI18n.length} éléments avec data-i18n trouvés`);
-        
-        const elementsWithPlaceholder = document.querySelectorAll('[data-i18n-placeholder]');
-        console.log(`📌 ${elementsWithPlaceholder.length} éléments avec data-i18n-placeholder trouvés`);
-        
-        // Tester l'application des traductions
-        if (window.applyTranslations) {
-            console.log("🔧 Fonction applyTranslations existe");
-            window.translations = data;
-            window.applyTranslations();
-            console.log("✅ applyTranslations() appelée");
-        } else {
-            console.error("❌ Fonction applyTranslations introuvable!");
-        }
-        
-    } catch (error) {
-        console.error("❌ Erreur:", error);
-    }
-});
-
-console.log("=== FIN DEBUG I18N ===");
\ No newline at end of file
@@ -0,0 +1,63 @@
+// ============= TÂCHES DE FOND (PDF, EXPORTS GROUPÉS) =============
+// Le serveur répond 202 avec l'URL de suivi : attendre la fin de la tâche puis télécharger le fichier
+// (ou directement le fichier s'il est déjà prêt)
+
+const JOB_POLL_INTERVAL = 1000;
+
+async function enregistrerFichier(response) {
+    const disposition = response.headers.get('Content-Disposition') || '';
+    const match = disposition.match(/filename="?([^";]+)"?/);
+    const lien = document.createElement('a');
+    lien.href = URL.createObjectURL(await response.blob());
+    lien.download = match ? match[1] : '';
+    document.body.appendChild(lien);
+    lien.click();
+    lien.remove();
+    setTimeout(() => URL.revokeObjectURL(lien.href), 1000);
+}
+
+async function telechargerViaTache(url, element) {
+    const label = element ? element.innerHTML : null;
+    if (element) {
+        element.style.pointerEvents = 'none';
+        element.innerHTML = '⏳ Préparation...';
+    }
+
+    try {
+        const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+        if (response.ok && response.status !== 202) {
+            // Fichier déjà prêt (PDF en cache) : reçu directement
+            await enregistrerFichier(response);
+            return;
+        }
+        if (response.status !== 202) {
+            throw new Error(await response.text());
+        }
+        const accepted = await response.json();
+
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+            const job = await (await fetch(accepted.statut_url)).json();
+
+            if (job.statut === 'termine') {
+                window.location = job.download_url;
+                return;
+            }
+            if (job.statut === 'echec') {
+                throw new Error(job.erreur || 'Tâche en échec');
+            }
+            if (element && job.progression) {
+                // Exports groupés : repérages traités / total
+                element.innerHTML = `⏳ ${job.progression.faits}/${job.progression.total}`;
+            }
+        }
+    } catch (error) {
+        console.error('Erreur tâche de fond:', error);
+        alert('❌ ' + error.message);
+    } finally {
+        if (element) {
+            element.style.pointerEvents = '';
+            element.innerHTML = label;
+        }
+    }
+}
@@ -0,0 +1,112 @@
+"""
+Stockage des médias par contenu (SHA-256) : un seul fichier par contenu, partagé par les médias identiques
+- fichier rangé sous blobs/<2 premiers caractères>/<sha256>.<extension> du dossier uploads (nom immuable)
+- Blob.nb_references compte les médias qui pointent vers le fichier ; la dernière référence libérée
+  supprime la ligne, les fichiers sont effacés ensuite par une tâche de fond (purge_blob) qui
+  verrouille le contenu pendant l'effacement
+- les images dérivées d'un blob sont rangées à côté de lui et partagées de la même façon
+"""
+
+import hashlib
+import os
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from models import Blob
+
+READ_SIZE = 64 * 1024
+
+def hash_file(path):
+    """SHA-256 d'un fichier déjà sur disque (lecture par blocs)"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def save_stream(stream, path):
+    """Écrire un flux dans path en calculant son SHA-256 au passage ; renvoie le hash"""
+    hasher = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for block in iter(lambda: stream.read(READ_SIZE), b''):
+            f.write(block)
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def add_reference(session, sha256):
+    """Compter une référence de plus sur un blob existant ; None s'il n'existe pas"""
+    updated = session.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(nb_references=Blob.nb_references + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return session.get(Blob, sha256, populate_existing=True) if updated else None
+
+def store_blob(session, upload_folder, source_path, sha256, extension):
+    """
+    Ranger un fichier reçu sous son contenu, avec une référence pour le média qui va être créé
+    - contenu nouveau : le fichier est déplacé (rename, pas de copie) vers blobs/
+    - contenu déjà stocké : le fichier reçu est supprimé
+    Renvoie le Blob
+    """
+    blob = add_reference(session, sha256)
+    if blob is None:
+        relpath = f"{Blob.folder(sha256)}/{sha256}.{extension.lower()}"
+        try:
+            with session.begin_nested():
+                blob = Blob(sha256=sha256, chemin=relpath, taille_octets=os.path.getsize(source_path),
+                            nb_references=1)
+                session.add(blob)
+        except IntegrityError:
+            # Même contenu enregistré au même moment par une autre requête
+            blob = add_reference(session, sha256)
+        else:
+            path = os.path.join(upload_folder, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(source_path, path)
+            return blob
+    os.remove(source_path)
+    return blob
+
+def release_reference(session, sha256):
+    """
+    Retirer une référence ; si c'était la dernière, la ligne du blob est supprimée
+    Renvoie le chemin relatif du fichier à effacer (après le commit), ou None s'il reste des références
+    """
+    session.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(nb_references=Blob.nb_references - 1)
+        .execution_options(synchronize_session=False)
+    )
+    relpath = session.execute(
+        select(Blob.chemin).where(Blob.sha256 == sha256, Blob.nb_references <= 0)
+    ).scalar()
+    if relpath is None:
+        return None
+    session.execute(delete(Blob).where(Blob.sha256 == sha256, Blob.nb_references <= 0))
+    return relpath
+
+def purge_blob(session, sha256, paths):
+    """
+    Effacer les fichiers d'un blob sans référence, puis valider (tâche de fond)
+    Une ligne temporaire du même SHA-256 est insérée pendant l'effacement : un upload du même
+    contenu (store_blob) attend le commit au lieu de ranger son fichier sous un chemin en cours
+    d'effacement ; si le blob existe de nouveau, rien n'est effacé
+    Renvoie True si les fichiers ont été effacés
+    """
+    try:
+        with session.begin_nested():
+            lock = Blob(sha256=sha256, chemin='', nb_references=0)
+            session.add(lock)
+    except IntegrityError:
+        session.rollback()
+        return False
+    try:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    finally:
+        session.delete(lock)
+        session.commit()
+    return True
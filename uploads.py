@@ -0,0 +1,78 @@
+"""
+Uploads reprenables (vidéos volumineuses, lots de photos, connexions instables)
+- le client crée une session, envoie des morceaux à un offset donné, consulte l'offset reçu
+  après une coupure, puis finalise (création du média)
+- chaque morceau est écrit directement dans le fichier de destination (.part) : ni fichier
+  temporaire ni copie ; un morceau interrompu est conservé jusqu'au dernier octet reçu
+- le SHA-256 est calculé au fil de l'eau ; si la session continue dans un autre processus,
+  il est recalculé depuis le fichier déjà reçu
+"""
+
+import hashlib
+import threading
+from werkzeug.exceptions import ClientDisconnected
+
+READ_SIZE = 64 * 1024
+
+class UploadHashes:
+    """SHA-256 en cours par session d'upload (propre au processus) et verrou d'écriture par session"""
+
+    def __init__(self):
+        self._hashes = {}  # upload_id -> (hasher, octets hachés)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def lock(self, upload_id):
+        """Verrou de la session : un seul morceau écrit à la fois dans ce processus"""
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def at(self, upload_id, path, position):
+        """Hasher positionné après les position premiers octets du fichier"""
+        with self._lock:
+            cached = self._hashes.get(upload_id)
+        if cached and cached[1] == position:
+            return cached[0].copy()  # Copie : le cache ne bouge que si le morceau est enregistré
+
+        # Morceaux reçus par un autre processus (ou redémarrage) : relire le fichier
+        hasher = hashlib.sha256()
+        remaining = position
+        with open(path, 'rb') as f:
+            while remaining > 0:
+                block = f.read(min(READ_SIZE, remaining))
+                if not block:
+                    raise ValueError('Fichier partiel plus court que l\'offset enregistré')
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def store(self, upload_id, hasher, position):
+        with self._lock:
+            self._hashes[upload_id] = (hasher, position)
+
+    def forget(self, upload_id):
+        with self._lock:
+            self._hashes.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+def append_chunk(path, offset, stream, hasher):
+    """
+    Écrire le corps de la requête dans path à partir de offset, en mettant à jour hasher
+    Renvoie (octets écrits, True si le client s'est déconnecté en cours de morceau)
+    """
+    written = 0
+    disconnected = False
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.truncate()  # octets d'un essai précédent non enregistrés
+        try:
+            while True:
+                block = stream.read(READ_SIZE)
+                if not block:
+                    break
+                f.write(block)
+                hasher.update(block)
+                written += len(block)
+        except ClientDisconnected:
+            disconnected = True
+    return written, disconnected
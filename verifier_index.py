@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Vérification : les requêtes fréquentes de app.py utilisent un index (EXPLAIN)
+- SQLite : EXPLAIN QUERY PLAN, échec si une table est parcourue sans index (SCAN sans USING)
+- PostgreSQL : EXPLAIN avec enable_seqscan désactivé, échec si un Seq Scan subsiste
+Usage : python verifier_index.py   (après python migrate_add_indexes.py)
+"""
+
+import os
+import sys
+from datetime import datetime
+from sqlalchemy import create_engine, select, func, text
+from models import Reperage, Gardien, Lieu, Media, Message, Job
+
+# (description, requête) : mêmes accès que les routes de app.py
+HOT_QUERIES = [
+    ("Gardiens d'un repérage",
+     select(Gardien).where(Gardien.reperage_id == 1).order_by(Gardien.ordre)),
+    ("Lieux d'un repérage",
+     select(Lieu).where(Lieu.reperage_id == 1).order_by(Lieu.numero_lieu)),
+    ("Médias d'un repérage",
+     select(Media).where(Media.reperage_id == 1)),
+    ("Photos d'un repérage (ZIP)",
+     select(Media).where(Media.reperage_id == 1, Media.type == 'photo')),
+    ("Images dérivées d'un contenu partagé (add_media)",
+     select(Media.derives).where(Media.sha256 == 'ab' * 32, Media.derives.like('%blobs/ab/%')).limit(1)),
+    ("Messages d'un repérage",
+     select(Message).where(Message.reperage_id == 1).order_by(Message.id.asc())),
+    ("Nouveaux messages (after_id)",
+     select(Message).where(Message.reperage_id == 1, Message.id > 10).order_by(Message.id.asc())),
+    ("Validateurs HTTP des messages (ETag)",
+     select(func.count(Message.id), func.max(Message.id)).where(Message.reperage_id == 1)),
+    ("Compteur de messages non lus",
+     select(func.count(Message.id)).where(Message.reperage_id == 1, Message.auteur_type == 'fixer',
+                                          Message.lu == False)),
+    ("Brouillon d'un fixer (fixer_form)",
+     select(Reperage).where(Reperage.fixer_email == 'fixer@example.com', Reperage.statut == 'brouillon')
+     .order_by(Reperage.updated_at.desc()).limit(1)),
+    ("Dashboard filtré par statut",
+     select(Reperage).where(Reperage.statut == 'soumis').order_by(Reperage.created_at.desc())),
+    ("Dashboard filtré par pays",
+     select(Reperage).where(Reperage.pays == 'France').order_by(Reperage.created_at.desc())),
+    ("Dashboard trié par date",
+     select(Reperage).order_by(Reperage.created_at.desc())),
+    ("Repérages d'un fixer",
+     select(Reperage).where(Reperage.fixer_id == 1).order_by(Reperage.created_at.desc())),
+    ("Pagination / export par (updated_at, id)",
+     select(Reperage).order_by(Reperage.updated_at.asc(), Reperage.id.asc()).limit(50)),
+    ("Prochaine tâche de fond (jobs.JobWorker.claim)",
+     select(Job.id).where(Job.statut == 'en_attente', Job.run_after <= datetime(2024, 1, 1))
+     .order_by(Job.run_after, Job.id).limit(5)),
+]
+
+def explain(conn, query):
+    """Renvoyer (lignes du plan, True si parcours complet d'une table)"""
+    sql = str(query.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+
+    if conn.dialect.name == 'sqlite':
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        full_scan = any(line.startswith('SCAN ') and 'USING' not in line for line in plan)
+    else:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+        full_scan = any('Seq Scan' in line for line in plan)
+
+    return plan, full_scan
+
+if __name__ == '__main__':
+    db_url = os.environ.get('DATABASE_URL', 'sqlite:///reperage.db')
+    engine = create_engine(db_url)
+
+    print("=" * 70)
+    print(f"VÉRIFICATION DES INDEX ({engine.dialect.name})")
+    print("=" * 70)
+
+    failures = 0
+    with engine.begin() as conn:
+        for label, query in HOT_QUERIES:
+            plan, full_scan = explain(conn, query)
+            print(f"\n{'❌' if full_scan else '✅'} {label}")
+            for line in plan:
+                print(f"      {line}")
+            failures += full_scan
+
+    print("\n" + "=" * 70)
+    if failures:
+        print(f"❌ {failures} requête(s) sans index. Exécutez 'python migrate_add_indexes.py'")
+        sys.exit(1)
+    print("✅ Toutes les requêtes fréquentes utilisent un index")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Vérification : nombre de requêtes SQL émises par GET /api/reperages
+Le nombre de requêtes doit rester constant quel que soit le nombre de repérages
+(pas de chargement N+1 des gardiens, lieux et médias).
+Usage : python verifier_requetes.py
+"""
+
+import os
+import sys
+import tempfile
+
+# Base temporaire : ne jamais toucher reperage.db
+db_file = os.path.join(tempfile.mkdtemp(), 'verif.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+os.environ['JOBS_WORKERS'] = '0'  # Pas de worker de tâches : seules les requêtes du GET sont comptées
+
+from sqlalchemy import event
+from app import app, engine, db_session
+from models import Reperage, Gardien, Lieu, Media
+
+def ajouter_reperages(n):
+    """Créer n repérages complets (3 gardiens, 3 lieux, 2 médias chacun)"""
+    session = db_session()
+    for i in range(n):
+        reperage = Reperage(region=f'Région {i}', pays='France', statut='brouillon')
+        reperage.gardiens = [Gardien(ordre=o, nom=f'Gardien {o}') for o in (1, 2, 3)]
+        reperage.lieux = [Lieu(numero_lieu=o, nom=f'Lieu {o}') for o in (1, 2, 3)]
+        reperage.medias = [Media(type='photo', nom_fichier=f'photo_{i}_{o}.jpg') for o in (1, 2)]
+        session.add(reperage)
+    session.commit()
+    db_session.remove()
+
+def compter_requetes(url):
+    """Compter les requêtes SQL émises pendant un GET"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = app.test_client().get(url)
+        assert response.status_code == 200, response.status_code
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements)
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("VÉRIFICATION: requêtes SQL de GET /api/reperages")
+    print("=" * 60)
+
+    resultats = {}
+    total = 0
+    for n in (1, 10, 50):
+        ajouter_reperages(n - total)
+        total = n
+        resultats[n] = compter_requetes('/api/reperages')
+        print(f"   {n:>3} repérage(s) → {resultats[n]} requête(s)")
+
+    if len(set(resultats.values())) != 1:
+        print("❌ Le nombre de requêtes dépend du nombre de repérages (N+1)")
+        sys.exit(1)
+
+    print("✅ Nombre de requêtes constant")